@@ -3,8 +3,12 @@
 """
 家谱生成器打包脚本
 使用PyInstaller将GUI程序打包成Windows可执行文件
+
+用法：python build.py [--onedir]
+  --onedir  打包为文件夹（程序和依赖放在同一目录），启动时不需要先解压，启动更快
 """
 
+import argparse
 import os
 import sys
 import shutil
@@ -36,8 +40,93 @@ def check_requirements():
     
     return True
 
-def create_spec_file():
-    """创建PyInstaller spec文件"""
+# 预置字体缓存的生成位置
+FONT_CACHE_DIR = os.path.join('build', 'mpl_cache')
+
+# 程序用不到的大型模块，排除后可减小体积、加快解压和导入
+EXCLUDED_MODULES = [
+    'matplotlib.backends.backend_qtagg',
+    'matplotlib.backends.backend_qt5agg',
+    'matplotlib.backends.backend_wxagg',
+    'matplotlib.backends.backend_gtk3agg',
+    'matplotlib.backends.backend_webagg',
+    'PyQt5',
+    'PyQt6',
+    'PySide2',
+    'PySide6',
+    'IPython',
+    'scipy',
+    'pandas',
+]
+
+def prebuild_font_cache():
+    """预先生成matplotlib字体缓存，随程序一起发布，避免首次启动时扫描系统字体"""
+    print("生成字体缓存...")
+    from mpl_cache import build_font_cache
+    files = build_font_cache(FONT_CACHE_DIR)
+    print(f"✓ 字体缓存已生成: {', '.join(files)}")
+
+EXE_ONEFILE = '''
+exe = EXE(
+    pyz,
+    a.scripts,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    [],
+    name='家谱生成器',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    runtime_tmpdir=None,
+    console=False,  # 不显示控制台
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon='icon.ico' if Path('icon.ico').exists() else None,
+)
+'''
+
+EXE_ONEDIR = '''
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='家谱生成器',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    runtime_tmpdir=None,
+    console=False,  # 不显示控制台
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon='icon.ico' if Path('icon.ico').exists() else None,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    name='家谱生成器',
+)
+'''
+
+def create_spec_file(onedir=False):
+    """创建PyInstaller spec文件（onedir为True时打包为文件夹）"""
     print("创建spec文件...")
     
     spec_content = '''
@@ -62,6 +151,9 @@ a = Analysis(
         ('main.py', '.'),
         ('家谱数据', '家谱数据'),
         (str(mpl_data_dir), 'matplotlib/mpl-data'),
+        (__FONT_CACHE_DIR__, 'mpl_cache'),
+        # 随程序发布的中文子集字体
+        *[(str(path), 'fonts') for path in Path('fonts').glob('*.[ot]tf')],
     ],
     hiddenimports=[
         'tkinter',
@@ -69,14 +161,14 @@ a = Analysis(
         'tkinter.messagebox',
         'tkinter.filedialog',
         'tkinter.simpledialog',
-        'matplotlib.backends.backend_tkagg',
+        'matplotlib.backends.backend_agg',
         'numpy',
         'PIL',
     ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=__EXCLUDES__,
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -85,30 +177,19 @@ a = Analysis(
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
-    name='家谱生成器',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,  # 不显示控制台
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    icon='icon.ico' if Path('icon.ico').exists() else None,
-)
+__EXE__
 '''
     
+    if onedir:
+        # 文件夹模式：可执行文件只包含脚本，依赖和数据文件放在同一目录中
+        exe_content = EXE_ONEDIR
+    else:
+        exe_content = EXE_ONEFILE
+    spec_content = (spec_content
+                    .replace('__EXE__', exe_content.strip())
+                    .replace('__FONT_CACHE_DIR__', repr(FONT_CACHE_DIR))
+                    .replace('__EXCLUDES__', repr(EXCLUDED_MODULES)))
+    
     with open('family_tree.spec', 'w', encoding='utf-8') as f:
         f.write(spec_content.strip())
     
@@ -131,7 +212,7 @@ def build_executable():
         print(f"错误输出: {e.stderr}")
         return False
 
-def create_distribution():
+def create_distribution(onedir=False):
     """创建发布包"""
     print("创建发布包...")
     
@@ -141,9 +222,13 @@ def create_distribution():
         shutil.rmtree(dist_dir)
     dist_dir.mkdir()
     
-    # 复制可执行文件
+    # 复制可执行文件（文件夹模式把程序和依赖目录一起复制，exe仍与数据目录放在一起）
     exe_file = Path("dist/家谱生成器.exe")
-    if exe_file.exists():
+    app_dir = Path("dist/家谱生成器")
+    if onedir and app_dir.is_dir():
+        shutil.copytree(app_dir, dist_dir, dirs_exist_ok=True)
+        print("✓ 程序目录已复制")
+    elif exe_file.exists():
         shutil.copy2(exe_file, dist_dir / "家谱生成器.exe")
         print("✓ 可执行文件已复制")
     else:
@@ -198,21 +283,26 @@ def main():
     script_dir = Path(__file__).parent
     os.chdir(script_dir)
     
+    parser = argparse.ArgumentParser(description="打包家谱生成器")
+    parser.add_argument('--onedir', action='store_true', help="打包为文件夹，启动时无需解压")
+    args = parser.parse_args()
+    
     # 检查环境
     if not check_requirements():
         print("\n请先安装必要的依赖包")
         return False
     
     try:
-        # 创建spec文件
-        create_spec_file()
+        # 预置字体缓存并创建spec文件
+        prebuild_font_cache()
+        create_spec_file(onedir=args.onedir)
         
         # 构建可执行文件
         if not build_executable():
             return False
         
         # 创建发布包
-        if not create_distribution():
+        if not create_distribution(onedir=args.onedir):
             return False
         
         print("\n" + "=" * 50)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式导出
+把家谱树导出为按列存储的数组，供数据分析使用，不必再解析Markdown：
+  id          节点编号（先序遍历顺序，与 main.compute_geometry 的几何数据顺序一致）
+  parent      父节点编号（根节点为-1）
+  depth       代数（根节点为0）
+  name        名字
+  generation  字辈
+  x, y        布局坐标（提供几何数据时）
+
+支持NumPy的.npz文件和CSV文件。导出时只遍历一次家谱数据，按块写出，
+不为每个节点创建对象；.npz中的各列先按块写入临时文件，最后连同数组头写入压缩包。
+名字在.npz中以UTF-8字节串加偏移量的形式存储（name_data、name_offsets）。
+
+读取：load_columns 返回各列数组，children_index 用向量运算得到每个节点的子节点列表。
+
+列式数据只描述家谱树本身：配偶、过继关系和人物属性（[配:…]、[出继:…]、{生:…}）不在导出的列中，
+需要保留这些信息时使用原Markdown文件或家谱数据库（genealogy_store）。
+"""
+
+import csv
+import os
+import tempfile
+import zipfile
+from array import array
+
+import numpy as np
+import numpy.lib.format as npy_format
+
+# 每块的节点数
+CHUNK_SIZE = 65536
+
+CSV_COLUMNS = ['id', 'parent', 'depth', 'name', 'generation', 'x', 'y']
+
+
+def iter_column_chunks(family_data, geometry=None, chunk_size=CHUNK_SIZE):
+    """
+    按先序遍历顺序逐块生成各列数组
+    每块为字典：id/parent/depth/x/y 为数组，name/generation 为字符串列表
+    """
+    generations = list(family_data.get('generations', []))
+    labels = np.array(generations + [''], dtype=object)
+
+    parents = array('q')
+    depths = array('i')
+    names = []
+    start = 0
+
+    def chunk():
+        depth = np.frombuffer(depths, dtype=np.int32).copy()
+        count = len(depth)
+        if geometry is not None:
+            x = geometry['x'][start:start + count]
+            y = geometry['y'][start:start + count]
+        else:
+            x = y = np.full(count, np.nan)
+        return {
+            'id': np.arange(start, start + count, dtype=np.int64),
+            'parent': np.frombuffer(parents, dtype=np.int64).copy(),
+            'depth': depth,
+            'name': names,
+            'generation': labels[np.minimum(depth, len(generations))].tolist(),
+            'x': x,
+            'y': y,
+        }
+
+    next_id = 0
+    stack = [(family_data, -1, 0)]
+    while stack:
+        data, parent, depth = stack.pop()
+        parents.append(parent)
+        depths.append(depth)
+        names.append(data.get('name', ''))
+        children = data.get('children')
+        if children:
+            stack.extend((child, next_id, depth + 1) for child in reversed(children))
+        next_id += 1
+
+        if len(names) == chunk_size:
+            yield chunk()
+            start = next_id
+            parents = array('q')
+            depths = array('i')
+            names = []
+
+    if names:
+        yield chunk()
+
+
+def export_csv(family_data, output_path, geometry=None, chunk_size=CHUNK_SIZE):
+    """导出为CSV文件（UTF-8带BOM，Excel可直接打开），返回节点数"""
+    count = 0
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for chunk in iter_column_chunks(family_data, geometry, chunk_size):
+            writer.writerows(zip(*(chunk[column] if column in ('name', 'generation') else chunk[column].tolist()
+                                   for column in CSV_COLUMNS)))
+            count += len(chunk['id'])
+    return count
+
+
+class _ColumnSpool:
+    """把一列数据按块写入临时文件，最后写为.npy"""
+
+    def __init__(self, directory, dtype):
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        self.file = tempfile.TemporaryFile(dir=directory)
+
+    def write(self, values):
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        self.file.write(values.tobytes())
+        self.count += len(values)
+
+    def save(self, archive, name):
+        header = {
+            'descr': npy_format.dtype_to_descr(self.dtype),
+            'fortran_order': False,
+            'shape': (self.count,),
+        }
+        self.file.seek(0)
+        with archive.open(f'{name}.npy', 'w', force_zip64=True) as f:
+            npy_format.write_array_header_2_0(f, header)
+            while True:
+                data = self.file.read(1 << 20)
+                if not data:
+                    break
+                f.write(data)
+        self.file.close()
+
+
+def export_npz(family_data, output_path, geometry=None, chunk_size=CHUNK_SIZE, compress=True):
+    """导出为.npz文件（可用 numpy.load 或 load_columns 读取），返回节点数"""
+    directory = os.path.dirname(os.path.abspath(output_path))
+    spools = {
+        'parent': _ColumnSpool(directory, np.int64),
+        'depth': _ColumnSpool(directory, np.int32),
+        'x': _ColumnSpool(directory, np.float64),
+        'y': _ColumnSpool(directory, np.float64),
+        'name_data': _ColumnSpool(directory, np.uint8),
+        'name_offsets': _ColumnSpool(directory, np.int64),
+    }
+    spools['name_offsets'].write([0])
+    name_bytes = 0
+    for chunk in iter_column_chunks(family_data, geometry, chunk_size):
+        for column in ('parent', 'depth', 'x', 'y'):
+            spools[column].write(chunk[column])
+        encoded = [name.encode('utf-8') for name in chunk['name']]
+        spools['name_data'].write(np.frombuffer(b''.join(encoded), dtype=np.uint8))
+        lengths = np.fromiter((len(item) for item in encoded), dtype=np.int64, count=len(encoded))
+        spools['name_offsets'].write(name_bytes + np.cumsum(lengths))
+        name_bytes += int(lengths.sum())
+
+    generations = np.array(list(family_data.get('generations', [])), dtype=str)
+    mode = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    with zipfile.ZipFile(output_path, 'w', compression=mode, allowZip64=True) as archive:
+        for name, spool in spools.items():
+            spool.save(archive, name)
+        with archive.open('generations.npy', 'w') as f:
+            npy_format.write_array(f, generations, allow_pickle=False)
+    return spools['parent'].count
+
+
+def export_columns(family_data, output_path, geometry=None, chunk_size=CHUNK_SIZE):
+    """根据扩展名（.npz或.csv）导出，返回节点数"""
+    extension = os.path.splitext(str(output_path))[1].lower()
+    if extension == '.npz':
+        return export_npz(family_data, output_path, geometry, chunk_size)
+    if extension == '.csv':
+        return export_csv(family_data, output_path, geometry, chunk_size)
+    raise ValueError(f"不支持的导出格式：{extension}（可选 .npz 或 .csv）")
+
+
+def _decode_names(data, offsets):
+    """把UTF-8字节串和偏移量解码为字符串数组"""
+    text = data.tobytes()
+    return np.array([text[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)],
+                    dtype=str)
+
+
+def load_columns(path):
+    """
+    读取导出的.npz或.csv文件，返回各列数组的字典
+    （id/parent/depth/x/y 为数值数组，name/generation 为字符串数组）
+    """
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension == '.npz':
+        with np.load(path, allow_pickle=False) as archive:
+            columns = {key: archive[key] for key in ('parent', 'depth', 'x', 'y')}
+            names = _decode_names(archive['name_data'], archive['name_offsets'])
+            generations = archive['generations']
+        labels = np.append(generations, '')
+        columns['id'] = np.arange(len(columns['parent']), dtype=np.int64)
+        columns['name'] = names
+        columns['generation'] = labels[np.minimum(columns['depth'], len(generations))]
+        return columns
+
+    if extension == '.csv':
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            rows = list(zip(*reader)) or [()] * len(header)
+        raw = dict(zip(header, rows))
+        return {
+            'id': np.array(raw['id'], dtype=np.int64),
+            'parent': np.array(raw['parent'], dtype=np.int64),
+            'depth': np.array(raw['depth'], dtype=np.int32),
+            'name': np.array(raw['name'], dtype=str),
+            'generation': np.array(raw['generation'], dtype=str),
+            'x': np.array(raw['x'], dtype=np.float64),
+            'y': np.array(raw['y'], dtype=np.float64),
+        }
+
+    raise ValueError(f"不支持的文件格式：{extension}（可选 .npz 或 .csv）")
+
+
+def children_index(parent):
+    """
+    用向量运算建立子节点索引（CSR格式）
+    返回 (offsets, children)：节点i的子节点为 children[offsets[i]:offsets[i + 1]]，按原顺序排列
+    """
+    parent = np.asarray(parent)
+    has_parent = parent >= 0
+    child_ids = np.flatnonzero(has_parent)
+    order = np.argsort(parent[has_parent], kind='stable')
+    children = child_ids[order]
+    counts = np.bincount(parent[has_parent], minlength=len(parent))
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    return offsets, children
+
+
+def subtree_sizes(parent, depth):
+    """用向量运算统计每个子树的人数：从最深一代开始，逐代把人数累加到父节点"""
+    parent = np.asarray(parent)
+    depth = np.asarray(depth)
+    sizes = np.ones(len(parent), dtype=np.int64)
+    for level in range(int(depth.max(initial=0)), 0, -1):
+        nodes = np.flatnonzero(depth == level)
+        np.add.at(sizes, parent[nodes], sizes[nodes])
+    return sizes
+
+
+def columns_to_family_data(columns):
+    """把各列数组还原为嵌套的家谱数据（与 parse_markdown_family_tree 的结果格式相同）"""
+    parent = columns['parent']
+    nodes = [{'name': str(name)} for name in columns['name']]
+    offsets, children = children_index(parent)
+    for i in np.flatnonzero(offsets[1:] > offsets[:-1]):
+        nodes[i]['children'] = [nodes[j] for j in children[offsets[i]:offsets[i + 1]]]
+    roots = np.flatnonzero(parent < 0)
+    if not len(roots):
+        return None
+    root = nodes[roots[0]]
+    labels = {}
+    for depth, label in zip(columns['depth'], columns['generation']):
+        if label and int(depth) not in labels:
+            labels[int(depth)] = str(label)
+    if labels:
+        root['generations'] = [labels.get(depth, '') for depth in range(max(labels) + 1)]
+    return root
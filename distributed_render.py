@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分布式瓦片渲染
+把一个或多个家谱渲染为瓦片金字塔（每级256×256像素的PNG，{输出目录}/{级别}/{列}/{行}.png），
+渲染工作分给多台机器完成。
+
+协调端为每个家谱计算一次布局，把几何数据压缩为紧凑的二进制格式（见 pack_layout），
+并把瓦片任务通过 multiprocessing.managers 在TCP端口上发布。工作端可以在任何机器上运行：
+连接协调端后逐个领取任务，第一次遇到某个家谱时下载一次布局，在本机渲染后把PNG数据交回，
+由协调端写入输出目录。每个任务是一个由 METATILE×METATILE 张瓦片组成的大块，一次绘制后再切开，
+比逐张绘制少很多次画布准备工作。
+
+- 领取即租约：工作端定期发送心跳，租约超时（工作端退出、断网或卡死）的任务重新排队；
+  渲染出错的任务也会重试，累计失败 MAX_ATTEMPTS 次后放弃并在结束时报告。
+- 工作窃取：队列已空而还有任务在其他工作端上进行时，空闲的工作端领取同一任务的副本，
+  先交回的结果有效，慢机器不会拖住整批任务的结束时间。
+
+用法：
+  python distributed_render.py serve 标题1 标题2 ... [--host 0.0.0.0] [--port 8766] [--local-workers 4]
+  python distributed_render.py worker --connect 协调端地址:8766 --authkey 密钥 [--processes 4]
+协调端启动时打印连接密钥（也可以用 --authkey 指定）。只在本机测试时，
+serve 的 --local-workers 直接启动若干本机工作进程。
+"""
+
+import argparse
+import io
+import json
+import math
+import multiprocessing
+import os
+import secrets
+import socket
+import threading
+import time
+from collections import deque
+from multiprocessing.managers import BaseManager
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from main import (
+    NODE_HEIGHT_HORIZONTAL, compute_geometry, draw_generation_labels, draw_geometry,
+    geometry_bounds, load_family_data
+)
+
+DEFAULT_PORT = 8766
+
+# 瓦片边长（像素）和每个任务包含的瓦片数（每边）
+TILE_SIZE = 256
+METATILE = 8
+
+# 最大级别每个布局单位对应的像素数，每降一级减半
+DEFAULT_SCALE_PX = 40
+
+# 每个布局单位对应的磅数（与分页PDF和海报相同），决定文字和线条相对节点的大小
+POINTS_PER_UNIT = 20
+POINTS_PER_INCH = 72
+
+# 节点高度小于此像素数时不绘制名字
+MIN_LABEL_PX = 6
+
+# 租约时长、心跳间隔和空闲等待时间（秒），以及每个任务的最多尝试次数
+LEASE_SECONDS = 30
+HEARTBEAT_SECONDS = 5
+WAIT_SECONDS = 0.5
+MAX_ATTEMPTS = 3
+
+_GEOMETRY_KEYS = ('x', 'y', 'width', 'height', 'depth', 'collapsed', 'segments', 'links', 'link_kinds')
+
+
+def pyramid_spec(geometry, scale_px=DEFAULT_SCALE_PX, tile_size=TILE_SIZE):
+    """
+    瓦片金字塔的坐标参数：最大级别每单位像素数、左上角坐标和级别数
+    第0级整张图放进一张瓦片，级别每加1分辨率加倍
+    """
+    min_x, max_x, min_y, max_y = geometry_bounds(geometry)
+    left = min_x - 5  # 左侧留出字辈标签的位置（与 render_family_tree 相同）
+    extent = max(max_x - left, max_y - min_y) * scale_px
+    max_zoom = max(0, math.ceil(math.log2(extent / tile_size))) if extent > tile_size else 0
+    return {
+        'tile_size': tile_size,
+        'max_zoom': max_zoom,
+        'scale_px': scale_px,
+        'left': float(left),
+        'top': float(max_y),
+        'width': float(max_x - left),
+        'height': float(max_y - min_y),
+        'min_x': float(min_x),
+    }
+
+
+def level_tiles(spec, zoom):
+    """某一级的 (列数, 行数)"""
+    px_per_unit = spec['scale_px'] / 2 ** (spec['max_zoom'] - zoom)
+    size = spec['tile_size']
+    return (max(1, math.ceil(spec['width'] * px_per_unit / size)),
+            max(1, math.ceil(spec['height'] * px_per_unit / size)))
+
+
+def pyramid_jobs(spec, metatile=METATILE):
+    """全部任务 (级别, 大块列号, 大块行号)，低级别在前：低级别的大块包含的人多，先开始有利于均衡"""
+    jobs = []
+    for zoom in range(spec['max_zoom'] + 1):
+        columns, rows = level_tiles(spec, zoom)
+        for my in range(math.ceil(rows / metatile)):
+            for mx in range(math.ceil(columns / metatile)):
+                jobs.append((zoom, mx, my))
+    return jobs
+
+
+def pack_layout(geometry, spec, generations=()):
+    """把几何数据压缩为字节串，名字用\\0连接，参数和字辈以JSON保存"""
+    arrays = {key: geometry[key] for key in _GEOMETRY_KEYS if geometry.get(key) is not None}
+    arrays['names'] = np.frombuffer('\0'.join(geometry['names']).encode('utf-8'), dtype=np.uint8)
+    meta = {'spec': spec, 'generations': list(generations)}
+    arrays['meta'] = np.frombuffer(json.dumps(meta, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def unpack_layout(blob):
+    """pack_layout 的逆操作，返回 (几何数据, 金字塔参数, 字辈)"""
+    with np.load(io.BytesIO(blob)) as archive:
+        geometry = {key: archive[key] for key in archive.files if key not in ('names', 'meta')}
+        names = archive['names'].tobytes().decode('utf-8')
+        meta = json.loads(archive['meta'].tobytes().decode('utf-8'))
+    geometry['names'] = names.split('\0') if len(geometry['x']) else []
+    return geometry, meta['spec'], meta['generations']
+
+
+class TileRenderer:
+    """工作端：按任务绘制一个大块并切成瓦片"""
+
+    def __init__(self, blob):
+        self.geometry, self.spec, self.generations = unpack_layout(blob)
+        geometry = self.geometry
+        x, y = geometry['x'], geometry['y']
+        half_w, half_h = geometry['width'] / 2, geometry['height'] / 2
+        self.node_box = (x - half_w, x + half_w, y - half_h, y + half_h)
+        lines = geometry['segments']
+        if geometry.get('links') is not None and len(geometry['links']):
+            lines = np.concatenate([lines, geometry['links']])
+        self.line_box = (lines[:, :, 0].min(axis=1), lines[:, :, 0].max(axis=1),
+                         lines[:, :, 1].min(axis=1), lines[:, :, 1].max(axis=1))
+        depths, first_index = np.unique(geometry['depth'], return_index=True)
+        self.generation_geometry = {'depth': depths, 'y': y[first_index]}
+        self.canvases = {}
+
+    def _subset(self, node_mask, line_mask, labels):
+        geometry = self.geometry
+        subset = {key: geometry[key][node_mask] for key in ('x', 'y', 'width', 'height', 'depth', 'collapsed')}
+        subset['names'] = ([geometry['names'][i] for i in np.flatnonzero(node_mask)] if labels
+                           else [''] * int(node_mask.sum()))
+        count = len(geometry['segments'])
+        subset['segments'] = geometry['segments'][line_mask[:count]]
+        if count < len(line_mask):
+            subset['links'] = geometry['links'][line_mask[count:]]
+            subset['link_kinds'] = geometry['link_kinds'][line_mask[count:]]
+        return subset
+
+    def render(self, zoom, mx, my):
+        """返回 {(列, 行): PNG数据}，空白瓦片不返回"""
+        from PIL import Image
+
+        spec = self.spec
+        size = spec['tile_size']
+        px_per_unit = spec['scale_px'] / 2 ** (spec['max_zoom'] - zoom)
+        level_columns, level_rows = level_tiles(spec, zoom)
+        first_column, first_row = mx * METATILE, my * METATILE
+        columns = min(METATILE, level_columns - first_column)
+        rows = min(METATILE, level_rows - first_row)
+        width_px, height_px = columns * size, rows * size
+
+        left = spec['left'] + first_column * size / px_per_unit
+        right = left + width_px / px_per_unit
+        top = spec['top'] - first_row * size / px_per_unit
+        bottom = top - height_px / px_per_unit
+
+        # 与大块相交的节点和线条（向外扩展几个像素，包含线宽）
+        margin = 4 / px_per_unit
+        node_box, line_box = self.node_box, self.line_box
+        node_mask = ((node_box[0] <= right + margin) & (node_box[1] >= left - margin)
+                     & (node_box[2] <= top + margin) & (node_box[3] >= bottom - margin))
+        line_mask = ((line_box[0] <= right + margin) & (line_box[1] >= left - margin)
+                     & (line_box[2] <= top + margin) & (line_box[3] >= bottom - margin))
+        label_area = self.generations and left <= spec['min_x']
+        if not node_mask.any() and not line_mask.any() and not label_area:
+            return {}
+
+        dpi = px_per_unit * POINTS_PER_INCH / POINTS_PER_UNIT
+        key = (width_px, height_px, zoom)
+        if key not in self.canvases:
+            self.canvases[key] = FigureCanvasAgg(Figure(figsize=(width_px / dpi, height_px / dpi), dpi=dpi))
+        canvas = self.canvases[key]
+        fig = canvas.figure
+        fig.clear()
+        ax = fig.add_axes([0, 0, 1, 1])
+        ax.set_xlim(left, right)
+        ax.set_ylim(bottom, top)
+        ax.axis('off')
+        labels = NODE_HEIGHT_HORIZONTAL * px_per_unit >= MIN_LABEL_PX
+        if node_mask.any() or line_mask.any():
+            draw_geometry(ax, self._subset(node_mask, line_mask, labels))
+        if label_area and labels:
+            draw_generation_labels(ax, self.generation_geometry, self.generations, spec['min_x'])
+        canvas.draw()
+
+        # 画布尺寸按浮点数换算，可能与目标相差一个像素：多余的裁掉，不足的补白
+        pixels = np.asarray(canvas.buffer_rgba())[:, :, :3]
+        block = np.full((height_px, width_px, 3), 255, dtype=np.uint8)
+        h, w = min(height_px, pixels.shape[0]), min(width_px, pixels.shape[1])
+        block[:h, :w] = pixels[:h, :w]
+
+        tiles = {}
+        for row in range(rows):
+            for column in range(columns):
+                tile = block[row * size:(row + 1) * size, column * size:(column + 1) * size]
+                if tile.min() == 255:
+                    continue
+                buffer = io.BytesIO()
+                Image.fromarray(tile, 'RGB').save(buffer, format='PNG')
+                tiles[(first_column + column, first_row + row)] = buffer.getvalue()
+        return tiles
+
+
+class TileCoordinator:
+    """
+    协调端的任务表，工作端通过代理对象调用下列公开方法
+
+    任务编号即 jobs 中的下标。pending 为等待分配的任务，
+    leases 记录每个进行中的任务由哪些工作端持有及其租约到期时间。
+    """
+
+    def __init__(self, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.layouts = {}      # 家谱键 -> 压缩的布局
+        self.outputs = {}      # 家谱键 -> 输出目录
+        self.jobs = []         # 任务编号 -> (家谱键, 级别, 大块列号, 大块行号)
+        self.attempts = []
+        self.done = []
+        self.pending = deque()
+        self.leases = {}       # 任务编号 -> {工作端: 租约到期时间}
+        self.failed = {}       # 任务编号 -> 错误信息
+        self.workers = {}      # 工作端 -> 完成的任务数
+        self.completed = 0
+        self.tiles = 0
+        self.retried = 0
+        self.stolen = 0
+        self.finished = threading.Event()
+
+    def add_layout(self, key, blob, output_dir, jobs):
+        """登记一个家谱的布局和全部任务"""
+        with self.lock:
+            self.layouts[key] = blob
+            self.outputs[key] = output_dir
+            for job in jobs:
+                self.pending.append(len(self.jobs))
+                self.jobs.append((key, *job))
+                self.attempts.append(0)
+                self.done.append(False)
+            self.finished.clear()
+
+    def layout(self, key):
+        return self.layouts[key]
+
+    def _all_settled(self):
+        return self.completed + len(self.failed) == len(self.jobs)
+
+    def _give_up_or_retry(self, job_id, message):
+        """一次尝试失败：次数用完时放弃，否则重新排到队首"""
+        self.attempts[job_id] += 1
+        if self.attempts[job_id] >= self.max_attempts:
+            self.failed[job_id] = message
+            if self._all_settled():
+                self.finished.set()
+        else:
+            self.retried += 1
+            self.pending.appendleft(job_id)
+
+    def _reap(self, now):
+        """收回租约已过期的任务"""
+        for job_id in [job_id for job_id, holders in self.leases.items()
+                       if any(deadline < now for deadline in holders.values())]:
+            holders = self.leases[job_id]
+            for worker in [worker for worker, deadline in holders.items() if deadline < now]:
+                del holders[worker]
+            if not holders:
+                del self.leases[job_id]
+                self._give_up_or_retry(job_id, "工作端失去联系")
+
+    def expire_leases(self):
+        """收回过期的租约（协调端定期调用，所有工作端都退出时任务也能重新排队）"""
+        with self.lock:
+            self._reap(time.monotonic())
+
+    def next_job(self, worker):
+        """
+        领取一个任务，返回 (任务编号, 家谱键, 级别, 大块列号, 大块行号)
+        暂时没有可领取的任务时返回空元组（稍后再试），全部完成时返回None
+        """
+        with self.lock:
+            self.workers.setdefault(worker, 0)
+            now = time.monotonic()
+            self._reap(now)
+            while self.pending:
+                job_id = self.pending.popleft()
+                if self.done[job_id] or job_id in self.failed or worker in self.leases.get(job_id, ()):
+                    continue
+                self.leases.setdefault(job_id, {})[worker] = now + self.lease_seconds
+                return (job_id, *self.jobs[job_id])
+            if self._all_settled():
+                return None
+            # 工作窃取：领取最早开始、还没有副本的进行中任务
+            for job_id, holders in self.leases.items():
+                if len(holders) == 1 and worker not in holders:
+                    holders[worker] = now + self.lease_seconds
+                    self.stolen += 1
+                    return (job_id, *self.jobs[job_id])
+            return ()
+
+    def heartbeat(self, worker):
+        """延长这个工作端持有的全部租约"""
+        with self.lock:
+            deadline = time.monotonic() + self.lease_seconds
+            for holders in self.leases.values():
+                if worker in holders:
+                    holders[worker] = deadline
+
+    def submit(self, worker, job_id, tiles):
+        """交回一个任务的瓦片；任务已由其他工作端完成时忽略，返回False"""
+        with self.lock:
+            self.leases.pop(job_id, None)
+            if self.done[job_id] or job_id in self.failed:
+                return False
+            self.done[job_id] = True
+            key, zoom = self.jobs[job_id][:2]
+        output_dir = self.outputs[key]
+        for (column, row), data in tiles.items():
+            directory = os.path.join(output_dir, str(zoom), str(column))
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f'{row}.png'), 'wb') as f:
+                f.write(data)
+        with self.lock:
+            self.completed += 1
+            self.tiles += len(tiles)
+            self.workers[worker] = self.workers.get(worker, 0) + 1
+            if self._all_settled():
+                self.finished.set()
+        return True
+
+    def fail(self, worker, job_id, message):
+        """报告任务出错，其他工作端仍持有副本时等待副本的结果"""
+        with self.lock:
+            holders = self.leases.get(job_id, {})
+            holders.pop(worker, None)
+            if self.done[job_id] or job_id in self.failed:
+                return
+            if holders:
+                return
+            self.leases.pop(job_id, None)
+            self._give_up_or_retry(job_id, message)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'jobs': len(self.jobs),
+                'completed': self.completed,
+                'failed': len(self.failed),
+                'in_flight': len(self.leases),
+                'pending': len(self.pending),
+                'tiles': self.tiles,
+                'retried': self.retried,
+                'stolen': self.stolen,
+                'workers': dict(self.workers),
+            }
+
+    def failures(self):
+        with self.lock:
+            return {self.jobs[job_id]: message for job_id, message in self.failed.items()}
+
+
+class CoordinatorManager(BaseManager):
+    """工作端连接协调端使用的管理器"""
+
+
+CoordinatorManager.register('coordinator')
+
+
+def serve_coordinator(coordinator, host='127.0.0.1', port=DEFAULT_PORT, authkey=b''):
+    """
+    在后台线程中发布协调端，返回管理器服务对象（port为0时自动选择空闲端口，
+    可通过 server.address 获取）。结束时调用 stop_coordinator
+    """
+    class ServerManager(CoordinatorManager):
+        pass
+
+    ServerManager.register('coordinator', callable=lambda: coordinator)
+    server = ServerManager(address=(host, port), authkey=authkey).get_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stop_coordinator(server):
+    # serve_forever 在子线程中刚启动时可能还没有创建 stop_event
+    while not hasattr(server, 'stop_event'):
+        time.sleep(0.01)
+    server.stop_event.set()
+    server.listener.close()
+
+
+def run_worker(address, authkey, name=None, connect_timeout=30):
+    """
+    工作端主循环：领取任务、渲染、交回，直到全部任务完成或协调端退出
+    返回本工作端交回的任务数
+    """
+    name = name or f'{socket.gethostname()}-{os.getpid()}'
+    manager = CoordinatorManager(address=address, authkey=authkey)
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            manager.connect()
+            break
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(WAIT_SECONDS)
+    coordinator = manager.coordinator()
+
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                coordinator.heartbeat(name)
+            except (EOFError, OSError):
+                return
+
+    threading.Thread(target=beat, daemon=True).start()
+    renderers = {}
+    submitted = 0
+    try:
+        while True:
+            task = coordinator.next_job(name)
+            if task is None:
+                break
+            if not task:
+                time.sleep(WAIT_SECONDS)
+                continue
+            job_id, key, zoom, mx, my = task
+            try:
+                if key not in renderers:
+                    renderers[key] = TileRenderer(coordinator.layout(key))
+                tiles = renderers[key].render(zoom, mx, my)
+            except (EOFError, OSError):
+                raise
+            except Exception as e:
+                coordinator.fail(name, job_id, f'{type(e).__name__}: {e}')
+                continue
+            if coordinator.submit(name, job_id, tiles):
+                submitted += 1
+    except (EOFError, OSError):
+        pass  # 协调端已退出（全部完成后还在进行的任务副本不再需要）
+    finally:
+        stop.set()
+    return submitted
+
+
+def start_local_workers(address, authkey, processes):
+    """在本机启动若干工作进程"""
+    workers = []
+    for index in range(processes):
+        process = multiprocessing.Process(target=run_worker, args=(address, authkey, f'local-{index}'),
+                                          daemon=True)
+        process.start()
+        workers.append(process)
+    return workers
+
+
+def prepare_layouts(coordinator, titles, layout='classic', scale_px=DEFAULT_SCALE_PX, output_root='瓜藤图'):
+    """计算每个家谱的布局并登记任务，同时写出金字塔参数（pyramid.json，供查看器使用）"""
+    for title in titles:
+        family_data = load_family_data(title)
+        geometry = compute_geometry(family_data, layout)
+        spec = pyramid_spec(geometry, scale_px)
+        output_dir = os.path.join(output_root, f'{title}_瓦片')
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, 'pyramid.json'), 'w', encoding='utf-8') as f:
+            json.dump({**spec, 'title': title, 'metatile': METATILE}, f, ensure_ascii=False, indent=2)
+        jobs = pyramid_jobs(spec)
+        coordinator.add_layout(title, pack_layout(geometry, spec, family_data.get('generations', [])),
+                               output_dir, jobs)
+        print(f"{title}: {len(geometry['names'])} 人，{spec['max_zoom'] + 1} 级，{len(jobs)} 个任务")
+
+
+def _parse_address(text):
+    host, _, port = text.rpartition(':')
+    if not host:
+        raise ValueError(f"地址格式应为 主机:端口：{text}")
+    return host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分布式瓦片渲染")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="协调端：计算布局并发布瓦片任务")
+    serve.add_argument('titles', nargs='+', help="家谱文件名（不含扩展名）")
+    serve.add_argument('--host', default='127.0.0.1', help="监听地址，供其他机器连接时使用0.0.0.0")
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT, help="监听端口")
+    serve.add_argument('--authkey', default=None, help="连接密钥，默认随机生成")
+    serve.add_argument('--layout', choices=('classic', 'compact'), default='classic', help="布局方式")
+    serve.add_argument('--scale-px', type=float, default=DEFAULT_SCALE_PX,
+                       help="最大级别每个布局单位的像素数")
+    serve.add_argument('--local-workers', type=int, default=0, help="同时在本机启动的工作进程数")
+    serve.add_argument('--lease', type=float, default=LEASE_SECONDS, help="任务租约时长（秒）")
+
+    worker = commands.add_parser('worker', help="工作端：领取并渲染瓦片任务")
+    worker.add_argument('--connect', required=True, metavar='HOST:PORT', help="协调端地址")
+    worker.add_argument('--authkey', required=True, help="协调端打印的连接密钥")
+    worker.add_argument('--processes', type=int, default=1, help="本机工作进程数")
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        address = _parse_address(args.connect)
+        authkey = args.authkey.encode()
+        if args.processes <= 1:
+            print(f"完成 {run_worker(address, authkey)} 个任务")
+            return
+        for process in start_local_workers(address, authkey, args.processes):
+            process.join()
+        return
+
+    authkey = (args.authkey or secrets.token_hex(16)).encode()
+    coordinator = TileCoordinator(lease_seconds=args.lease)
+    started = time.perf_counter()
+    prepare_layouts(coordinator, args.titles, args.layout, args.scale_px)
+    server = serve_coordinator(coordinator, args.host, args.port, authkey)
+    host, port = server.address[:2]
+    print(f"协调端已启动：{host}:{port}")
+    print(f"工作端连接：python distributed_render.py worker --connect {host}:{port} --authkey {authkey.decode()}")
+    workers = start_local_workers((host, port), authkey, args.local_workers)
+    try:
+        while not coordinator.finished.wait(1):
+            coordinator.expire_leases()
+            stats = coordinator.stats()
+            print(f"\r完成 {stats['completed']}/{stats['jobs']} 个任务，{stats['tiles']} 张瓦片，"
+                  f"{len(stats['workers'])} 个工作端", end='', flush=True)
+    except KeyboardInterrupt:
+        print("\n已中断")
+        return
+    finally:
+        # 工作端领取到None后自行退出，稍等它们收到结束信号再关闭服务
+        for process in workers:
+            process.join(timeout=HEARTBEAT_SECONDS)
+        stop_coordinator(server)
+
+    stats = coordinator.stats()
+    print(f"\n完成 {stats['completed']} 个任务，{stats['tiles']} 张瓦片，用时 {time.perf_counter() - started:.1f}s"
+          f"（重试 {stats['retried']} 次，窃取 {stats['stolen']} 次）")
+    for worker_name, count in sorted(stats['workers'].items()):
+        print(f"  {worker_name}: {count} 个任务")
+    for (key, zoom, mx, my), message in coordinator.failures().items():
+        print(f"失败：{key} 级别{zoom} 大块({mx}, {my})：{message}")
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+家谱统计
+按代统计人数、有子女和无子女的人数、平均子女数，并检查每个人的名字中是否含有本代的字辈。
+家谱先转换为按先序遍历排列的数组（父节点编号、代数、名字，见 columnar_export），
+各项统计都是按代数分组的NumPy向量运算，几十万人的家谱也在一秒内完成。
+
+字辈检查：字辈设置中的"世字辈"、"世辈"按"世"检查；"第一代"这样的代次名称不是字辈，不检查。
+
+用法：
+  python family_stats.py 家谱数据/张氏家谱.md               # 打印统计表和字辈不符的人
+  python family_stats.py 家谱数据/张氏家谱.md --csv 统计.csv  # 同时把统计表写入CSV
+"""
+
+import argparse
+import csv
+import re
+
+import numpy as np
+
+from columnar_export import iter_column_chunks
+
+# 统计表的列：(键, 标题)
+TABLE_COLUMNS = [
+    ('generation', '代数'),
+    ('label', '字辈'),
+    ('people', '人数'),
+    ('with_children', '有子女'),
+    ('childless', '无子女'),
+    ('avg_children', '平均子女数'),
+    ('mismatched', '字辈不符'),
+]
+
+# "第一代"、"第12代"等代次名称
+_ORDINAL_LABEL = re.compile(r'^第.+代$')
+
+
+def generation_character(label):
+    """从字辈设置中取出名字里应包含的字，不是字辈（如"第一代"）时返回空字符串"""
+    label = (label or '').strip()
+    if not label or _ORDINAL_LABEL.match(label):
+        return ''
+    for suffix in ('字辈', '辈', '字'):
+        if label.endswith(suffix) and len(label) > len(suffix):
+            return label[:-len(suffix)]
+    return label
+
+
+def tree_arrays(family_data):
+    """把家谱数据转换为数组：(父节点编号, 代数, 名字)，按先序遍历排列，根节点的父节点为-1"""
+    parents, depths, names = [], [], []
+    for chunk in iter_column_chunks(family_data):
+        parents.append(chunk['parent'])
+        depths.append(chunk['depth'])
+        names.extend(chunk['name'])
+    if not parents:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32), np.empty(0, dtype=str)
+    return np.concatenate(parents), np.concatenate(depths), np.array(names, dtype=str)
+
+
+def generation_stats(parent, depth, names, generations=()):
+    """
+    按代统计（参数为数组，可直接使用 columnar_export.load_columns 读出的列）
+    返回 {'rows': 每代一行的字典列表（键见 TABLE_COLUMNS）, 'total', 'max_generation', 'mismatches'}
+    mismatches为名字中没有本代字辈的人的编号数组
+    """
+    parent = np.asarray(parent)
+    depth = np.asarray(depth)
+    names = np.asarray(names, dtype=str)
+    count = len(parent)
+    if not count:
+        return {'rows': [], 'total': 0, 'max_generation': 0, 'mismatches': np.empty(0, dtype=np.int64)}
+
+    levels = int(depth.max()) + 1
+    children = np.bincount(parent[parent >= 0], minlength=count)
+    people = np.bincount(depth, minlength=levels)
+    with_children = np.bincount(depth, weights=children > 0, minlength=levels).astype(np.int64)
+    child_total = np.bincount(depth, weights=children, minlength=levels)
+
+    # 字辈检查：每个人对应本代应含的字，没有字辈的代为空字符串（不检查）
+    characters = np.array([generation_character(label) for label in generations] + [''], dtype=str)
+    expected = characters[np.minimum(depth, len(generations))]
+    checked = np.char.str_len(expected) > 0
+    mismatched_mask = checked & (np.char.find(names, expected) < 0)
+    mismatched = np.bincount(depth, weights=mismatched_mask, minlength=levels).astype(np.int64)
+
+    rows = []
+    for level in range(levels):
+        label = generations[level] if level < len(generations) else ''
+        has_check = level < len(generations) and bool(characters[level])
+        rows.append({
+            'generation': level + 1,
+            'label': label,
+            'people': int(people[level]),
+            'with_children': int(with_children[level]),
+            'childless': int(people[level] - with_children[level]),
+            'avg_children': round(float(child_total[level] / with_children[level]), 2) if with_children[level] else 0.0,
+            'mismatched': int(mismatched[level]) if has_check else None,
+        })
+    return {
+        'rows': rows,
+        'total': count,
+        'max_generation': levels,
+        'mismatches': np.flatnonzero(mismatched_mask),
+    }
+
+
+def family_stats(family_data):
+    """统计家谱数据（parse_markdown_family_tree 的结果中的 data），另外返回名字数组和代数数组"""
+    parent, depth, names = tree_arrays(family_data)
+    stats = generation_stats(parent, depth, names, list(family_data.get('generations', [])))
+    stats['names'] = names
+    stats['depth'] = depth
+    stats['parent'] = parent
+    return stats
+
+
+def mismatch_examples(stats, limit=20):
+    """字辈不符的人：[(名字, 第几代, 父亲名字)]，最多limit个"""
+    names, depth, parent = stats['names'], stats['depth'], stats['parent']
+    return [(str(names[i]), int(depth[i]) + 1, str(names[parent[i]]) if parent[i] >= 0 else '')
+            for i in stats['mismatches'][:limit]]
+
+
+def format_table(rows):
+    """把统计表排成等宽文本"""
+    header = [title for _, title in TABLE_COLUMNS]
+    body = [['' if row[key] is None else str(row[key]) for key, _ in TABLE_COLUMNS] for row in rows]
+
+    def width(text):
+        return sum(2 if ord(char) > 0x2e7f else 1 for char in text)
+
+    widths = [max(width(line[i]) for line in [header] + body) for i in range(len(header))]
+    lines = []
+    for line in [header] + body:
+        lines.append('  '.join(cell + ' ' * (widths[i] - width(cell)) for i, cell in enumerate(line)).rstrip())
+    return '\n'.join(lines)
+
+
+def write_csv(rows, path):
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([title for _, title in TABLE_COLUMNS])
+        for row in rows:
+            writer.writerow(['' if row[key] is None else row[key] for key, _ in TABLE_COLUMNS])
+
+
+def main():
+    from markdown_parser import parse_markdown_family_tree
+
+    parser = argparse.ArgumentParser(description="按代统计家谱并检查字辈")
+    parser.add_argument('markdown', help="家谱Markdown文件")
+    parser.add_argument('--csv', default=None, help="把统计表写入CSV文件")
+    parser.add_argument('--limit', type=int, default=20, help="最多列出的字辈不符的人数")
+    args = parser.parse_args()
+
+    with open(args.markdown, 'r', encoding='utf-8') as f:
+        result = parse_markdown_family_tree(f.read())
+    if not result['data']:
+        raise SystemExit("家谱数据为空")
+
+    stats = family_stats(result['data'])
+    print(f"{result['title']}：共 {stats['total']} 人，{stats['max_generation']} 代")
+    print(format_table(stats['rows']))
+    if len(stats['mismatches']):
+        print(f"\n名字中没有本代字辈的共 {len(stats['mismatches'])} 人：")
+        for name, generation, father in mismatch_examples(stats, args.limit):
+            print(f"  {name}（第{generation}代，父亲：{father}）")
+    if args.csv:
+        write_csv(stats['rows'], args.csv)
+        print(f"\n统计表: {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
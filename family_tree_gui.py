@@ -11,12 +11,15 @@ import os
 import sys
 import subprocess
 import threading
+import multiprocessing
 from pathlib import Path
 import json
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-import numpy as np
+import io
+import base64
+# matplotlib和numpy在工作进程中首次渲染时才导入，窗口可以尽快显示
 from markdown_parser import parse_markdown_family_tree
+from tree_browser import TreeBrowser
+from tree_editor import TreeDocument
 
 class FamilyTreeGUI:
     def __init__(self, root):
@@ -25,9 +28,19 @@ class FamilyTreeGUI:
         self.root.geometry("800x600")
         self.root.resizable(True, True)
         
-        # 设置中文字体
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'SimSun']
-        plt.rcParams['axes.unicode_minus'] = False
+        # 预览窗口（首次生成时创建）
+        self.preview_window = None
+        self.preview_label = None
+        
+        # 渲染调度器（首次生成时创建），交互渲染优先于批量渲染
+        self.scheduler = None
+        
+        # 渲染队列窗口（首次打开时创建）
+        self.queue_panel = None
+        
+        # 当前文件的结构编辑器，以及等待移动的人
+        self.document = None
+        self.cut_node = None
         
         # 创建必要的目录
         self.setup_directories()
@@ -106,13 +119,46 @@ class FamilyTreeGUI:
         
         ttk.Button(file_frame, text="刷新列表", command=self.refresh_file_list).grid(row=0, column=2)
         
+        # 生成选项
+        options_frame = ttk.Frame(file_frame)
+        options_frame.grid(row=1, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+        
+        tk.Label(options_frame, text="生成选项：", font=("Microsoft YaHei", 10)).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # 紧凑布局可以显著减小宽而浅的家谱图片宽度
+        self.compact_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="紧凑布局", 
+                       variable=self.compact_var).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # 先快速显示低分辨率预览，再在后台生成高清图片
+        self.preview_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="显示预览", 
+                       variable=self.preview_var).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # 性能分析开关（结果显示在状态栏并写入图片旁的.profile.json）
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="记录性能数据", 
+                       variable=self.profile_var).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # 超大家谱只画出前若干人，其余子树折叠为"+N人"汇总框（0表示全部画出）
+        tk.Label(options_frame, text="最多显示人数：", font=("Microsoft YaHei", 10)).pack(side=tk.LEFT)
+        self.max_nodes_var = tk.StringVar(value="0")
+        ttk.Spinbox(options_frame, from_=0, to=1000000, increment=1000, width=8,
+                    textvariable=self.max_nodes_var).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # 一次生成多种格式（布局和绘制只进行一次），可直接输入如 "png,png@150,svg,pdf,thumb"
+        tk.Label(options_frame, text="输出格式：", font=("Microsoft YaHei", 10)).pack(side=tk.LEFT)
+        self.formats_var = tk.StringVar(value="png")
+        ttk.Combobox(options_frame, textvariable=self.formats_var, width=18,
+                     values=("png", "png,thumb", "png,svg", "png,pdf", "png,svg,pdf,thumb")).pack(side=tk.LEFT)
+        
         # 预览区域
         preview_frame = ttk.LabelFrame(main_frame, text="文件信息预览", padding="10")
         preview_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
         preview_frame.columnconfigure(0, weight=1)
         preview_frame.rowconfigure(1, weight=1)
         
-        self.info_text = tk.Text(preview_frame, height=8, font=("Microsoft YaHei", 9), 
+        self.info_text = tk.Text(preview_frame, height=5, font=("Microsoft YaHei", 9), 
                                 wrap=tk.WORD, state=tk.DISABLED, bg="#f8f9fa")
         self.info_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 5))
         
@@ -121,6 +167,11 @@ class FamilyTreeGUI:
         scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
         self.info_text.configure(yscrollcommand=scrollbar.set)
         
+        # 家族结构浏览器（展开时才插入子女）
+        self.tree_browser = TreeBrowser(preview_frame)
+        self.tree_browser.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.setup_tree_editing()
+        
         # 操作按钮区域
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=3, column=0, columnspan=3, pady=(10, 0))
@@ -130,6 +181,15 @@ class FamilyTreeGUI:
                   command=self.generate_tree, 
                   style="Accent.TButton").pack(side=tk.LEFT, padx=(0, 10))
         
+        ttk.Button(button_frame, text="全部生成", 
+                  command=self.generate_all).pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Button(button_frame, text="渲染队列", 
+                  command=self.open_render_queue).pack(side=tk.LEFT, padx=(0, 10))
+        
+        ttk.Button(button_frame, text="统计分析", 
+                  command=self.show_statistics).pack(side=tk.LEFT, padx=(0, 10))
+        
         ttk.Button(button_frame, text="打开结果文件夹", 
                   command=self.open_output_folder).pack(side=tk.LEFT, padx=(0, 10))
         
@@ -162,7 +222,8 @@ class FamilyTreeGUI:
 2. 查看文件信息预览，确认家谱数据正确
 3. 点击"生成家谱图"按钮，程序会自动生成家谱图片
 4. 生成完成后，点击"打开结果文件夹"查看生成的图片
-5. 如需修改家谱数据，点击"编辑家谱数据"按钮"""
+5. 如需修改家谱数据，在结构浏览器中右键添加、改名、移动或删除（立即保存），
+   或点击"编辑家谱数据"按钮用编辑器打开文件"""
         
         tk.Label(help_frame, text=help_text, font=("Microsoft YaHei", 9), 
                 justify=tk.LEFT, fg="#2c3e50").pack(anchor=tk.W)
@@ -214,36 +275,39 @@ class FamilyTreeGUI:
                 # 仅在开发环境查找旧目录
                 file_path = self.base_dir / "markdown_file" / f"{selected_file}.md"
             
+            self.document = None
+            self.cut_node = None
             if file_path.exists():
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # 分析文件内容
-                info = self.analyze_file_content(content, selected_file)
+                # 打开文件供结构编辑，并分析文件内容
+                self.document = TreeDocument(file_path)
+                info = self.analyze_file_content(self.document, selected_file)
                 self.update_info_display(info)
                 self.status_var.set(f"已选择：{selected_file}")
             else:
+                self.tree_browser.clear()
                 self.update_info_display("文件不存在")
                 self.status_var.set("文件不存在")
                 
         except Exception as e:
+            self.tree_browser.clear()
             self.update_info_display(f"读取文件时出错：{str(e)}")
             self.status_var.set("文件读取失败")
     
-    def analyze_file_content(self, content, filename):
-        """分析文件内容"""
+    def analyze_file_content(self, document, filename):
+        """分析文件内容（document为 tree_editor.TreeDocument）"""
         try:
-            result = parse_markdown_family_tree(content)
-            data = result.get('data')
-            title = result.get('title', filename)
+            data = document.data
+            title = document.title or filename
             
             if not data:
+                self.tree_browser.clear()
                 return "文件内容为空或格式不正确"
             
-            # 统计信息
-            total_people = self.count_people(data)
+            # 结构浏览器打开时统计每一支的人数，总人数即始祖一支的人数
+            self.tree_browser.attach(document)
+            total_people = self.tree_browser.sizes[id(data)]
             generations = data.get('generations', [])
-            max_depth = self.get_max_depth(data, 0)
+            max_depth = self.get_max_depth(data)
             
             info_lines = [
                 f"家谱标题：{title}",
@@ -257,54 +321,131 @@ class FamilyTreeGUI:
             else:
                 info_lines.append("字辈设置：无")
             
-            info_lines.extend([
-                "",
-                "家族结构预览：",
-                self.preview_structure(data, 0, "")[:500] + "..." if len(self.preview_structure(data, 0, "")) > 500 else self.preview_structure(data, 0, "")
-            ])
+            if document.fixed_indents:
+                info_lines.append(f"有 {document.fixed_indents} 行缩进与代数不符，编辑后保存时改为标准缩进")
             
             return "\n".join(info_lines)
             
         except Exception as e:
+            self.tree_browser.clear()
             return f"分析文件时出错：{str(e)}"
     
-    def count_people(self, node):
-        """统计人数"""
-        count = 1
-        children = node.get('children', [])
-        for child in children:
-            count += self.count_people(child)
-        return count
-    
-    def get_max_depth(self, node, current_depth):
-        """获取最大深度"""
-        children = node.get('children', [])
-        if not children:
-            return current_depth + 1
-        
-        max_child_depth = 0
-        for child in children:
-            child_depth = self.get_max_depth(child, current_depth + 1)
-            max_child_depth = max(max_child_depth, child_depth)
-        
-        return max_child_depth
-    
-    def preview_structure(self, node, depth, prefix):
-        """预览家族结构"""
-        indent = "  " * depth
-        name = node.get('name', '未知')
-        result = f"{prefix}{indent}- {name}\n"
-        
-        children = node.get('children', [])
-        for i, child in enumerate(children):
-            if depth < 3:  # 只显示前4代
-                result += self.preview_structure(child, depth + 1, prefix)
-            elif i == 0:
-                result += f"{prefix}{'  ' * (depth + 1)}... (还有 {len(children)} 个子孙)\n"
-                break
-        
+    def get_max_depth(self, node):
+        """获取最大深度（逐层遍历，很深的家谱也不会超出递归深度）"""
+        depth = 0
+        level = [node]
+        while level:
+            depth += 1
+            level = [child for item in level for child in item.get('children', [])]
+        return depth
+    
+    def setup_tree_editing(self):
+        """结构浏览器的右键菜单和快捷键（F2改名，Delete删除）"""
+        self.tree_menu = tk.Menu(self.root, tearoff=0)
+        self.tree_menu.add_command(label="添加子女…", command=self.edit_add_child)
+        self.tree_menu.add_command(label="改名…", command=self.edit_rename)
+        self.tree_menu.add_separator()
+        self.tree_menu.add_command(label="选择要移动的人", command=self.edit_cut)
+        self.tree_menu.add_command(label="移到此人名下", command=self.edit_paste)
+        self.tree_menu.add_separator()
+        self.tree_menu.add_command(label="删除…", command=self.edit_delete)
+        
+        tree = self.tree_browser.tree
+        tree.bind('<Button-3>', self.show_tree_menu)
+        if sys.platform == 'darwin':
+            tree.bind('<Button-2>', self.show_tree_menu)
+        tree.bind('<F2>', lambda event: self.edit_rename())
+        tree.bind('<Delete>', lambda event: self.edit_delete())
+    
+    def show_tree_menu(self, event):
+        tree = self.tree_browser.tree
+        item = tree.identify_row(event.y)
+        if item:
+            tree.selection_set(item)
+            tree.focus(item)
+            self.tree_menu.tk_popup(event.x_root, event.y_root)
+    
+    def get_edit_target(self):
+        """结构浏览器中选中的人，没有可编辑的文件或没有选中时返回None"""
+        if self.document is None:
+            messagebox.showwarning("警告", "请先选择一个家谱文件")
+            return None
+        node = self.tree_browser.selected_node()
+        if node is None:
+            self.status_var.set("请先在结构浏览器中选择一个人")
+        return node
+    
+    def apply_edit(self, action, description):
+        """
+        执行一次修改并立即写回文件（只写修改过的部分），返回action的结果；修改被拒绝或写回失败时返回None
+        写回失败（文件已在其他程序中修改、没有写入权限、磁盘已满等）时内存中的家谱已与文件不符，
+        放弃这次修改，从文件重新打开
+        """
+        try:
+            result = action()
+        except ValueError as e:
+            messagebox.showerror("编辑失败", str(e))
+            return None
+        try:
+            written = self.document.save()
+        except (ValueError, OSError) as e:
+            self.on_file_select(None)
+            messagebox.showerror("保存失败", f"{e}\n\n这次修改没有保存，已从文件重新载入家谱。")
+            return None
+        self.status_var.set(f"{description}，已写回文件（{written} 字节）")
         return result
     
+    def edit_add_child(self):
+        node = self.get_edit_target()
+        if node is None:
+            return
+        name = tk.simpledialog.askstring("添加子女", f"{node['name']} 的子女姓名：")
+        if not name:
+            return
+        child = self.apply_edit(lambda: self.document.add_child(node, name), f"已添加：{name.strip()}")
+        if child is not None:
+            self.tree_browser.select_node(child)
+    
+    def edit_rename(self):
+        node = self.get_edit_target()
+        if node is None:
+            return
+        old_name = node['name']
+        name = tk.simpledialog.askstring("改名", "新的名字：", initialvalue=old_name)
+        if not name or name.strip() == old_name:
+            return
+        self.apply_edit(lambda: self.document.rename(node, name), f"已把 {old_name} 改名为 {name.strip()}")
+    
+    def edit_delete(self):
+        node = self.get_edit_target()
+        if node is None:
+            return
+        count = self.tree_browser.sizes.get(id(node), 1)
+        if not messagebox.askyesno("删除", f"删除 {node['name']} 及其全部后代（共 {count} 人）？"):
+            return
+        if self.cut_node is not None and self.document.is_ancestor(node, self.cut_node):
+            self.cut_node = None
+        self.apply_edit(lambda: self.document.delete(node), f"已删除 {count} 人")
+    
+    def edit_cut(self):
+        node = self.get_edit_target()
+        if node is None:
+            return
+        self.cut_node = node
+        self.status_var.set(f"将移动 {node['name']}：在目标上右键选择\"移到此人名下\"")
+    
+    def edit_paste(self):
+        node = self.get_edit_target()
+        if node is None:
+            return
+        if self.cut_node is None:
+            self.status_var.set("请先选择要移动的人")
+            return
+        moving, self.cut_node = self.cut_node, None
+        if self.apply_edit(lambda: self.document.move(moving, node),
+                           f"已把 {moving['name']} 移到 {node['name']} 名下") is not None:
+            self.tree_browser.select_node(moving)
+    
     def update_info_display(self, info):
         """更新信息显示"""
         self.info_text.config(state=tk.NORMAL)
@@ -322,116 +463,77 @@ class FamilyTreeGUI:
         # 在新线程中执行生成操作
         threading.Thread(target=self._generate_tree_thread, args=(selected_file,), daemon=True).start()
     
+    def get_scheduler(self):
+        """获取渲染调度器，首次调用时创建"""
+        if self.scheduler is None:
+            from render_scheduler import BackgroundScheduler
+            self.scheduler = BackgroundScheduler()
+        return self.scheduler
+    
+    def get_layout(self):
+        """布局方式"""
+        return 'compact' if self.compact_var.get() else 'classic'
+    
+    def get_max_nodes(self):
+        """最多显示人数，0或无效输入表示全部画出"""
+        try:
+            value = int(self.max_nodes_var.get())
+        except ValueError:
+            return None
+        return max(value, 2) if value > 0 else None
+    
+    def get_formats(self):
+        """输出格式（逗号分隔），为空时只生成PNG"""
+        return self.formats_var.get().strip() or None
+    
+    def find_data_file(self, filename):
+        """查找家谱数据文件"""
+        file_path = self.data_dir / f"{filename}.md"
+        if not file_path.exists() and not getattr(sys, 'frozen', False):
+            file_path = self.base_dir / "markdown_file" / f"{filename}.md"
+        
+        if not file_path.exists():
+            raise FileNotFoundError(f"找不到文件：{filename}.md")
+        return file_path
+    
     def _generate_tree_thread(self, filename):
-        """在线程中生成家谱图"""
+        """在线程中生成家谱图（交互优先级，优先于批量渲染）"""
         try:
             # 更新UI
             self.root.after(0, lambda: self.status_var.set("正在生成家谱图..."))
             self.root.after(0, lambda: self.progress.start())
             
-            # 导入并执行家谱生成逻辑
-            from main import (
-                NODE_WIDTH_HORIZONTAL, NODE_HEIGHT_HORIZONTAL,
-                NODE_WIDTH_VERTICAL, NODE_HEIGHT_VERTICAL,
-                PADDING_HORIZONTAL, PADDING_VERTICAL, LEVEL_SPACING,
-                Node, build_tree, calculate_depth, calculate_width,
-                calculate_positions, set_y_coordinates, draw_family_tree
-            )
+            from main import PREVIEW_WIDTH
             
-            # 查找并加载文件
-            file_path = self.data_dir / f"{filename}.md"
-            if not file_path.exists() and not getattr(sys, 'frozen', False):
-                file_path = self.base_dir / "markdown_file" / f"{filename}.md"
-            
-            if not file_path.exists():
-                raise FileNotFoundError(f"找不到文件：{filename}.md")
+            file_path = self.find_data_file(filename)
+            layout = self.get_layout()
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            # 预览生成后立即在窗口中显示
+            def on_preview(png_data):
+                self.root.after(0, lambda: self.show_preview(png_data, filename))
+                self.root.after(0, lambda: self.status_var.set("预览已显示，正在生成高清图片..."))
             
-            result = parse_markdown_family_tree(content)
-            family_data = result['data']
-            title = result.get('title', filename)
-            
-            if not family_data:
-                raise ValueError("家谱数据为空")
-            
-            # 设置字辈信息
-            GENERATIONS = family_data.get('generations', [])
-            
-            # 创建图形
-            plt.ioff()  # 关闭交互模式
-            fig, ax = plt.subplots(figsize=(20, 15))
-            ax.set_aspect('equal')
-            
-            # 构建和计算家谱树
-            root = build_tree(family_data)
-            calculate_depth(root)
-            calculate_positions(root)
-            set_y_coordinates(root)
-            
-            # 绘制家谱图
-            draw_family_tree(root, ax)
-            
-            # 收集所有节点用于设置图形范围
-            all_nodes = []
-            def collect_nodes(node):
-                all_nodes.append(node)
-                for child in node.children:
-                    collect_nodes(child)
-            
-            collect_nodes(root)
-            
-            if all_nodes:
-                min_x = min(node.x - node.width/2 for node in all_nodes) - 1
-                max_x = max(node.x + node.width/2 for node in all_nodes) + 1
-                min_y = min(node.y - node.height/2 for node in all_nodes) - 1
-                max_y = max(node.y + node.height/2 for node in all_nodes) + 1
-                
-                # 添加字辈标签
-                depths = sorted(set(node.depth for node in all_nodes))
-                
-                if GENERATIONS:
-                    for depth in depths:
-                        if depth < len(GENERATIONS):
-                            y_coord = next(node.y for node in all_nodes if node.depth == depth)
-                            
-                            if depth >= 2:
-                                label_height = NODE_HEIGHT_VERTICAL
-                            else:
-                                label_height = NODE_HEIGHT_HORIZONTAL
-                            
-                            label_bg = patches.FancyBboxPatch(
-                                (min_x - 4, y_coord - label_height/2),
-                                3.5, label_height,
-                                boxstyle="round,pad=0.1",
-                                linewidth=1,
-                                edgecolor='none',
-                                facecolor='#f0f0f0',
-                                alpha=0.8,
-                                zorder=2
-                            )
-                            ax.add_patch(label_bg)
-                            
-                            ax.text(min_x - 2.25, y_coord, GENERATIONS[depth], 
-                                   ha='center', va='center', fontsize=10, 
-                                   fontweight='bold', color='#333333', zorder=3)
-                
-                ax.set_xlim(min_x - 5, max_x)
-                plt.ylim(min_y, max_y)
+            future = self.get_scheduler().submit(
+                file_path, self.output_dir, layout, priority='interactive',
+                preview=self.preview_var.get(), profile=self.profile_var.get(),
+                on_preview=on_preview if self.preview_var.get() else None,
+                max_nodes=self.get_max_nodes(), formats=self.get_formats())
+            result = future.result()
+            output_path = Path(result['output_path'])
             
-            # 隐藏坐标轴和添加标题
-            plt.axis('off')
-            plt.title(title, fontsize=16, pad=20)
+            # 用高清图片替换预览
+            if self.preview_var.get():
+                final_preview = self._final_preview(output_path, PREVIEW_WIDTH)
+                if final_preview:
+                    self.root.after(0, lambda: self.show_preview(final_preview, filename, final=True))
             
-            # 保存文件
-            output_path = self.output_dir / f"{title}.png"
-            plt.savefig(output_path, dpi=300, bbox_inches='tight')
-            plt.close()
+            status = f"家谱图生成成功：{output_path.name}"
+            if result['profile']:
+                status += f"（{result['profile']}）"
             
             # 更新UI
             self.root.after(0, lambda: self.progress.stop())
-            self.root.after(0, lambda: self.status_var.set(f"家谱图生成成功：{output_path.name}"))
+            self.root.after(0, lambda: self.status_var.set(status))
             self.root.after(0, lambda: messagebox.showinfo("成功", f"家谱图生成成功！\n保存位置：{output_path}"))
             
         except Exception as e:
@@ -439,6 +541,116 @@ class FamilyTreeGUI:
             self.root.after(0, lambda: self.status_var.set("生成失败"))
             self.root.after(0, lambda: messagebox.showerror("错误", f"生成家谱图时出错：{str(e)}"))
     
+    def open_render_queue(self):
+        """打开渲染队列窗口（已打开时移到最前），返回窗口对象"""
+        if self.queue_panel is None or not self.queue_panel.exists():
+            from render_queue_panel import RenderQueuePanel
+            self.queue_panel = RenderQueuePanel(self)
+        else:
+            self.queue_panel.refresh_files()
+            self.queue_panel.window.lift()
+        return self.queue_panel
+    
+    def generate_all(self):
+        """把全部家谱文件加入渲染队列（批量优先级），期间仍可随时生成单个家谱图"""
+        filenames = list(self.file_combo['values'])
+        if not filenames:
+            messagebox.showwarning("警告", "没有可生成的家谱文件")
+            return
+        self.open_render_queue().add_files(filenames)
+    
+    def show_preview(self, png_data, title, final=False):
+        """在预览窗口中显示图片（在主线程中调用）"""
+        if self.preview_window is None or not self.preview_window.winfo_exists():
+            self.preview_window = tk.Toplevel(self.root)
+            self.preview_label = tk.Label(self.preview_window, bg="white")
+            self.preview_label.pack(fill=tk.BOTH, expand=True)
+        
+        image = tk.PhotoImage(data=base64.b64encode(png_data))
+        self.preview_label.configure(image=image)
+        self.preview_label.image = image  # 保持引用，防止图片被回收
+        
+        state = "" if final else "（正在生成高清图片...）"
+        self.preview_window.title(f"家谱图预览 - {title}{state}")
+    
+    def _final_preview(self, output_path, width, max_pixels=60_000_000):
+        """把生成的高清图片缩小为预览尺寸，图片过大时返回None"""
+        try:
+            from PIL import Image
+            with Image.open(output_path) as image:
+                if image.width * image.height > max_pixels:
+                    return None
+                image.thumbnail((width, width))
+                buffer = io.BytesIO()
+                image.save(buffer, format='PNG')
+                return buffer.getvalue()
+        except Exception:
+            return None
+    
+    def show_statistics(self):
+        """按代统计人数、子女数并检查字辈（在线程中计算，完成后显示统计表）"""
+        selected_file = self.file_var.get()
+        if not selected_file:
+            messagebox.showwarning("警告", "请先选择一个家谱文件")
+            return
+        self.status_var.set("正在统计...")
+        threading.Thread(target=self._statistics_thread, args=(selected_file,), daemon=True).start()
+    
+    def _statistics_thread(self, filename):
+        """在线程中统计"""
+        try:
+            from family_stats import family_stats, mismatch_examples
+            
+            with open(self.find_data_file(filename), 'r', encoding='utf-8') as f:
+                result = parse_markdown_family_tree(f.read())
+            if not result['data']:
+                raise ValueError("文件内容为空或格式不正确")
+            stats = family_stats(result['data'])
+            examples = mismatch_examples(stats, limit=200)
+            self.root.after(0, lambda: self._show_statistics_window(filename, stats, examples))
+            self.root.after(0, lambda: self.status_var.set(
+                f"统计完成：共 {stats['total']} 人，{stats['max_generation']} 代"))
+        except Exception as e:
+            self.root.after(0, lambda: self.status_var.set("统计失败"))
+            self.root.after(0, lambda: messagebox.showerror("错误", f"统计时出错：{str(e)}"))
+    
+    def _show_statistics_window(self, filename, stats, examples):
+        """显示统计表和字辈不符的人（在主线程中调用）"""
+        from family_stats import TABLE_COLUMNS
+        
+        window = tk.Toplevel(self.root)
+        window.title(f"统计分析 - {filename}")
+        window.geometry("640x480")
+        
+        tk.Label(window, text=f"共 {stats['total']} 人，{stats['max_generation']} 代",
+                 font=("Microsoft YaHei", 11)).pack(anchor=tk.W, padx=10, pady=(10, 5))
+        
+        table_frame = ttk.Frame(window)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+        keys = [key for key, _ in TABLE_COLUMNS]
+        table = ttk.Treeview(table_frame, columns=keys, show='headings', height=12)
+        for key, title in TABLE_COLUMNS:
+            table.heading(key, text=title)
+            table.column(key, width=80, anchor=tk.CENTER)
+        for row in stats['rows']:
+            table.insert('', tk.END, values=['' if row[key] is None else row[key] for key in keys])
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=table.yview)
+        table.configure(yscrollcommand=scrollbar.set)
+        table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # 名字中没有本代字辈的人
+        count = len(stats['mismatches'])
+        text = f"名字中没有本代字辈的共 {count} 人" + ("：" if count else "")
+        tk.Label(window, text=text, font=("Microsoft YaHei", 10)).pack(anchor=tk.W, padx=10, pady=(10, 0))
+        if examples:
+            listbox = tk.Listbox(window, height=8, font=("Microsoft YaHei", 9))
+            for name, generation, father in examples:
+                listbox.insert(tk.END, f"{name}（第{generation}代，父亲：{father}）")
+            if count > len(examples):
+                listbox.insert(tk.END, f"……还有 {count - len(examples)} 人")
+            listbox.pack(fill=tk.BOTH, expand=False, padx=10, pady=(5, 10))
+    
     def open_output_folder(self):
         """打开结果文件夹"""
         try:
@@ -543,6 +755,10 @@ def main():
     import tkinter.simpledialog
     tk.simpledialog = tkinter.simpledialog
     
+    # 打包环境中使用持久的matplotlib缓存目录，避免每次启动重建字体缓存
+    from mpl_cache import configure_matplotlib_cache
+    configure_matplotlib_cache()
+    
     root = tk.Tk()
     
     # 设置窗口图标（如果有的话）
@@ -556,6 +772,8 @@ def main():
     
     # 设置窗口关闭事件
     def on_closing():
+        if app.scheduler is not None:
+            app.scheduler.close()
         root.quit()
         root.destroy()
     
@@ -565,4 +783,5 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
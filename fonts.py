@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字体管理
+优先使用随程序发布的中文子集字体（fonts/目录下的.ttf或.otf文件），
+不依赖系统是否安装了黑体，在任何电脑上生成的图片都完全一致。
+字体在每个进程中只注册一次，FontProperties按字号缓存，所有节点文字和字辈标签共用。
+没有随程序发布的字体时，按顺序使用系统中已安装的中文字体，
+只把确实存在的字体写入字体列表，避免每次查找不存在的字体。
+
+生成子集字体（需要安装fontTools）：
+  python fonts.py build 思源黑体.otf                 # 常用汉字+家谱数据中出现的字
+  python fonts.py tree 思源黑体.otf 家谱数据/张氏家谱.md  # 只包含某个家谱中出现的字
+  python fonts.py info                                # 查看当前使用的字体
+"""
+
+import argparse
+import os
+import sys
+from functools import lru_cache
+
+import matplotlib
+from matplotlib import font_manager
+from matplotlib.font_manager import FontProperties
+
+FONT_EXTENSIONS = ('.ttf', '.otf')
+
+# 随程序发布的子集字体的默认文件名
+BUNDLED_FONT_NAME = '家谱字体.otf'
+
+# 子集字体使用独立的字体族名，不会与系统中安装的完整字体混淆
+SUBSET_FAMILY = 'FamilyTree Subset'
+
+# 系统中文字体（按优先级）
+SYSTEM_FALLBACKS = [
+    'SimHei', 'Microsoft YaHei', 'SimSun',
+    'Noto Sans CJK SC', 'Source Han Sans SC', 'WenQuanYi Micro Hei', 'PingFang SC',
+]
+
+# 最后的后备字体（matplotlib自带，用于西文字符）
+LATIN_FALLBACK = 'DejaVu Sans'
+
+
+def font_dir():
+    """随程序发布的字体目录（打包环境中位于资源目录内）"""
+    if getattr(sys, 'frozen', False):
+        base = getattr(sys, '_MEIPASS', os.path.dirname(sys.executable))
+    else:
+        base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base, 'fonts')
+
+
+def bundled_font_files():
+    """随程序发布的字体文件列表"""
+    directory = font_dir()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(FONT_EXTENSIONS))
+
+
+@lru_cache(maxsize=None)
+def setup_fonts():
+    """
+    注册随程序发布的字体并设置matplotlib的默认字体（每个进程只执行一次）
+    返回使用的字体族名列表
+    """
+    families = []
+    for path in bundled_font_files():
+        try:
+            font_manager.fontManager.addfont(path)
+        except (OSError, RuntimeError):
+            continue
+        name = FontProperties(fname=path).get_name()
+        if name not in families:
+            families.append(name)
+
+    available = {entry.name for entry in font_manager.fontManager.ttflist}
+    families += [name for name in SYSTEM_FALLBACKS if name in available and name not in families]
+    if LATIN_FALLBACK not in families:
+        families.append(LATIN_FALLBACK)
+
+    matplotlib.rcParams['font.family'] = ['sans-serif']
+    matplotlib.rcParams['font.sans-serif'] = families
+    matplotlib.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+    return tuple(families)
+
+
+@lru_cache(maxsize=None)
+def get_font_properties(size=None, weight='normal'):
+    """获取缓存的FontProperties（所有文字共用，不再逐个查找字体）"""
+    return FontProperties(family=list(setup_fonts()), size=size, weight=weight)
+
+
+def collect_characters(node, chars=None):
+    """收集家谱数据中出现的全部字符"""
+    if chars is None:
+        chars = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        chars.update(current.get('name', ''))
+        stack.extend(current.get('children', []))
+    return chars
+
+
+def common_characters():
+    """常用汉字（GB2312一级汉字，3755个）、ASCII可打印字符和常用中文标点"""
+    chars = {chr(code) for code in range(0x20, 0x7f)}
+    chars.update('，。、：；！？（）《》“”‘’·…—【】')
+    for high in range(0xB0, 0xD8):
+        for low in range(0xA1, 0xFF):
+            try:
+                chars.add(bytes((high, low)).decode('gb2312'))
+            except UnicodeDecodeError:
+                pass
+    return chars
+
+
+def subset_font(source_path, output_path, characters):
+    """用fontTools把字体裁剪为只包含指定字符的子集"""
+    try:
+        from fontTools import subset
+    except ImportError:
+        raise RuntimeError("生成子集字体需要安装fontTools：pip install fonttools")
+
+    options = subset.Options()
+    options.layout_features = ['*']
+    options.name_IDs = ['*']
+    options.notdef_outline = True
+    font = subset.load_font(source_path, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=''.join(sorted(characters)))
+    subsetter.subset(font)
+    for record in font['name'].names:
+        if record.nameID in (1, 16):
+            record.string = SUBSET_FAMILY
+        elif record.nameID in (3, 4):
+            record.string = f"{SUBSET_FAMILY} Regular"
+        elif record.nameID == 6:
+            record.string = SUBSET_FAMILY.replace(' ', '') + '-Regular'
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    subset.save_font(font, output_path, options)
+    return output_path
+
+
+def missing_characters(characters, font_path):
+    """字体中缺少的字符"""
+    from matplotlib.ft2font import FT2Font
+    cmap = FT2Font(font_path).get_charmap()
+    return sorted(char for char in characters if ord(char) not in cmap and not char.isspace())
+
+
+def _markdown_characters(paths):
+    from markdown_parser import parse_markdown_family_tree
+
+    chars = set()
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = parse_markdown_family_tree(f.read())
+        if result['data']:
+            collect_characters(result['data'], chars)
+            for generation in result['data'].get('generations', []):
+                chars.update(generation)
+        chars.update(result.get('title') or '')
+    return chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成和查看家谱图使用的中文字体")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="生成随程序发布的子集字体（常用汉字+家谱数据中的字）")
+    build.add_argument('source', help="完整的中文字体文件（.ttf或.otf）")
+    build.add_argument('--data-dir', default='家谱数据', help="家谱数据目录")
+    build.add_argument('--output', default=os.path.join(font_dir(), BUNDLED_FONT_NAME), help="输出文件")
+
+    tree = commands.add_parser('tree', help="生成只包含某个家谱中出现的字的子集字体")
+    tree.add_argument('source', help="完整的中文字体文件（.ttf或.otf）")
+    tree.add_argument('markdown', nargs='+', help="家谱Markdown文件")
+    tree.add_argument('--output', required=True, help="输出文件")
+
+    commands.add_parser('info', help="显示当前使用的字体")
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        print("字体目录：", font_dir())
+        for path in bundled_font_files():
+            print("  随程序发布：", path)
+        print("字体列表：", '、'.join(setup_fonts()))
+        return
+
+    if args.command == 'build':
+        chars = common_characters()
+        if os.path.isdir(args.data_dir):
+            chars |= _markdown_characters(os.path.join(args.data_dir, name)
+                                          for name in os.listdir(args.data_dir) if name.endswith('.md'))
+    else:
+        chars = _markdown_characters(args.markdown)
+        chars.update(chr(code) for code in range(0x30, 0x3a))  # 页码等数字
+
+    subset_font(args.source, args.output, chars)
+    missing = missing_characters(chars, args.output)
+    print(f"已生成 {args.output}（{len(chars)} 个字符，{os.path.getsize(args.output) / 1024:.0f} KB）")
+    if missing:
+        print(f"源字体中缺少 {len(missing)} 个字符：{''.join(missing[:50])}")
+
+
+if __name__ == "__main__":
+    main()
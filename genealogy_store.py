@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+家谱数据库（SQLite，可选）
+把解析好的家谱批量写入SQLite数据库，统计和查询不必再逐个解析Markdown文件。
+
+每个人一行，除父节点编号和代数外，还按嵌套集合（nested set）保存先序遍历的左右编号
+lft/rgt：某人的全部后代正好是同一家谱中 lft 落在 (lft, rgt) 区间内的人，
+用 (tree_id, lft) 索引的一次范围查询即可取出；子树人数为 (rgt - lft - 1) / 2。
+祖先沿 parent_id 主键逐代向上查找（一条递归SQL语句，查找次数等于代数）。
+
+写入时只遍历一次家谱，在同一个事务中用 executemany 批量插入，
+百万人的家谱几秒内即可写入。export_tree 把数据还原为与 parse_markdown_family_tree
+结果格式相同的结构，可直接用于生成家谱图。
+
+配偶、过继标注和人物属性（[配:…]、[出继:@…]、{生:…}）按Markdown中的写法保存在 annotation 列，
+没有标注的人为NULL；导出时原样写回，导入再导出不会丢失这些信息。
+
+用法：
+  python genealogy_store.py ingest 家谱数据              # 导入目录中的全部家谱（未修改的文件跳过）
+  python genealogy_store.py list                         # 列出数据库中的家谱
+  python genealogy_store.py find 俊盛                     # 按名字查找
+  python genealogy_store.py descendants 俊盛 --tree 文达祖后藤图
+  python genealogy_store.py ancestors 方程 --tree 文达祖后藤图
+  python genealogy_store.py export 文达祖后藤图 --output 文达祖后藤图.md
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from array import array
+from itertools import islice, repeat
+
+from markdown_parser import LINK_SPOUSE, has_relations, parse_markdown_family_tree
+
+# 默认数据库文件
+DEFAULT_DB = '家谱.db'
+
+# 每批插入的行数
+BATCH_SIZE = 50000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trees (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE,
+    generations TEXT NOT NULL DEFAULT '[]',
+    people INTEGER NOT NULL DEFAULT 0,
+    source TEXT,
+    source_mtime REAL,
+    source_size INTEGER
+);
+CREATE TABLE IF NOT EXISTS people (
+    id INTEGER PRIMARY KEY,
+    tree_id INTEGER NOT NULL,
+    parent_id INTEGER,
+    name TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    lft INTEGER NOT NULL,
+    rgt INTEGER NOT NULL,
+    annotation TEXT
+);
+"""
+
+# 索引：(tree_id, lft) 用于后代查询，name 用于按名字查找，parent_id 用于查找子女
+INDEX_STATEMENTS = [
+    'CREATE INDEX IF NOT EXISTS people_nested ON people (tree_id, lft)',
+    'CREATE INDEX IF NOT EXISTS people_name ON people (name)',
+    'CREATE INDEX IF NOT EXISTS people_parent ON people (parent_id)',
+]
+INDEX_NAMES = ['people_nested', 'people_name', 'people_parent']
+
+# 查询结果的列
+PERSON_COLUMNS = 'id, tree_id, parent_id, name, depth, lft, rgt'
+
+
+def annotation_text(data, raw_attributes=None):
+    """一个人名字后面的标注（与Markdown中的写法相同，前面带空格），没有标注时返回None"""
+    parts = []
+    spouses = list(data.get('spouses', []))
+    adopted = []
+    for link in data.get('links', []):
+        if link['type'] == LINK_SPOUSE:
+            spouses.append('@' + link['target'])
+        else:
+            adopted.append('@' + link['target'])
+    if spouses:
+        parts.append(f"[配:{'、'.join(spouses)}]")
+    if adopted:
+        parts.append(f"[出继:{'、'.join(adopted)}]")
+    if raw_attributes is not None:
+        parts.append(f'{{{raw_attributes}}}')
+    return ' ' + ' '.join(parts) if parts else None
+
+
+def annotation_column(family_data, attributes=None):
+    """按先序遍历顺序每个人的标注（见 annotation_text）；整个家谱都没有标注时返回None"""
+    if not has_relations(family_data) and not attributes:
+        return None
+    annotations = []
+    stack = [family_data]
+    while stack:
+        data = stack.pop()
+        raw = attributes.raw(len(annotations)) if attributes else None
+        annotations.append(annotation_text(data, raw))
+        stack.extend(reversed(data.get('children', [])))
+    return annotations
+
+
+def nested_set_columns(family_data):
+    """
+    按先序遍历计算每个人的父节点序号（根节点为-1）、代数、名字和左右编号，按列返回
+    迭代遍历，不受递归深度限制；右编号在离开子树时补上。
+    数值列使用 array，不为每个人创建对象（百万人时垃圾回收的开销很大）
+    """
+    parents = array('q')
+    depths = array('i')
+    lfts = array('q')
+    rgts = array('q')
+    names = []
+    counter = 1
+    # 栈中元素：(节点数据, 父节点序号, 代数)，或离开子树时的序号（整数）
+    stack = [(family_data, -1, 0)]
+    while stack:
+        item = stack.pop()
+        if item.__class__ is int:
+            rgts[item] = counter
+            counter += 1
+            continue
+        data, parent, depth = item
+        index = len(names)
+        parents.append(parent)
+        depths.append(depth)
+        names.append(data.get('name', ''))
+        lfts.append(counter)
+        rgts.append(0)
+        counter += 1
+        stack.append(index)
+        children = data.get('children')
+        if children:
+            stack.extend((child, index, depth + 1) for child in reversed(children))
+    return parents, depths, names, lfts, rgts
+
+
+class GenealogyStore:
+    """SQLite家谱数据库"""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.executescript(SCHEMA)
+        # 旧版本创建的数据库没有 annotation 列
+        columns = [row['name'] for row in self.connection.execute('PRAGMA table_info(people)')]
+        if 'annotation' not in columns:
+            self.connection.execute('ALTER TABLE people ADD COLUMN annotation TEXT')
+        for statement in INDEX_STATEMENTS:
+            self.connection.execute(statement)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ---------- 写入 ----------
+
+    def ingest(self, family_data, title, source=None, attributes=None):
+        """
+        写入一个家谱（同名家谱先删除），返回人数
+        attributes为 parse_markdown_family_tree 结果中的人物属性附表
+        整个家谱在一个事务中写入，中途出错时数据库保持不变
+        """
+        generations = list(family_data.get('generations', [])) if family_data else []
+        mtime = size = None
+        if source is not None:
+            stat = os.stat(source)
+            mtime, size = stat.st_mtime, stat.st_size
+
+        with self.connection:
+            self._delete(title)
+            cursor = self.connection.execute(
+                'INSERT INTO trees (title, generations, source, source_mtime, source_size) VALUES (?, ?, ?, ?, ?)',
+                (title, json.dumps(generations, ensure_ascii=False), source, mtime, size))
+            tree_id = cursor.lastrowid
+            count = 0
+            if family_data:
+                count = self._insert_people(tree_id, nested_set_columns(family_data),
+                                            annotation_column(family_data, attributes))
+            self.connection.execute('UPDATE trees SET people = ? WHERE id = ?', (count, tree_id))
+        return count
+
+    def _insert_people(self, tree_id, columns, annotations=None):
+        """
+        批量插入一个家谱的全部人，返回人数（annotations为每人的标注，None表示都没有）
+        新写入的人数超过库中已有人数时，先删除索引，写完后在同一事务中重建（比逐行更新索引快得多）
+        """
+        parents, depths, names, lfts, rgts = columns
+        first_id = self.connection.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM people').fetchone()[0]
+        existing = self.connection.execute('SELECT COUNT(*) FROM people').fetchone()[0]
+        rebuild = len(names) > max(existing, BATCH_SIZE)
+        if rebuild:
+            for name in INDEX_NAMES:
+                self.connection.execute(f'DROP INDEX IF EXISTS {name}')
+
+        # 父节点序号在SQL中换算为编号，根节点（序号-1）的父节点为NULL
+        sql = (f'INSERT INTO people ({PERSON_COLUMNS}, annotation) '
+               f'VALUES (?, ?, NULLIF(? + {int(first_id)}, {int(first_id) - 1}), ?, ?, ?, ?, ?)')
+        rows = zip(range(first_id, first_id + len(names)), repeat(tree_id), parents, names, depths, lfts, rgts,
+                   annotations if annotations is not None else repeat(None))
+        while True:
+            batch = list(islice(rows, BATCH_SIZE))
+            if not batch:
+                break
+            self.connection.executemany(sql, batch)
+
+        if rebuild:
+            for statement in INDEX_STATEMENTS:
+                self.connection.execute(statement)
+        return len(names)
+
+    def ingest_markdown(self, markdown_path, force=False):
+        """
+        导入一个Markdown家谱文件，返回人数；文件自上次导入后没有修改时跳过，返回None
+        标题取文件中的"# 标题"，没有时使用文件名
+        """
+        markdown_path = os.path.abspath(markdown_path)
+        if not force:
+            stat = os.stat(markdown_path)
+            row = self.connection.execute(
+                'SELECT 1 FROM trees WHERE source = ? AND source_mtime = ? AND source_size = ?',
+                (markdown_path, stat.st_mtime, stat.st_size)).fetchone()
+            if row:
+                return None
+        with open(markdown_path, 'r', encoding='utf-8') as f:
+            result = parse_markdown_family_tree(f.read())
+        title = result.get('title') or os.path.splitext(os.path.basename(markdown_path))[0]
+        return self.ingest(result['data'], title, source=markdown_path, attributes=result['attributes'])
+
+    def ingest_directory(self, data_dir, force=False):
+        """导入目录中的全部Markdown家谱，返回 {文件名: 人数或None（未修改，已跳过）}"""
+        results = {}
+        for name in sorted(os.listdir(data_dir)):
+            if name.endswith('.md'):
+                results[name] = self.ingest_markdown(os.path.join(data_dir, name), force)
+        return results
+
+    def delete(self, title):
+        """删除一个家谱"""
+        with self.connection:
+            self._delete(title)
+
+    def _delete(self, title):
+        row = self.connection.execute('SELECT id FROM trees WHERE title = ?', (title,)).fetchone()
+        if row:
+            self.connection.execute('DELETE FROM people WHERE tree_id = ?', (row['id'],))
+            self.connection.execute('DELETE FROM trees WHERE id = ?', (row['id'],))
+
+    # ---------- 查询 ----------
+
+    def trees(self):
+        """全部家谱：[(标题, 人数)]"""
+        return [(row['title'], row['people'])
+                for row in self.connection.execute('SELECT title, people FROM trees ORDER BY title')]
+
+    def tree_id(self, title):
+        row = self.connection.execute('SELECT id FROM trees WHERE title = ?', (title,)).fetchone()
+        if row is None:
+            raise KeyError(f"数据库中没有家谱：{title}")
+        return row['id']
+
+    def find(self, name, title=None):
+        """按名字查找，返回 [(家谱标题, 人)]"""
+        sql = (f'SELECT t.title, {", ".join("p." + c for c in PERSON_COLUMNS.split(", "))} '
+               'FROM people p JOIN trees t ON t.id = p.tree_id WHERE p.name = ?')
+        params = [name]
+        if title is not None:
+            sql += ' AND t.title = ?'
+            params.append(title)
+        return [(row['title'], row) for row in self.connection.execute(sql + ' ORDER BY p.id', params)]
+
+    def person(self, person_id):
+        return self.connection.execute(f'SELECT {PERSON_COLUMNS} FROM people WHERE id = ?',
+                                       (person_id,)).fetchone()
+
+    def descendants(self, person_id, max_depth=None):
+        """全部后代（先序遍历顺序），max_depth为最多向下查找的代数"""
+        sql = (f'SELECT {", ".join("d." + c for c in PERSON_COLUMNS.split(", "))} '
+               'FROM people p JOIN people d ON d.tree_id = p.tree_id AND d.lft > p.lft AND d.lft < p.rgt '
+               'WHERE p.id = ?')
+        params = [person_id]
+        if max_depth is not None:
+            sql += ' AND d.depth <= p.depth + ?'
+            params.append(max_depth)
+        return self.connection.execute(sql + ' ORDER BY d.lft', params).fetchall()
+
+    def ancestors(self, person_id):
+        """全部祖先（从父亲到始祖）"""
+        return self.connection.execute(
+            f'WITH RECURSIVE chain(id) AS ('
+            f'  SELECT parent_id FROM people WHERE id = ?'
+            f'  UNION ALL SELECT p.parent_id FROM people p JOIN chain c ON p.id = c.id'
+            f') SELECT {", ".join("p." + c for c in PERSON_COLUMNS.split(", "))} '
+            f'FROM chain c JOIN people p ON p.id = c.id ORDER BY p.depth DESC',
+            (person_id,)).fetchall()
+
+    def subtree_size(self, person_id):
+        """本人及全部后代的人数（由左右编号直接算出）"""
+        row = self.connection.execute('SELECT (rgt - lft + 1) / 2 FROM people WHERE id = ?',
+                                      (person_id,)).fetchone()
+        return row[0] if row else 0
+
+    def generation_counts(self, title):
+        """每一代的人数：[(代数, 人数)]"""
+        return [tuple(row) for row in self.connection.execute(
+            'SELECT depth, COUNT(*) FROM people WHERE tree_id = ? GROUP BY depth ORDER BY depth',
+            (self.tree_id(title),))]
+
+    # ---------- 导出 ----------
+
+    def export_tree(self, title, root_id=None):
+        """
+        还原为与 parse_markdown_family_tree 结果格式相同的结构：{'title': ..., 'data': ..., 'attributes': ...}
+        root_id为某人的编号时只导出以他为根的子树
+        有标注的家谱按Markdown重新解析，得到配偶、过继关系和人物属性附表；
+        子树中的关系引用了子树以外的人时抛出ValueError
+        """
+        row = self.connection.execute('SELECT id, generations FROM trees WHERE title = ?', (title,)).fetchone()
+        if row is None:
+            raise KeyError(f"数据库中没有家谱：{title}")
+        generations = json.loads(row['generations'])
+        if root_id is None:
+            cursor = self.connection.execute(
+                'SELECT id, parent_id, name, annotation FROM people WHERE tree_id = ? ORDER BY lft',
+                (row['id'],))
+        else:
+            cursor = self.connection.execute(
+                'SELECT d.id, d.parent_id, d.name, d.annotation FROM people p '
+                'JOIN people d ON d.tree_id = p.tree_id AND d.lft >= p.lft AND d.lft < p.rgt '
+                'WHERE p.id = ? AND p.tree_id = ? ORDER BY d.lft', (root_id, row['id']))
+
+        # 按先序遍历顺序读出，父节点总在子节点之前
+        root = None
+        nodes = {}
+        annotated = {}  # 先序编号 -> 标注
+        for person_id, parent_id, name, annotation in cursor:
+            node = {'name': name}
+            if annotation is not None:
+                annotated[len(nodes)] = annotation
+            nodes[person_id] = node
+            parent = nodes.get(parent_id)
+            if parent is None:
+                root = node
+            else:
+                parent.setdefault('children', []).append(node)
+        if root is not None and generations and root_id is None:
+            root['generations'] = generations
+        if annotated:
+            return parse_markdown_family_tree(to_markdown(title, root, annotations=annotated))
+        return {'title': title, 'data': root, 'attributes': None}
+
+
+def to_markdown(title, family_data, attributes=None, annotations=None):
+    """
+    把家谱数据写为Markdown格式（与 parse_markdown_family_tree 的输入格式相同）
+    配偶、过继关系取自节点数据，人物属性取自attributes附表；
+    annotations为 {先序编号: 标注文本} 时直接使用这些标注
+    """
+    lines = [f'# {title}']
+    generations = family_data.get('generations') if family_data else None
+    if generations:
+        lines.append(f"## 字辈: {','.join(generations)}")
+    stack = [(family_data, 0)] if family_data else []
+    node_id = 0
+    while stack:
+        data, depth = stack.pop()
+        if annotations is not None:
+            annotation = annotations.get(node_id)
+        else:
+            annotation = annotation_text(data, attributes.raw(node_id) if attributes else None)
+        lines.append(f"{'  ' * depth}- {data.get('name', '')}{annotation or ''}")
+        stack.extend((child, depth + 1) for child in reversed(data.get('children', [])))
+        node_id += 1
+    return '\n'.join(lines) + '\n'
+
+
+def _print_people(rows):
+    for row in rows:
+        print(f"  [{row['id']}] {'  ' * row['depth']}{row['name']}（第{row['depth'] + 1}代）")
+
+
+def _resolve(store, name, title):
+    """按名字找到唯一的人"""
+    matches = store.find(name, title)
+    if not matches:
+        raise SystemExit(f"找不到：{name}")
+    if len(matches) > 1:
+        print(f"找到 {len(matches)} 个同名的人，使用第一个（可用 --tree 指定家谱）")
+    return matches[0][1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="家谱数据库（SQLite）")
+    parser.add_argument('--db', default=DEFAULT_DB, help="数据库文件")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="导入Markdown家谱（目录或文件）")
+    ingest.add_argument('paths', nargs='+', help="家谱数据目录或.md文件")
+    ingest.add_argument('--force', action='store_true', help="重新导入未修改的文件")
+
+    commands.add_parser('list', help="列出数据库中的家谱")
+
+    find = commands.add_parser('find', help="按名字查找")
+    find.add_argument('name')
+    find.add_argument('--tree', default=None, help="家谱标题")
+
+    for command, help_text in (('descendants', "列出某人的全部后代"), ('ancestors', "列出某人的全部祖先")):
+        sub = commands.add_parser(command, help=help_text)
+        sub.add_argument('name')
+        sub.add_argument('--tree', default=None, help="家谱标题")
+
+    export = commands.add_parser('export', help="导出为Markdown或JSON")
+    export.add_argument('title')
+    export.add_argument('--output', required=True, help="输出文件（.md或.json）")
+    args = parser.parse_args()
+
+    with GenealogyStore(args.db) as store:
+        if args.command == 'ingest':
+            for path in args.paths:
+                results = (store.ingest_directory(path, args.force) if os.path.isdir(path)
+                           else {os.path.basename(path): store.ingest_markdown(path, args.force)})
+                for name, count in results.items():
+                    print(f"  {name}: {'未修改，跳过' if count is None else f'{count} 人'}")
+        elif args.command == 'list':
+            for title, count in store.trees():
+                print(f"  {title}: {count} 人")
+        elif args.command == 'find':
+            for title, row in store.find(args.name, args.tree):
+                print(f"  {title} [{row['id']}] {row['name']}（第{row['depth'] + 1}代，"
+                      f"含后代共 {store.subtree_size(row['id'])} 人）")
+        elif args.command == 'descendants':
+            person = _resolve(store, args.name, args.tree)
+            rows = store.descendants(person['id'])
+            print(f"{person['name']} 的后代共 {len(rows)} 人：")
+            _print_people(rows)
+        elif args.command == 'ancestors':
+            person = _resolve(store, args.name, args.tree)
+            rows = store.ancestors(person['id'])
+            print(f"{person['name']} 的祖先：{' ← '.join(row['name'] for row in rows)}")
+        elif args.command == 'export':
+            result = store.export_tree(args.title)
+            with open(args.output, 'w', encoding='utf-8') as f:
+                if args.output.lower().endswith('.json'):
+                    json.dump(result['data'], f, ensure_ascii=False, indent=2)
+                else:
+                    f.write(to_markdown(result['title'], result['data'], result['attributes']))
+            print(f"已导出: {args.output}")
+            if result['attributes'] and args.output.lower().endswith('.json'):
+                print("注意：JSON格式不保存人物属性（生卒年、备注等），需要时请导出为.md文件")
+
+
+if __name__ == "__main__":
+    main()
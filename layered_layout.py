@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分层布局（有配偶、过继、跨支联姻的家谱）
+家谱中有 [配:...]、[出继:...] 关系（见 markdown_parser）时，结构不再是一棵树，
+按Sugiyama方法分层布局：
+
+1. 分层：每个人在自己的代数一层，与字辈标签对齐；配偶与本人同层，紧挨在本人右侧
+2. 虚拟节点：跨越多代的过继关系在中间各层插入虚拟节点，使所有连线只连接相邻两层
+3. 减少交叉：先按先序遍历确定初始顺序（树形部分没有交叉），再交替向下、向上按
+   邻居位置的重心排序，保留交叉数最少的顺序（只统计有过继连线的相邻层）；
+   兄弟姐妹整组移动并保持排行，只有虚拟节点单独排序
+4. 坐标：每层按顺序排列，交替把节点移向邻居的平均位置，再用前缀最大值一次求出
+   满足最小间距的位置；最后一遍向上，父节点位于子节点的正上方
+
+各步骤都是按层的NumPy向量运算，总耗时与人数基本成线性关系。
+没有这些关系的家谱仍使用 main.compute_geometry 的树形布局。
+"""
+
+import numpy as np
+
+from main import (
+    SIBLING_GAP, SUBTREE_GAP, build_tree, calculate_depth, collect_geometry, set_y_coordinates,
+)
+from markdown_parser import LINK_ADOPTED_BY, PersonIndex
+from profiler import RenderProfiler
+
+# 配偶与本人之间的空隙
+SPOUSE_GAP = 0.4
+
+# 虚拟节点的宽度
+DUMMY_WIDTH = 0.2
+
+# 减少交叉的轮数（每轮向下、向上各一遍）
+ORDERING_ROUNDS = 4
+
+# 计算坐标的遍数（向上、向下交替，最后一遍向上）
+COORDINATE_PASSES = 3
+
+# 连线类型（geometry['link_kinds']）
+LINK_KIND_SPOUSE = 0
+LINK_KIND_ADOPTION = 1
+
+
+def _preorder(root):
+    """先序遍历的节点列表和父节点编号"""
+    nodes, parents = [], []
+    stack = [(root, -1)]
+    while stack:
+        node, parent = stack.pop()
+        index = len(nodes)
+        nodes.append(node)
+        parents.append(parent)
+        stack.extend((child, index) for child in reversed(node.children))
+    return nodes, parents
+
+
+def _count_crossings(upper_pos, lower_pos):
+    """两层之间直线连线的交叉数（按上端排序后，下端序列的逆序对数）"""
+    if len(upper_pos) < 2:
+        return 0
+    order = np.lexsort((lower_pos, upper_pos))
+    sequence = lower_pos[order]
+    size = int(sequence.max()) + 1
+    tree = [0] * (size + 1)  # 树状数组，统计已出现的下端位置
+    crossings = 0
+    for seen, value in enumerate(sequence.tolist()):
+        # 已出现且大于当前值的个数
+        i = value + 1
+        not_greater = 0
+        while i > 0:
+            not_greater += tree[i]
+            i -= i & -i
+        crossings += seen - not_greater
+        i = value + 1
+        while i <= size:
+            tree[i] += 1
+            i += i & -i
+    return crossings
+
+
+def _project(desired, separation):
+    """
+    按顺序排列的节点尽量放在desired位置，且相邻节点的距离不小于separation
+    分别求向右推开和向左推开的解（前缀最大值/最小值），取两者的平均
+    """
+    offsets = np.concatenate([[0.0], np.cumsum(separation)])
+    shifted = desired - offsets
+    right = np.maximum.accumulate(shifted)
+    left = np.minimum.accumulate(shifted[::-1])[::-1]
+    return offsets + (right + left) / 2
+
+
+class _LayeredLayout:
+    """分层布局的中间数据：单元（本人连同配偶，或虚拟节点）、层和相邻层之间的边"""
+
+    def __init__(self, nodes, parents, index):
+        self.nodes = nodes
+        count = len(nodes)
+        layer = [node.depth for node in nodes]
+        width = []
+        self.spouses = []  # 每人的配偶名字（不在家谱中的配偶）
+        for node in nodes:
+            spouses = list(node.data.get('spouses', []))
+            self.spouses.append(spouses)
+            width.append(node.width * (1 + len(spouses)) + SPOUSE_GAP * len(spouses))
+
+        # 相邻层之间的边：树形边，以及过继关系经过虚拟节点的各段
+        upper = parents[1:]
+        lower = list(range(1, count))
+        primary = [-1] + parents[1:]  # 确定初始顺序时使用的上层邻居
+        group = list(parents)         # 同一组的兄弟之间使用较小的间距
+        self.adoptions = []  # (过继给的人, 本人, 虚拟节点列表)
+        self.marriages = set()  # 家谱中两人之间的联姻
+        for person, node in enumerate(nodes):
+            for link in node.data.get('links', []):
+                try:
+                    target = index.resolve(link['target'])
+                except ValueError:
+                    continue  # 被折叠的人（见 level_of_detail）
+                if target == person:
+                    continue
+                if link['type'] != LINK_ADOPTED_BY:
+                    self.marriages.add((min(person, target), max(person, target)))
+                    continue
+                dummies = []
+                if layer[target] < layer[person]:
+                    previous = target
+                    for depth in range(layer[target] + 1, layer[person]):
+                        dummy = len(layer)
+                        layer.append(depth)
+                        width.append(DUMMY_WIDTH)
+                        primary.append(previous)
+                        group.append(-1 - dummy)
+                        upper.append(previous)
+                        lower.append(dummy)
+                        dummies.append(dummy)
+                        previous = dummy
+                    upper.append(previous)
+                    lower.append(person)
+                self.adoptions.append((target, person, dummies))
+
+        self.person_count = count
+        self.layer = np.array(layer, dtype=np.int64)
+        self.width = np.array(width, dtype=float)
+        self.primary = np.array(primary, dtype=np.int64)
+        self.group = np.array(group, dtype=np.int64)
+        self.upper = np.array(upper, dtype=np.int64)
+        self.lower = np.array(lower, dtype=np.int64)
+        self.layers = [np.flatnonzero(self.layer == depth) for depth in range(int(self.layer.max()) + 1)]
+
+        # 按下端所在的层分组的边
+        edge_layer = self.layer[self.lower]
+        order = np.argsort(edge_layer, kind='stable')
+        bounds = np.searchsorted(edge_layer[order], np.arange(len(self.layers) + 1))
+        self.edges = [order[bounds[depth]:bounds[depth + 1]] for depth in range(len(self.layers))]
+        # 有非树形边（过继）的层，减少交叉时统计这些层的交叉数
+        extra = np.arange(len(self.lower)) >= count - 1
+        self.crossing_layers = sorted(set(edge_layer[extra].tolist()))
+
+    def _neighbor_mean(self, units, edges, downward, values):
+        """units中每个单元在上一层（downward）或下一层的邻居的values平均值，没有邻居时为自身的值"""
+        mine, theirs = (self.lower, self.upper) if downward else (self.upper, self.lower)
+        slots = np.empty(len(self.layer), dtype=np.int64)
+        slots[units] = np.arange(len(units))
+        local = slots[mine[edges]]
+        total = np.bincount(local, weights=values[theirs[edges]], minlength=len(units))
+        count = np.bincount(local, minlength=len(units))
+        return np.where(count > 0, total / np.maximum(count, 1), values[units])
+
+    # ---------- 减少交叉 ----------
+
+    def initial_order(self):
+        """按先序遍历排列：每层按上层邻居的位置排序，同一父节点的子女保持原来的顺序"""
+        position = np.zeros(len(self.layer), dtype=float)
+        for units in self.layers[1:]:
+            ordered = units[np.lexsort((units, position[self.primary[units]]))]
+            position[ordered] = np.arange(len(ordered))
+        return position
+
+    def _sweep(self, position, downward):
+        """
+        按相邻一层邻居位置的重心重新排列每一层
+        同一父节点的子女作为一块，按全组的平均重心排序，组内保持家谱中的排行，
+        过继出去的人也留在生父的子女中间；只有虚拟节点单独移动
+        """
+        size = np.zeros(len(self.layer), dtype=float)
+        for units in self.layers:
+            size[units] = len(units)
+        relative = (position + 0.5) / size
+        depths = range(1, len(self.layers)) if downward else range(len(self.layers) - 2, -1, -1)
+        for depth in depths:
+            units = self.layers[depth]
+            edges = self.edges[depth] if downward else self.edges[depth + 1]
+            key = self._neighbor_mean(units, edges, downward, relative)
+            _, group = np.unique(self.group[units], return_inverse=True)
+            count = np.bincount(group)
+            group_key = np.bincount(group, weights=key) / count
+            # 重心相同的组保持原来的先后
+            group_position = np.bincount(group, weights=position[units]) / count
+            ordered = units[np.lexsort((units, group, group_position[group], group_key[group]))]
+            position[ordered] = np.arange(len(ordered))
+            relative[ordered] = (np.arange(len(ordered)) + 0.5) / len(ordered)
+        return position
+
+    def crossings(self, position):
+        total = 0
+        for depth in self.crossing_layers:
+            edges = self.edges[depth]
+            total += _count_crossings(position[self.upper[edges]].astype(np.int64),
+                                      position[self.lower[edges]].astype(np.int64))
+        return total
+
+    def order(self):
+        best = self.initial_order()
+        best_crossings = self.crossings(best)
+        position = best.copy()
+        for _ in range(ORDERING_ROUNDS):
+            if not best_crossings:
+                break
+            for downward in (True, False):
+                position = self._sweep(position, downward)
+                crossings = self.crossings(position)
+                if crossings < best_crossings:
+                    best, best_crossings = position.copy(), crossings
+        return best, best_crossings
+
+    # ---------- 坐标 ----------
+
+    def coordinates(self, position):
+        """单元中心的x坐标"""
+        x = np.zeros(len(self.layer), dtype=float)
+        ordered_layers = []
+        for units in self.layers:
+            ordered = units[np.argsort(position[units], kind='stable')]
+            widths = self.width[ordered]
+            same_group = self.group[ordered[1:]] == self.group[ordered[:-1]]
+            gaps = np.where(same_group, SIBLING_GAP, SUBTREE_GAP)
+            separation = (widths[1:] + widths[:-1]) / 2 + gaps
+            x[ordered] = np.concatenate([[0.0], np.cumsum(separation)])
+            ordered_layers.append((ordered, separation))
+
+        for step in range(COORDINATE_PASSES):
+            downward = step % 2 == 1
+            depths = range(1, len(self.layers)) if downward else range(len(self.layers) - 2, -1, -1)
+            for depth in depths:
+                ordered, separation = ordered_layers[depth]
+                edges = self.edges[depth] if downward else self.edges[depth + 1]
+                desired = self._neighbor_mean(ordered, edges, downward, x)
+                x[ordered] = _project(desired, separation)
+        return x
+
+
+def _box_edge_points(a, b):
+    """连接两个节点的线段端点：同层时连接相对的左右两边，否则连接上下两边"""
+    if a.y == b.y:
+        left, right = (a, b) if a.x <= b.x else (b, a)
+        return (left.x + left.width / 2, left.y), (right.x - right.width / 2, right.y)
+    top, bottom = (a, b) if a.y > b.y else (b, a)
+    return (top.x, top.y - top.height / 2), (bottom.x, bottom.y + bottom.height / 2)
+
+
+def compute_layered_geometry(family_data, profiler=None):
+    """
+    分层布局并生成几何数据（格式见 main.GeometryBuilder）
+    家谱中的人按先序遍历排在前面（与树形布局的顺序相同），配偶排在最后；
+    另有 links（连线，形状 k×2×2）和 link_kinds（LINK_KIND_SPOUSE 或 LINK_KIND_ADOPTION）
+    """
+    if profiler is None:
+        profiler = RenderProfiler()
+
+    with profiler.stage('build'):
+        root = build_tree(family_data)
+        calculate_depth(root)
+        nodes, parents = _preorder(root)
+        layout = _LayeredLayout(nodes, parents, PersonIndex([node.data for node in nodes], parents))
+
+    with profiler.stage('layout'):
+        position, crossings = layout.order()
+        x = layout.coordinates(position)
+        set_y_coordinates(root)
+        # 每一层的y坐标（虚拟节点所在的层都有本人的祖先）
+        layer_y = {node.depth: node.y for node in reversed(nodes)}
+        spouse_boxes = []  # (x, y, width, height, depth, 名字)
+        links = []
+        kinds = []
+        for person, node in enumerate(nodes):
+            node.x = x[person] - layout.width[person] / 2 + node.width / 2
+            previous_right = node.x + node.width / 2
+            for name in layout.spouses[person]:
+                spouse_x = previous_right + SPOUSE_GAP + node.width / 2
+                spouse_boxes.append((spouse_x, node.y, node.width, node.height, node.depth, name))
+                links.append(((previous_right, node.y), (spouse_x - node.width / 2, node.y)))
+                kinds.append(LINK_KIND_SPOUSE)
+                previous_right = spouse_x + node.width / 2
+        for a, b in sorted(layout.marriages):
+            links.append(_box_edge_points(nodes[a], nodes[b]))
+            kinds.append(LINK_KIND_SPOUSE)
+        for target, person, dummies in layout.adoptions:
+            adopter, child = nodes[target], nodes[person]
+            if not dummies and adopter.depth >= child.depth:
+                links.append(_box_edge_points(adopter, child))
+                kinds.append(LINK_KIND_ADOPTION)
+                continue
+            points = [(adopter.x, adopter.y - adopter.height / 2)]
+            points.extend((x[dummy], layer_y[layout.layer[dummy]]) for dummy in dummies)
+            points.append((child.x, child.y + child.height / 2))
+            links.extend(zip(points[:-1], points[1:]))
+            kinds.extend([LINK_KIND_ADOPTION] * (len(points) - 1))
+    profiler.count('crossings', crossings)
+
+    with profiler.stage('geometry'):
+        geometry = collect_geometry(root)
+        if spouse_boxes:
+            columns = list(zip(*spouse_boxes))
+            for key, values in zip(('x', 'y', 'width', 'height'), columns[:4]):
+                geometry[key] = np.concatenate([geometry[key], np.array(values, dtype=float)])
+            geometry['depth'] = np.concatenate([geometry['depth'], np.array(columns[4], dtype=int)])
+            geometry['collapsed'] = np.concatenate([geometry['collapsed'], np.zeros(len(spouse_boxes), dtype=int)])
+            geometry['names'] = list(geometry['names']) + list(columns[5])
+        geometry['links'] = np.array(links, dtype=float).reshape(-1, 2, 2)
+        geometry['link_kinds'] = np.array(kinds, dtype=int)
+    return geometry
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+细节层次（子树折叠）
+超大家谱（如几十万人的宗族）全部画出既慢又看不清。本模块按以下条件把子树折叠为
+一个汇总框（如"+1234人"），使绘制的节点数有上限，与原始数据的大小无关：
+- 节点预算：绘制的节点数（含汇总框）不超过 max_nodes，按广度优先展开，浅层优先
+- 深度限制：深度达到 max_depth 的节点不再展开
+- 最小显示尺寸：子树在图片中的估算宽度小于 min_box_px 像素时不再展开
+
+先用一次后序遍历统计每个子树的人数和叶子数，再从根开始广度优先决定展开或折叠，
+总耗时与人数成线性关系。
+"""
+
+from collections import deque
+
+# 汇总框中显示的文字
+SUMMARY_LABEL = "+{}人"
+
+# 估算子树显示宽度时使用的图片宽度（像素，20英寸×300dpi）
+IMAGE_WIDTH_PX = 6000
+
+
+def subtree_stats(family_data):
+    """
+    统计每个子树的人数和叶子数（迭代后序遍历，线性时间）
+    返回 (人数字典, 叶子数字典)，键为节点数据的id
+    """
+    sizes = {}
+    leaves = {}
+    stack = [(family_data, False)]
+    while stack:
+        data, visited = stack.pop()
+        children = data.get('children') or []
+        if visited or not children:
+            key = id(data)
+            if children:
+                sizes[key] = 1 + sum(sizes[id(child)] for child in children)
+                leaves[key] = sum(leaves[id(child)] for child in children)
+            else:
+                sizes[key] = 1
+                leaves[key] = 1
+            continue
+        stack.append((data, True))
+        stack.extend((child, False) for child in children)
+    return sizes, leaves
+
+
+def summary_node(count):
+    """汇总框的节点数据，collapsed为折叠的人数"""
+    return {'name': SUMMARY_LABEL.format(count), 'collapsed': count}
+
+
+def collapse_tree(family_data, max_nodes=None, max_depth=None, min_box_px=None):
+    """
+    按节点预算、深度限制和最小显示尺寸折叠子树
+    返回 (新的家谱数据, 折叠的人数)；新数据只复制需要绘制的节点，原数据不变。
+    没有设置任何条件，或者不需要折叠时返回原数据。
+    """
+    if not max_nodes and max_depth is None and not min_box_px:
+        return family_data, 0
+    if max_nodes is not None and max_nodes < 2:
+        raise ValueError("节点预算至少为2（根节点和一个汇总框）")
+
+    sizes, leaves = subtree_stats(family_data)
+    if max_nodes and sizes[id(family_data)] <= max_nodes and max_depth is None and not min_box_px:
+        return family_data, 0
+    min_leaves = 0
+    if min_box_px:
+        min_leaves = min_box_px / IMAGE_WIDTH_PX * leaves[id(family_data)]
+
+    def copy(data):
+        return {key: value for key, value in data.items() if key != 'children'}
+
+    root = copy(family_data)
+    # 已绘制的节点数；有子节点但尚未决定的节点预留一个汇总框的名额
+    count = 1 + (1 if family_data.get('children') else 0)
+    hidden = 0
+    queue = deque([(family_data, root, 0)])
+    while queue:
+        data, node, depth = queue.popleft()
+        children = data.get('children') or []
+        if not children:
+            continue
+
+        expand = True
+        if max_depth is not None and depth >= max_depth:
+            expand = False
+        elif min_leaves and leaves[id(data)] < min_leaves:
+            expand = False
+        elif max_nodes:
+            # 展开：释放本节点预留的名额，加上子节点和它们各自预留的名额
+            cost = len(children) - 1 + sum(1 for child in children if child.get('children'))
+            if count + cost > max_nodes:
+                expand = False
+            else:
+                count += cost
+
+        if expand:
+            node['children'] = []
+            for child in children:
+                child_copy = copy(child)
+                node['children'].append(child_copy)
+                queue.append((child, child_copy, depth + 1))
+        else:
+            descendants = sizes[id(data)] - 1
+            node['children'] = [summary_node(descendants)]
+            hidden += descendants
+
+    if not hidden:
+        return family_data, 0
+    return root, hidden
@@ -1,15 +1,22 @@
 import json
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+import matplotlib.colors as mcolors
+from matplotlib.collections import LineCollection, PolyCollection
 from matplotlib.font_manager import FontProperties
 import numpy as np
 import os
 import sys
-from markdown_parser import parse_markdown_family_tree
+import argparse
+import io
+from markdown_parser import has_relations, parse_markdown_family_tree
+from profiler import RenderProfiler, count_artists
+from tidy_layout import calculate_tidy_positions
+from text_cache import draw_cached_texts
+from fonts import get_font_properties, setup_fonts
 
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['SimHei']  # 使用黑体
-plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+# 设置中文字体（优先使用随程序发布的字体）
+setup_fonts()
 
 # 文达祖后藤图
 TITLE = "正才祖后藤图"
@@ -50,11 +57,6 @@ def load_family_data(title):
     else:
         raise FileNotFoundError(f"找不到文件: {markdown_path} 或 {json_path}")
 
-family_data = load_family_data(TITLE)
-
-# 从JSON中读取字辈信息（如果没有则设为空列表）
-GENERATIONS = family_data.get('generations', [])
-
 # 设置节点参数
 
 NODE_WIDTH_HORIZONTAL = 2 # 横向文字的节点宽度
@@ -64,6 +66,38 @@ NODE_HEIGHT_VERTICAL = 2   # 纵向文字的节点高度（明显增加高度）
 PADDING_HORIZONTAL = 0.3   # 横向文字的填充距离
 PADDING_VERTICAL = 0.5     # 纵向文字的填充距离（增加填充）
 LEVEL_SPACING = 3         # 层级间距
+SIBLING_GAP = PADDING_HORIZONTAL      # 紧凑布局中兄弟节点之间的空隙
+SUBTREE_GAP = PADDING_HORIZONTAL * 2  # 紧凑布局中相邻子树之间的空隙
+
+# 节点文字是否使用排版缓存（每个不同的名字只排版一次，所有文字合并绘制）
+USE_TEXT_CACHE = True
+
+# 预览图宽度（像素）；节点数超过阈值时预览只画轮廓，不画文字
+PREVIEW_WIDTH = 760
+PREVIEW_OUTLINE_NODES = 5000
+
+# 折叠子树的汇总框底色
+SUMMARY_FACE_COLOR = '#e8e8e8'
+
+# 配偶和过继连线的颜色（分层布局，见 layered_layout）
+SPOUSE_LINK_COLOR = '#c0392b'
+ADOPTION_LINK_COLOR = '#2980b9'
+
+# 布局方式：classic 为每个叶子分配固定宽度，compact 按子树轮廓紧密排列
+LAYOUT_MODES = ('classic', 'compact')
+
+# 输出图片的默认分辨率和缩略图宽度（像素）
+DEFAULT_DPI = 300
+THUMBNAIL_WIDTH = 400
+
+# 家谱图的图形尺寸（英寸）
+FIGURE_SIZE = (20, 15)
+
+# 同时输出多种格式时，节点数达到此值才在工作进程中并行保存矢量格式（较小的家谱启动进程不划算）
+PARALLEL_SAVE_NODES = 1000
+
+# 可选的输出格式：png（可用 png@150 指定分辨率）、svg、pdf、thumb（缩略图，可用 thumb@200 指定宽度）
+OUTPUT_FORMATS = ('png', 'svg', 'pdf', 'thumb')
 
 # 定义节点类
 class Node:
@@ -76,6 +110,7 @@ class Node:
         self.x = 0
         self.y = 0
         self.height = NODE_HEIGHT_HORIZONTAL  # 默认高度
+        self.slot_x = 0  # 布局区域的左边界（并行布局时用于拼接子树）
         
     def add_child(self, child):
         self.children.append(child)
@@ -130,16 +165,40 @@ def calculate_width(node):
     # 返回所有子节点的布局宽度总和
     return max(total_width, 1)
 
+# 一次遍历计算所有节点的布局宽度，返回 {id(节点): 布局宽度}
+# fixed 可预先指定部分节点的布局宽度（并行布局时用于已拆分出去的子树）
+def calculate_layout_widths(root, fixed=None):
+    widths = dict(fixed) if fixed else {}
+    stack = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if id(node) in widths and not children_done:
+            continue
+        if children_done:
+            widths[id(node)] = max(sum(widths[id(child)] for child in node.children), 1)
+        elif not node.children:
+            # 叶子节点返回1个单位作为布局宽度
+            widths[id(node)] = 1
+        else:
+            stack.append((node, True))
+            stack.extend((child, False) for child in node.children)
+    return widths
+
 # 自底向上计算节点位置
-def calculate_positions(node, x=0):
+def calculate_positions(node, x=0, widths=None):
+    # 布局宽度只计算一次，递归时传递给子节点
+    if widths is None:
+        widths = calculate_layout_widths(node)
+    
     # 获取布局宽度用于位置计算，考虑节点实际宽度
-    layout_width = calculate_width(node)
+    layout_width = widths[id(node)]
     # 计算布局间距，对不同深度使用不同的间距系数
     if hasattr(node, 'depth') and node.depth < 2:  # 前两代使用较小的间距
         spacing_factor = 1.2
     else:  # 第三代以后使用基于宽度的间距
         spacing_factor = max(node.width, 1.0) if hasattr(node, 'width') else 1.0
     
+    node.slot_x = x
     node.x = x + layout_width * spacing_factor / 2
     
     if not node.children:
@@ -147,15 +206,19 @@ def calculate_positions(node, x=0):
     
     child_x = x
     for child in node.children:
-        child_layout_width = calculate_width(child)
+        child_layout_width = widths[id(child)]
         # 为子节点设置合适的间距
         if hasattr(child, 'depth') and child.depth < 2:  # 前两代
             child_spacing = 1.2
         else:  # 第三代以后
             child_spacing = max(child.width, 1.0) if hasattr(child, 'width') else 1.0
-        calculate_positions(child, child_x)
+        calculate_positions(child, child_x, widths)
         child_x += child_layout_width * child_spacing
 
+# 紧凑布局：按子树实际轮廓计算节点位置（需先计算节点深度以确定节点宽度）
+def calculate_compact_positions(node):
+    calculate_tidy_positions(node, SIBLING_GAP, SUBTREE_GAP)
+
 # 设置y坐标
 def set_y_coordinates(node, y=0):
     node.y = y
@@ -169,135 +232,695 @@ def set_y_coordinates(node, y=0):
     for child in node.children:
         set_y_coordinates(child, y - y_spacing)
 
-# 绘制家谱图
-def draw_family_tree(node, ax):
-    # 绘制节点
-    for child in node.children:
-        draw_family_tree(child, ax)
+# 绘制节点文字
+def draw_node_labels(ax, labels):
+    """labels: [(x, y, 名字, 是否纵向), ...]，返回添加的图元列表"""
+    if USE_TEXT_CACHE:
+        return [draw_cached_texts(ax, labels, fontsize=10, linespacing=1.2)]
     
-    # 绘制连接线（折线）
-    for child in node.children:
-        # 计算连接点（从父节点底部到子节点顶部）
-        x1, y1 = node.x, node.y - node.height/2
-        x2, y2 = child.x, child.y + child.height/2
-        
-        # 计算中间点
-        mid_y = (y1 + y2) / 2
-        
-        # 绘制折线：垂直向下 → 水平 → 垂直向下
-        plt.plot([x1, x1], [y1, mid_y], 'k-', linewidth=1.5)  # 垂直向下
-        plt.plot([x1, x2], [mid_y, mid_y], 'k-', linewidth=1.5)  # 水平
-        plt.plot([x2, x2], [mid_y, y2], 'k-', linewidth=1.5)  # 垂直向下
+    artists = []
+    for x, y, name, vertical in labels:
+        if not vertical:  # 第一代和第二代 - 横向排列
+            text = ax.text(
+                x, y, name,
+                ha='center', va='center',
+                fontproperties=get_font_properties(10)
+            )
+        else:  # 第三代及以后 - 纵向排列
+            # 将名字拆分为单个字符并用换行符连接
+            vertical_name = '\n'.join(list(name))
+            text = ax.text(
+                x, y, vertical_name,
+                ha='center', va='center',
+                fontproperties=get_font_properties(10), linespacing=1.2  # 调整行间距
+            )
+        artists.append(text)
+    return artists
+
+# 计算父节点到全部子节点的连接线（总线式）
+def connector_segments(node):
+    """
+    父节点向下一条竖线，在中间高度一条横线连接最左和最右的子节点，
+    再从横线向每个子节点各引一条短竖线；与逐个子节点画折线的效果相同，
+    但线段数从 3×子节点数 减少到 子节点数+2，且没有重叠的线段
+    """
+    if not node.children:
+        return []
     
-    # 绘制节点矩形
-    rect = patches.Rectangle(
-        (node.x - node.width/2, node.y - node.height/2),
-        node.width, node.height,
-        linewidth=1, edgecolor='black', facecolor='white'
+    # 计算连接点（从父节点底部到子节点顶部），同一层子节点的高度和y坐标相同
+    x1, y1 = node.x, node.y - node.height/2
+    first = node.children[0]
+    y2 = first.y + first.height/2
+    mid_y = (y1 + y2) / 2
+    
+    if len(node.children) == 1 and first.x == x1:
+        # 唯一的子节点在正下方：一条竖线
+        return [((x1, y1), (x1, y2))]
+    
+    child_xs = [child.x for child in node.children]
+    left, right = min(child_xs + [x1]), max(child_xs + [x1])
+    segments = [((x1, y1), (x1, mid_y))]
+    if right > left:
+        segments.append(((left, mid_y), (right, mid_y)))
+    segments.extend(((x2, mid_y), (x2, y2)) for x2 in child_xs)
+    return segments
+
+class GeometryBuilder:
+    """
+    按先序遍历顺序收集绘图几何数据
+    
+    几何数据为字典：x/y/width/height/depth 为每个节点的数组，names 为名字列表，
+    collapsed 为每个节点折叠的人数（汇总框大于0，见 level_of_detail），
+    segments 为连接线数组（形状 k×2×2）。
+    """
+    
+    def __init__(self):
+        self._nodes = []
+        self._names = []
+        self._segments = []
+        self._chunks = []
+    
+    def add_node(self, node):
+        """添加一个节点及其到各子节点的连接线"""
+        self._nodes.append((node.x, node.y, node.width, node.height, node.depth,
+                            node.data.get('collapsed', 0)))
+        self._names.append(node.data['name'])
+        self._segments.extend(connector_segments(node))
+    
+    def add_geometry(self, geometry):
+        """拼接一段已经生成好的几何数据（如并行计算的子树）"""
+        self._flush()
+        self._chunks.append(geometry)
+    
+    def _flush(self):
+        if not self._nodes and not self._segments:
+            return
+        nodes = np.array(self._nodes, dtype=float).reshape(-1, 6)
+        self._chunks.append({
+            'x': nodes[:, 0],
+            'y': nodes[:, 1],
+            'width': nodes[:, 2],
+            'height': nodes[:, 3],
+            'depth': nodes[:, 4].astype(int),
+            'collapsed': nodes[:, 5].astype(int),
+            'names': self._names,
+            'segments': np.array(self._segments, dtype=float).reshape(-1, 2, 2),
+        })
+        self._nodes = []
+        self._names = []
+        self._segments = []
+    
+    def build(self):
+        self._flush()
+        if len(self._chunks) == 1:
+            return self._chunks[0]
+        geometry = {
+            key: np.concatenate([chunk[key] for chunk in self._chunks])
+            for key in ('x', 'y', 'width', 'height', 'depth', 'collapsed', 'segments')
+        }
+        geometry['names'] = [name for chunk in self._chunks for name in chunk['names']]
+        return geometry
+
+# 收集整棵树的绘图几何数据（先序遍历）
+def collect_geometry(root):
+    builder = GeometryBuilder()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        builder.add_node(node)
+        stack.extend(reversed(node.children))
+    return builder.build()
+
+# 计算几何数据的范围，返回 (min_x, max_x, min_y, max_y)
+def geometry_bounds(geometry):
+    x, y = geometry['x'], geometry['y']
+    half_w, half_h = geometry['width'] / 2, geometry['height'] / 2
+    return (
+        (x - half_w).min() - 1,
+        (x + half_w).max() + 1,
+        (y - half_h).min() - 1,
+        (y + half_h).max() + 1,
     )
-    ax.add_patch(rect)
-    
-    # 绘制节点文字
-    if node.depth < 2:  # 第一代和第二代 - 横向排列
-        plt.text(
-            node.x, node.y, node.data['name'],
-            ha='center', va='center',
-            fontsize=10
-        )
-    else:  # 第三代及以后 - 纵向排列
-        # 将名字拆分为单个字符并用换行符连接
-        vertical_name = '\n'.join(list(node.data['name']))
-        plt.text(
-            node.x, node.y, vertical_name,
-            ha='center', va='center',
-            fontsize=10, linespacing=1.2  # 增加字体大小，调整行间距
-        )
-
-# 创建图形
-fig, ax = plt.subplots(figsize=(20, 15))
-ax.set_aspect('equal')
 
-def main():
-    """主函数 - 当直接运行main.py时执行"""
-    # 构建树结构
-    root = build_tree(family_data)
+# 绘制几何数据：所有矩形、连接线和文字分别合并为一个集合绘制，返回文字图元列表
+def draw_geometry(ax, geometry):
+    x, y = geometry['x'], geometry['y']
+    w, h = geometry['width'], geometry['height']
     
-    # 计算节点深度
-    calculate_depth(root)
+    # 绘制节点矩形
+    x0, y0 = x - w/2, y - h/2
+    x1, y1 = x0 + w, y0 + h
+    verts = np.stack([
+        np.column_stack([x0, y0]),
+        np.column_stack([x1, y0]),
+        np.column_stack([x1, y1]),
+        np.column_stack([x0, y1]),
+    ], axis=1)
+    # 折叠子树的汇总框使用灰色底色
+    facecolors = np.where(geometry['collapsed'][:, None] > 0,
+                          mcolors.to_rgba(SUMMARY_FACE_COLOR), mcolors.to_rgba('white'))
+    ax.add_collection(PolyCollection(
+        verts, facecolors=facecolors, edgecolors='black',
+        linewidths=1, joinstyle='miter', zorder=1
+    ), autolim=False)
     
-    # 自底向上计算节点位置
-    calculate_positions(root)
+    # 绘制连接线
+    ax.add_collection(LineCollection(
+        geometry['segments'], colors='black',
+        linewidths=1.5, capstyle='projecting', zorder=2
+    ), autolim=False)
     
-    # 设置y坐标
-    set_y_coordinates(root)
+    # 绘制配偶（实线）和过继（虚线）连线
+    links = geometry.get('links')
+    if links is not None and len(links):
+        adoption = geometry['link_kinds'] > 0
+        ax.add_collection(LineCollection(
+            links, colors=[ADOPTION_LINK_COLOR if kind else SPOUSE_LINK_COLOR for kind in adoption],
+            linestyles=['dashed' if kind else 'solid' for kind in adoption],
+            linewidths=1.5, zorder=2
+        ), autolim=False)
+    
+    # 绘制节点文字（第三代及以后纵向排列）
+    vertical = geometry['depth'] >= 2
+    return draw_node_labels(ax, list(zip(x, y, geometry['names'], vertical)))
+
+# 绘制整张家谱图：几何数据、字辈标签、坐标范围和标题
+def draw_tree_figure(ax, geometry, title, generations, bounds=None, generation_geometry=None):
+    """
+    render_family_tree 和并行绘制的工作进程共用，保证两边的图形完全相同。
+    工作进程只绘制部分节点：bounds为整张图的范围（见 geometry_bounds），
+    generation_geometry为确定字辈标签位置的几何数据（至少包含depth和y），默认均取自geometry。
+    返回文字图元列表
+    """
+    ax.set_aspect('equal')
     
     # 绘制家谱图
-    draw_family_tree(root, ax)
+    label_artists = draw_geometry(ax, geometry)
+    
+    # 设置图形范围
+    min_x, max_x, min_y, max_y = bounds if bounds is not None else geometry_bounds(geometry)
+    
+    # 绘制字辈标签（仅在字辈非空时）
+    if generations:
+        draw_generation_labels(ax, geometry if generation_geometry is None else generation_geometry,
+                               generations, min_x)
     
     # 设置图形范围
+    ax.set_xlim(min_x - 5, max_x)  # 扩展左侧边界以容纳字辈标签
+    ax.set_ylim(min_y, max_y)
+    
+    # 隐藏坐标轴
+    ax.axis('off')
+    
+    # 添加标题
+    ax.set_title(title, fontproperties=get_font_properties(16), pad=20)
+    return label_artists
+
+# 绘制家谱图
+def draw_family_tree(node, ax):
+    draw_geometry(ax, collect_geometry(node))
+
+# 收集所有节点
+def collect_nodes(root):
     all_nodes = []
-    def collect_nodes(node):
+    def collect(node):
         all_nodes.append(node)
         for child in node.children:
-            collect_nodes(child)
+            collect(child)
+    collect(root)
+    return all_nodes
+
+# 绘制字辈标签
+def draw_generation_labels(ax, geometry, generations, min_x):
+    # 获取所有存在的深度，以及每个深度第一个节点的位置
+    depths, first_index = np.unique(geometry['depth'], return_index=True)
+    
+    # 为每个深度添加字辈标签
+    for depth, index in zip(depths, first_index):
+        if depth < len(generations):
+            # 获取该深度的y坐标（取该深度任意节点的y坐标）
+            y_coord = geometry['y'][index]
+            
+            # 根据节点深度确定标签高度
+            if depth >= 2:
+                label_height = NODE_HEIGHT_VERTICAL
+            else:
+                label_height = NODE_HEIGHT_HORIZONTAL
+            
+            # 添加字辈标签背景
+            label_bg = patches.FancyBboxPatch(
+                (min_x - 4, y_coord - label_height/2),
+                3.5, label_height,
+                boxstyle="round,pad=0.1",
+                linewidth=1,
+                edgecolor='none',
+                facecolor='#f0f0f0',
+                alpha=0.8,
+                zorder=2
+            )
+            ax.add_patch(label_bg)
+            
+            # 添加字辈文字（黑体没有粗体字形，使用常规字重）
+            ax.text(min_x - 2.25, y_coord, generations[depth], 
+                    ha='center', va='center', fontproperties=get_font_properties(10),
+                    color='#333333', zorder=3)
+
+# 构建家谱树、计算布局并生成几何数据
+# 家谱中有配偶或过继关系时使用分层布局（见 layered_layout），layout只用于普通的树形家谱
+def compute_geometry(family_data, layout='classic', profiler=None):
+    if profiler is None:
+        profiler = RenderProfiler()
     
-    collect_nodes(root)
+    # 有配偶或过继关系时使用分层布局
+    if has_relations(family_data):
+        from layered_layout import compute_layered_geometry
+        return compute_layered_geometry(family_data, profiler)
     
-    if all_nodes:
-        min_x = min(node.x - node.width/2 for node in all_nodes) - 1
-        max_x = max(node.x + node.width/2 for node in all_nodes) + 1
-        min_y = min(node.y - node.height/2 for node in all_nodes) - 1
-        max_y = max(node.y + node.height/2 for node in all_nodes) + 1
+    # 构建树结构
+    with profiler.stage('build'):
+        root = build_tree(family_data)
+    
+    with profiler.stage('layout'):
+        # 计算节点深度
+        calculate_depth(root)
         
-        # 添加字辈标签
-        # 获取所有存在的深度
-        depths = sorted(set(node.depth for node in all_nodes))
+        # 计算节点位置
+        if layout == 'compact':
+            calculate_compact_positions(root)
+        else:
+            calculate_positions(root)
         
-        # 绘制字辈标签（仅在GENERATIONS非空时）
-        if GENERATIONS:  # 添加判断条件
-            # 为每个深度添加字辈标签
-            for depth in depths:
-                if depth < len(GENERATIONS):
-                    # 获取该深度的y坐标（取该深度任意节点的y坐标）
-                    y_coord = next(node.y for node in all_nodes if node.depth == depth)
-                    
-                    # 根据节点深度确定标签高度
-                    if depth >= 2:
-                        label_height = NODE_HEIGHT_VERTICAL
-                    else:
-                        label_height = NODE_HEIGHT_HORIZONTAL
-                    
-                    # 添加字辈标签背景
-                    label_bg = patches.FancyBboxPatch(
-                        (min_x - 4, y_coord - label_height/2),
-                        3.5, label_height,
-                        boxstyle="round,pad=0.1",
-                        linewidth=1,
-                        edgecolor='none',
-                        facecolor='#f0f0f0',
-                        alpha=0.8,
-                        zorder=2
-                    )
-                    ax.add_patch(label_bg)
-                    
-                    # 添加字辈文字
-                    ax.text(min_x - 2.25, y_coord, GENERATIONS[depth], 
-                            ha='center', va='center', fontsize=10, 
-                            fontweight='bold', color='#333333', zorder=3)
+        # 设置y坐标
+        set_y_coordinates(root)
+    
+    with profiler.stage('geometry'):
+        return collect_geometry(root)
+
+# 以低分辨率渲染已绘制好的图形，返回PNG数据
+def render_preview(fig, label_artists, node_count):
+    # 节点过多时只画轮廓，跳过最耗时的文字
+    outline_only = node_count > PREVIEW_OUTLINE_NODES
+    for artist in label_artists:
+        artist.set_visible(not outline_only)
+    
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=PREVIEW_WIDTH / fig.get_figwidth(), bbox_inches='tight')
+    
+    for artist in label_artists:
+        artist.set_visible(True)
+    return buffer.getvalue()
+
+# 把输出格式说明（如 "png,png@150,svg,pdf,thumb"）解析为输出目标列表
+def output_targets(base_path, spec):
+    """
+    base_path为不含扩展名的输出路径，返回 [{'path', 'format', 'dpi'}] 或缩略图的 [{'path', 'format', 'width'}]
+    png → base.png，png@150 → base@150dpi.png，svg/pdf → base.svg/base.pdf，
+    thumb → base.thumb.png，thumb@200 → base.thumb200.png
+    """
+    targets = {}
+    for item in str(spec).replace('，', ',').split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        name, _, value = item.partition('@')
+        if name not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式：{item}（可选 {', '.join(OUTPUT_FORMATS)}）")
+        try:
+            value = int(value) if value else None
+        except ValueError:
+            raise ValueError(f"无效的输出格式：{item}")
+        if value is not None and value <= 0:
+            raise ValueError(f"无效的输出格式：{item}")
         
-        # 设置图形范围
-        ax.set_xlim(min_x - 5, max_x)  # 扩展左侧边界以容纳字辈标签
-        plt.ylim(min_y, max_y)
+        if name == 'thumb':
+            width = value or THUMBNAIL_WIDTH
+            suffix = '' if width == THUMBNAIL_WIDTH else str(width)
+            target = {'path': f'{base_path}.thumb{suffix}.png', 'format': 'png', 'width': width}
+        elif name == 'png':
+            dpi = value or DEFAULT_DPI
+            suffix = '' if dpi == DEFAULT_DPI else f'@{dpi}dpi'
+            target = {'path': f'{base_path}{suffix}.png', 'format': 'png', 'dpi': dpi}
+        else:
+            target = {'path': f'{base_path}.{name}', 'format': name, 'dpi': DEFAULT_DPI}
+        targets.setdefault(target['path'], target)
+    if not targets:
+        raise ValueError("没有指定输出格式")
+    return list(targets.values())
+
+# 取出刚刚用Agg绘制的图片（与保存的PNG相同），无法取出时返回None
+def _last_raster(fig):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from PIL import Image
     
-    # 隐藏坐标轴
-    plt.axis('off')
+    renderer = getattr(fig.canvas, 'renderer', None)
+    if not isinstance(fig.canvas, FigureCanvasAgg) or renderer is None:
+        return None
+    pixels = np.asarray(renderer.buffer_rgba())
+    return Image.fromarray(pixels.copy(), 'RGBA')
+
+# 输出目标是否为PNG（未指定格式时按扩展名判断，与savefig相同）
+def _is_png(target):
+    image_format = target.get('format')
+    if image_format is None:
+        if isinstance(target['path'], str):
+            image_format = os.path.splitext(target['path'])[1][1:]
+        image_format = image_format or plt.rcParams['savefig.format']
+    return image_format.lower() == 'png'
+
+# 从高分辨率图片缩放得到一个位图输出目标
+def _save_scaled(image, source_dpi, target):
+    from PIL import Image
     
-    # 添加标题
-    plt.title(TITLE, fontsize=16, pad=20)
+    if 'width' in target:
+        width = min(target['width'], image.width)
+        size = (width, max(1, round(image.height * width / image.width)))
+        dpi = source_dpi * width / image.width
+    else:
+        scale = target['dpi'] / source_dpi
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        dpi = target['dpi']
+    image.resize(size, Image.LANCZOS).save(target['path'], format='PNG', dpi=(dpi, dpi))
+    return target['path']
+
+# 工作进程初始化：只使用Agg等非交互后端，还原的图形不会打开窗口
+def _init_save_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+# 工作进程：从序列化的图形还原后保存一个输出目标
+def _save_pickled_figure(figure_data, target):
+    import pickle
+    fig = pickle.loads(figure_data)
+    try:
+        fig.savefig(target['path'], dpi=target.get('dpi', DEFAULT_DPI), bbox_inches='tight',
+                    format=target.get('format'))
+    finally:
+        plt.close(fig)
+    return target['path']
+
+# 在工作进程中保存矢量格式，无法使用时（只有一个CPU核心、图形不能序列化，或者已在守护进程中）返回None
+def _start_vector_saves(fig, targets):
+    import multiprocessing
+    import pickle
+    from concurrent.futures import ProcessPoolExecutor
+    
+    if multiprocessing.current_process().daemon or (os.cpu_count() or 1) < 2:
+        return None, []
+    try:
+        figure_data = pickle.dumps(fig)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return None, []
+    executor = ProcessPoolExecutor(max_workers=min(len(targets), os.cpu_count() or 1),
+                                   initializer=_init_save_worker)
+    return executor, [executor.submit(_save_pickled_figure, figure_data, t) for t in targets]
+
+# 把同一个图形写入全部输出目标：图形只绘制一次
+def save_outputs(fig, targets, parallel=False, rasterizer=None):
+    """
+    位图（PNG）只按最高分辨率绘制一次，其余分辨率和缩略图由这张图片缩放得到，
+    在线程池中并行缩放和编码。
+    SVG、PDF等矢量格式需要各自序列化整个图形（matplotlib的同一图形不能在多个线程中同时保存）：
+    parallel为True时把图形序列化后交给工作进程并行保存，与位图同时进行；否则在当前线程中依次保存
+    rasterizer不为None时由它绘制最高分辨率的PNG，参数为 (图形, 输出路径或文件对象, 分辨率)，
+    返回绘制好的RGBA图片（见 parallel_render.rasterize_parallel）
+    """
+    if len(targets) == 1 and 'width' not in targets[0]:
+        target = targets[0]
+        if rasterizer is not None and _is_png(target):
+            rasterizer(fig, target['path'], target.get('dpi', DEFAULT_DPI))
+        else:
+            fig.savefig(target['path'], dpi=target.get('dpi', DEFAULT_DPI), bbox_inches='tight',
+                        format=target.get('format'))
+        return [target['path']]
+    
+    raster = [t for t in targets if t.get('format') == 'png']
+    direct = [t for t in targets if t.get('format') != 'png']
+    
+    # 先把矢量格式交给工作进程（序列化的是尚未按位图分辨率保存过的图形）
+    process_executor, vector_futures = None, []
+    if parallel and direct and len(targets) > 1:
+        process_executor, vector_futures = _start_vector_saves(fig, direct)
+    
+    thread_executor, raster_futures = None, []
+    try:
+        if raster:
+            # 最高分辨率的PNG直接保存；只有缩略图时以足够缩放的分辨率绘制到内存中
+            full = [t for t in raster if 'width' not in t]
+            if full:
+                master = max(full, key=lambda t: t['dpi'])
+                master_dpi = master['dpi']
+                destination = master['path']
+            else:
+                master = None
+                master_dpi = min(DEFAULT_DPI, 2 * max(t['width'] for t in raster) / fig.get_figwidth())
+                destination = io.BytesIO()
+            if rasterizer is not None:
+                image = rasterizer(fig, destination, master_dpi)
+            else:
+                fig.savefig(destination, dpi=master_dpi, bbox_inches='tight', format='png')
+                image = _last_raster(fig)
+            if image is None:
+                from PIL import Image
+                if hasattr(destination, 'seek'):
+                    destination.seek(0)
+                with Image.open(destination) as saved:
+                    image = saved.convert('RGBA')
+            
+            from concurrent.futures import ThreadPoolExecutor
+            thread_executor = ThreadPoolExecutor(max_workers=min(len(raster), os.cpu_count() or 1))
+            raster_futures = [thread_executor.submit(_save_scaled, image, master_dpi, t)
+                              for t in raster if t is not master]
+        
+        if process_executor is None:
+            for target in direct:
+                fig.savefig(target['path'], dpi=target.get('dpi', DEFAULT_DPI), bbox_inches='tight',
+                            format=target.get('format'))
+        for future in raster_futures + vector_futures:
+            future.result()
+    finally:
+        for executor in (thread_executor, process_executor):
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+    return [target['path'] for target in targets]
+
+def render_family_tree(family_data, output_path, title, profiler=None, show=False, layout='classic',
+                       workers=1, split_depth=None, preview=None, image_format=None,
+                       max_nodes=None, max_depth=None, min_box_px=None, targets=None):
+    """
+    根据家谱数据生成家谱图并保存
+    
+    output_path可以是文件路径或文件对象，image_format为图片格式（如'png'、'svg'），
+    默认根据文件扩展名确定
+    layout为布局方式，可选值见LAYOUT_MODES
+    preview为回调函数时，先用同一图形快速生成低分辨率预览（PNG数据）传给回调，
+    再保存高清图片；布局和绘制只进行一次
+    workers大于1时在多个进程中并行计算各子树的布局和几何数据（仅标准布局），
+    split_depth为拆分子树的深度，默认自动选择；PNG也分成竖条或横条在多个进程中绘制后拼接
+    （见 parallel_render.rasterize_parallel）；结果与单进程完全一致
+    max_nodes/max_depth/min_box_px为细节层次设置：超过节点预算、深度限制或显示尺寸过小的
+    子树折叠为"+N人"汇总框（见 level_of_detail.collapse_tree），绘制耗时与家谱大小无关
+    targets为输出目标列表（见 output_targets）时忽略output_path和image_format，
+    布局和绘制只进行一次，然后写入全部输出目标（见 save_outputs），返回输出路径列表
+    profiler为RenderProfiler实例时记录各阶段的性能数据，
+    报告写入输出图片旁的.profile.json文件
+    """
+    if profiler is None:
+        profiler = RenderProfiler()
+    
+    # 从数据中读取字辈信息（如果没有则设为空列表）
+    generations = family_data.get('generations', [])
+    
+    # 折叠超出细节层次设置的子树
+    if max_nodes or max_depth is not None or min_box_px:
+        from level_of_detail import collapse_tree
+        with profiler.stage('collapse'):
+            family_data, hidden = collapse_tree(family_data, max_nodes, max_depth, min_box_px)
+        profiler.count('collapsed', hidden)
+    
+    # 构建树并计算布局
+    if workers > 1 and layout == 'classic' and not has_relations(family_data):
+        from parallel_render import compute_geometry_parallel
+        geometry = compute_geometry_parallel(family_data, workers, split_depth, profiler)
+    else:
+        geometry = compute_geometry(family_data, layout, profiler)
+    profiler.count('nodes', len(geometry['names']))
+    profiler.count('segments', len(geometry['segments']))
+    
+    # 创建图形
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE)
+    
+    with profiler.stage('draw'):
+        label_artists = draw_tree_figure(ax, geometry, title, generations)
+    profiler.count('artists', count_artists(ax))
+    
+    # 低分辨率预览
+    if preview is not None:
+        with profiler.stage('preview'):
+            preview(render_preview(fig, label_artists, len(geometry['names'])))
+    
+    # 多进程分条绘制PNG
+    rasterizer = None
+    if workers > 1:
+        from parallel_render import rasterize_parallel
+        def rasterizer(fig, destination, dpi):
+            return rasterize_parallel(fig, destination, dpi, geometry, title, generations, workers)
     
     # 保存图形
-    plt.savefig(f'.\\瓜藤图\\{TITLE}.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    with profiler.stage('save'):
+        if targets is None:
+            save_outputs(fig, [{'path': output_path, 'format': image_format, 'dpi': DEFAULT_DPI}],
+                         rasterizer=rasterizer)
+        else:
+            output_path = save_outputs(fig, targets,
+                                       parallel=len(geometry['names']) >= PARALLEL_SAVE_NODES,
+                                       rasterizer=rasterizer)
+            profiler.count('outputs', len(targets))
+    
+    if show:
+        plt.show()
+    else:
+        plt.close(fig)
+    
+    return output_path
+
+# 渲染一个markdown家谱文件，图片保存到输出目录，返回图片路径
+# formats为输出格式说明（见 output_targets），默认只生成PNG；返回第一个输出的路径
+def render_markdown_file(markdown_path, output_dir, layout='classic', profiler=None, preview=None,
+                         max_nodes=None, formats=None):
+    if profiler is None:
+        profiler = RenderProfiler()
+    
+    with profiler.stage('parse'):
+        with open(markdown_path, 'r', encoding='utf-8') as f:
+            result = parse_markdown_family_tree(f.read())
+    family_data = result['data']
+    if not family_data:
+        raise ValueError(f"家谱数据为空：{markdown_path}")
+    title = result.get('title') or os.path.splitext(os.path.basename(markdown_path))[0]
+    
+    # 先写入临时文件再替换，渲染中途被取消时不会留下不完整的图片；
+    # 临时文件名包含进程号，几个进程（如GUI和命令行批量渲染）同时渲染同一文件时互不覆盖
+    targets = output_targets(os.path.join(output_dir, title), formats or 'png')
+    final_paths = []
+    for target in targets:
+        final_paths.append(target['path'])
+        name, extension = os.path.splitext(os.path.basename(target['path']))
+        target['path'] = os.path.join(output_dir, f'.{name}.{os.getpid()}.rendering{extension}')
+    try:
+        render_family_tree(family_data, None, title, profiler=profiler, layout=layout, preview=preview,
+                           max_nodes=max_nodes, targets=targets)
+    except BaseException:
+        for target in targets:
+            if os.path.exists(target['path']):
+                os.remove(target['path'])
+        raise
+    for target, output_path in zip(targets, final_paths):
+        os.replace(target['path'], output_path)
+    return final_paths[0]
+
+def main():
+    """主函数 - 当直接运行main.py时执行"""
+    parser = argparse.ArgumentParser(description="生成家谱图")
+    parser.add_argument('--title', default=TITLE, help="家谱文件名（不含扩展名）")
+    parser.add_argument('--layout', choices=LAYOUT_MODES, default='classic',
+                        help="布局方式：classic为标准布局，compact为紧凑布局")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="并行计算布局和绘制PNG的进程数，0表示使用全部CPU核心（并行布局仅限标准布局）")
+    parser.add_argument('--split-depth', type=int, default=None,
+                        help="并行模式下拆分子树的深度，默认自动选择")
+    parser.add_argument('--book', choices=('A4', 'A3', 'A2'), default=None,
+                        help="导出适合打印成册的分页PDF（附人名索引），代替PNG图片")
+    parser.add_argument('--poster', type=int, default=None, metavar='WIDTH',
+                        help="导出指定宽度（像素，如60000）的超大PNG海报，按条带逐条绘制，代替普通图片")
+    parser.add_argument('--export', default=None, metavar='PATH',
+                        help="把家谱导出为列式数据（.npz或.csv：编号、父节点、代数、名字、字辈、坐标），代替图片")
+    parser.add_argument('--max-nodes', type=int, default=None,
+                        help="最多绘制的节点数，超出的子树折叠为\"+N人\"汇总框")
+    parser.add_argument('--max-depth', type=int, default=None,
+                        help="最多展开的代数（根节点为第0代），更深的子树折叠")
+    parser.add_argument('--min-box-px', type=float, default=None,
+                        help="子树在图片中的最小显示宽度（像素），更窄的子树折叠")
+    parser.add_argument('--formats', default=None, metavar='LIST',
+                        help="输出格式，逗号分隔：png、png@150（指定分辨率）、svg、pdf、thumb（缩略图）；"
+                             "布局和绘制只进行一次")
+    parser.add_argument('--profile', action='store_true', help="记录各阶段性能数据并写入.profile.json")
+    parser.add_argument('--cprofile', action='store_true', help="同时输出cProfile数据（.prof文件）")
+    args = parser.parse_args()
+    
+    profiler = RenderProfiler(enabled=args.profile or args.cprofile, cprofile=args.cprofile)
+    profiler.start()
+    try:
+        # 加载家谱数据
+        with profiler.stage('parse'):
+            family_data = load_family_data(args.title)
+        
+        if args.export:
+            # 导出列式数据
+            from columnar_export import export_columns
+            output_path = args.export
+            geometry = compute_geometry(family_data, args.layout, profiler)
+            with profiler.stage('export'):
+                count = export_columns(family_data, output_path, geometry)
+            print(f"已导出 {count} 人: {output_path}")
+            if has_relations(family_data):
+                print("注意：列式数据只包含父子关系，配偶和过继关系没有导出（需要完整数据时使用原文件或家谱数据库）")
+        
+        elif args.book:
+            # 导出分页PDF
+            from pdf_export import export_paginated_pdf
+            from level_of_detail import collapse_tree
+            with profiler.stage('collapse'):
+                family_data, _ = collapse_tree(family_data, args.max_nodes, args.max_depth, args.min_box_px)
+            geometry = compute_geometry(family_data, args.layout, profiler)
+            with profiler.stage('export'):
+                output_path, index_path, pages = export_paginated_pdf(
+                    geometry, os.path.join('瓜藤图', f'{args.title}_分页.pdf'), args.title,
+                    family_data.get('generations', []), page_size=args.book
+                )
+            print(f"分页PDF: {output_path}（共 {pages} 页）")
+            print(f"人名索引: {index_path}")
+        
+        elif args.poster:
+            # 导出超大PNG海报
+            from poster_export import export_poster
+            from level_of_detail import collapse_tree
+            with profiler.stage('collapse'):
+                family_data, _ = collapse_tree(family_data, args.max_nodes, args.max_depth, args.min_box_px)
+            geometry = compute_geometry(family_data, args.layout, profiler)
+            
+            def progress(done, total):
+                print(f"\r海报：{done * 100 // total}%", end='', flush=True)
+            
+            with profiler.stage('export'):
+                output_path, width, height = export_poster(
+                    geometry, os.path.join('瓜藤图', f'{args.title}_海报.png'), args.title,
+                    family_data.get('generations', []), width_px=args.poster, progress=progress
+                )
+            print(f"\n海报: {output_path}（{width}×{height}像素）")
+        
+        else:
+            # 生成并保存家谱图
+            output_path = os.path.join('瓜藤图', f'{args.title}.png')
+            targets = None
+            if args.formats:
+                targets = output_targets(os.path.join('瓜藤图', args.title), args.formats)
+                output_path = targets[0]['path']
+            output_paths = render_family_tree(family_data, output_path, args.title, profiler=profiler, show=True,
+                                              layout=args.layout, workers=args.workers or os.cpu_count(),
+                                              split_depth=args.split_depth, max_nodes=args.max_nodes,
+                                              max_depth=args.max_depth, min_box_px=args.min_box_px,
+                                              targets=targets)
+            if targets:
+                for path in output_paths:
+                    print(f"已生成: {path}")
+    finally:
+        profiler.stop()
+    
+    # 性能报告写在输出文件旁边
+    sidecar_path = profiler.write_sidecar(output_path)
+    if sidecar_path:
+        print(profiler.summary())
+        print(f"性能报告: {sidecar_path}")
 
 # 只有直接运行main.py时才执行主函数
 if __name__ == "__main__":
@@ -1,7 +1,174 @@
 import re
 import json
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
 
-def parse_markdown_family_tree(markdown_content):
+# 人名后的关系标注：[配:王氏]、[配:@天盛]（家谱中的另一人）、[出继:@明德]（过继给家谱中的另一人）
+# 方括号可以用全角【】，冒号可以用全角：，多个名字用逗号或顿号分隔
+_RELATION = re.compile(r'\s*[\[【]\s*(配|出继)\s*[:：]\s*([^\]】]*)[\]】]')
+_RELATION_SEPARATOR = re.compile(r'[,，、]')
+
+# 关系类型：配偶（家谱中的另一人）、过继（本人过继给目标）
+LINK_SPOUSE = 'spouse'
+LINK_ADOPTED_BY = 'adopted_by'
+
+
+class PersonIndex:
+    """按名字查找家谱中的人，用于解析配偶、过继等关系引用的目标"""
+
+    def __init__(self, nodes, parents):
+        """nodes为先序遍历顺序的节点数据，parents为每个节点的父节点编号（根节点为-1）"""
+        self.nodes = nodes
+        self.parents = parents
+        self.by_name = {}
+        for index, node in enumerate(nodes):
+            self.by_name.setdefault(node.get('name', ''), []).append(index)
+
+    @classmethod
+    def from_tree(cls, family_data):
+        nodes, parents = [], []
+        stack = [(family_data, -1)]
+        while stack:
+            node, parent = stack.pop()
+            index = len(nodes)
+            nodes.append(node)
+            parents.append(parent)
+            stack.extend((child, index) for child in reversed(node.get('children', [])))
+        return cls(nodes, parents)
+
+    def resolve(self, reference):
+        """
+        引用写作"名字"，同名的人可以写上祖先加以区分，如"明圣/俊盛"、"文达/明圣/俊盛"
+        返回节点编号；找不到或不唯一时抛出ValueError
+        """
+        parts = [part.strip() for part in reference.strip().lstrip('@').split('/')]
+        matches = []
+        for index in self.by_name.get(parts[-1], []):
+            current = index
+            for name in reversed(parts[:-1]):
+                current = self.parents[current]
+                if current < 0 or self.nodes[current].get('name') != name:
+                    break
+            else:
+                matches.append(index)
+        if not matches:
+            raise ValueError(f"找不到关系中引用的人\"{reference}\"")
+        if len(matches) > 1:
+            raise ValueError(f"关系中引用的\"{reference}\"有{len(matches)}人同名，请写上父亲的名字，如\"父名/{parts[-1]}\"")
+        return matches[0]
+
+
+# 人物属性：人名后的 {生:1890; 卒:1950; 注:长房; 照片:照片/明圣.jpg}，各项用分号分隔
+ATTRIBUTE_BIRTH = '生'
+ATTRIBUTE_DEATH = '卒'
+ATTRIBUTE_NOTE = '注'
+ATTRIBUTE_PHOTO = '照片'
+_ATTRIBUTE_SEPARATOR = re.compile(r'[;；]')
+_ATTRIBUTE_KEY = re.compile(r'[:：]')
+_ATTRIBUTES = re.compile(r'\{([^{}]*)\}$')
+
+
+def find_attributes(line):
+    """
+    属性文本（不含花括号）在行中的起止位置，没有属性时返回None
+    只有行末用花括号完整括起、其中没有其他花括号的部分才是属性，其他位置的花括号属于名字
+    """
+    match = _ATTRIBUTES.search(line.rstrip())
+    return match.span(1) if match else None
+
+
+def decode_attributes(text):
+    """解析属性文本为字典，没有写名称的一项作为备注"""
+    attributes = {}
+    for item in _ATTRIBUTE_SEPARATOR.split(text):
+        parts = _ATTRIBUTE_KEY.split(item, 1)
+        if len(parts) == 2 and parts[0].strip():
+            attributes[parts[0].strip()] = parts[1].strip()
+        elif item.strip():
+            attributes.setdefault(ATTRIBUTE_NOTE, item.strip())
+    return attributes
+
+
+class PersonAttributes:
+    """
+    人物属性附表，按节点编号（先序遍历顺序，与 columnar_export 的编号相同）查找
+    只保存每人属性文本在源文本中的起止位置，读取时才解析，家谱数据本身只有名字，
+    只画名字的渲染不受影响，属性很多的家谱也只多占用几个整数数组
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.ids = array('q')
+        self.starts = array('q')
+        self.ends = array('q')
+
+    def add(self, node_id, start, end):
+        """节点编号按先序遍历递增添加"""
+        self.ids.append(node_id)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _position(self, node_id):
+        position = bisect_left(self.ids, node_id)
+        if position < len(self.ids) and self.ids[position] == node_id:
+            return position
+        return -1
+
+    def __contains__(self, node_id):
+        return self._position(node_id) >= 0
+
+    def raw(self, node_id):
+        """属性的原始文本，没有属性时返回None"""
+        position = self._position(node_id)
+        if position < 0:
+            return None
+        return self.source[self.starts[position]:self.ends[position]]
+
+    def get(self, node_id):
+        """属性字典（如 {'生': '1890', '卒': '1950'}），没有属性时返回空字典"""
+        text = self.raw(node_id)
+        return decode_attributes(text) if text is not None else {}
+
+    def items(self):
+        """按编号顺序遍历 (节点编号, 属性字典)"""
+        for node_id, start, end in zip(self.ids, self.starts, self.ends):
+            yield node_id, decode_attributes(self.source[start:end])
+
+
+def has_relations(family_data):
+    """家谱中是否有配偶或过继关系（没有时使用普通的树形布局）"""
+    stack = [family_data]
+    while stack:
+        node = stack.pop()
+        if node.get('spouses') or node.get('links'):
+            return True
+        stack.extend(node.get('children', []))
+    return False
+
+
+def _parse_relations(name, node_data):
+    """取出人名后的关系标注，返回 (去掉标注的人名, 新增的引用列表)"""
+    links = []
+    for kind, targets in _RELATION.findall(name):
+        for target in _RELATION_SEPARATOR.split(targets):
+            target = target.strip()
+            if not target:
+                continue
+            if kind == '配' and not target.startswith('@'):
+                # 不在家谱中的配偶，只显示在本人旁边
+                node_data.setdefault('spouses', []).append(target)
+            else:
+                link = {'type': LINK_SPOUSE if kind == '配' else LINK_ADOPTED_BY,
+                        'target': target.lstrip('@').strip()}
+                node_data.setdefault('links', []).append(link)
+                links.append(link)
+    return _RELATION.sub('', name).strip(), links
+
+def parse_markdown_family_tree(markdown_content, node_lines=None):
     """
     解析markdown格式的家谱数据，转换为JSON格式
     
@@ -13,15 +180,41 @@ def parse_markdown_family_tree(markdown_content):
         - 第三代A1
         - 第三代A2
       - 第二代B
+    
+    人名后可以标注配偶和过继关系：
+      - 明圣 [配:李氏]          配偶不在家谱中，显示在本人旁边
+      - 明德 [配:@秀英]         与家谱中的另一人联姻
+      - 俊盛 [出继:@明德]       过继给家谱中的另一人
+    标注保存在节点数据的 spouses（名字列表）和 links（{'type', 'target'} 列表）中，
+    引用的人找不到或同名不唯一时抛出ValueError
+    
+    人名后还可以写人物属性（放在行末）：
+      - 明圣 {生:1890; 卒:1950; 注:长房; 照片:照片/明圣.jpg}
+    只有行末完整括起的"{…}"是属性，名字中间的花括号保留在名字里；"{"没有对应的"}"时抛出ValueError
+    属性不放入节点数据，结果中的 attributes 为 PersonAttributes 附表（没有属性时为None）
+    
+    node_lines为列表时，按先序遍历顺序依次添加每个人所在的行号（从0开始，按原文内容计算），
+    供结构编辑器把修改写回对应的行（见 tree_editor）
     """
-    lines = markdown_content.strip().split('\n')
+    content = markdown_content.strip()
+    # 去掉的开头空行数，用于把行号换算为原文中的行号
+    leading_lines = markdown_content[:len(markdown_content) - len(markdown_content.lstrip())].count('\n')
+    lines = content.split('\n')
+    
+    # 有属性时才记录每行在源文本中的起始位置
+    attributes = None
+    line_starts = None
+    if '{' in content:
+        line_starts = list(accumulate((len(line) + 1 for line in lines[:-1]), initial=0))
+    node_count = 0  # 已加入家谱的人数，即下一个人的编号
     
     title = ""
     generations = []
     root_data = None
     stack = []  # 用于跟踪层级关系
+    pending_links = []  # (行号, 关系)，全部解析完后检查引用的人
     
-    for line in lines:
+    for line_number, line in enumerate(lines, 1):
         line = line.rstrip()
         if not line:
             continue
@@ -57,16 +250,34 @@ def parse_markdown_family_tree(markdown_content):
             indent_level = (len(line) - len(line.lstrip(' '))) // 2
             
             name = temp_line.strip()
+            attribute_span = None
+            if line_starts is not None and '{' in name:
+                # 属性为行末的"{…}"，只记录位置
+                span = find_attributes(line)
+                if span is not None:
+                    start = line_starts[line_number - 1]
+                    attribute_span = (start + span[0], start + span[1])
+                    name = name[:len(name) - (len(line) - span[0] + 1)].strip()
+                elif name.rfind('{') > name.rfind('}'):
+                    raise ValueError(f"第{line_number}行：人物属性缺少结尾的\"}}\"")
             if not name:
                 continue
                 
             # 创建节点数据
-            node_data = {"name": name}
+            node_data = {}
+            if '配' in name or '出继' in name:
+                name, links = _parse_relations(name, node_data)
+                pending_links.extend((line_number, link) for link in links)
+            node_data = {"name": name, **node_data}
             
             # 处理根节点
             if indent_level == 0:
                 root_data = node_data
                 stack = [root_data]
+                node_count = 0
+                attributes = None
+                if node_lines is not None:
+                    del node_lines[:]
             else:
                 # 调整stack到当前层级
                 while len(stack) > indent_level:
@@ -79,14 +290,34 @@ def parse_markdown_family_tree(markdown_content):
                         parent['children'] = []
                     parent['children'].append(node_data)
                     stack.append(node_data)
+                else:
+                    continue
+            
+            if attribute_span is not None:
+                if attributes is None:
+                    attributes = PersonAttributes(content)
+                attributes.add(node_count, *attribute_span)
+            if node_lines is not None:
+                node_lines.append(leading_lines + line_number - 1)
+            node_count += 1
     
     # 如果有字辈信息，添加到根数据中
     if generations and root_data:
         root_data["generations"] = generations
     
+    # 检查关系引用的人（行号按去掉首尾空行后的内容计算）
+    if pending_links and root_data:
+        index = PersonIndex.from_tree(root_data)
+        for line_number, link in pending_links:
+            try:
+                index.resolve(link['target'])
+            except ValueError as e:
+                raise ValueError(f"第{line_number}行：{e}") from None
+    
     return {
         "title": title,
-        "data": root_data
+        "data": root_data,
+        "attributes": attributes
     }
 
 def markdown_to_json_file(markdown_file_path, json_file_path):
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+matplotlib缓存目录
+PyInstaller打包的程序默认把matplotlib配置目录放在每次启动都会重新创建的临时目录中，
+首次查找字体时需要扫描全部系统字体重建字体缓存，启动后第一次生成要多等好几秒。
+打包时预先生成字体缓存并随程序一起发布（build.py），运行时把配置目录指向用户目录下
+固定的位置，首次运行时复制预置的缓存，以后直接复用。
+
+本模块不导入matplotlib，必须在首次导入matplotlib之前调用 configure_matplotlib_cache()。
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+
+# 打包后预置字体缓存所在的目录（相对于程序资源目录）
+BUNDLED_CACHE_DIR = 'mpl_cache'
+
+APP_NAME = '家谱生成器'
+
+
+def user_cache_dir():
+    """用户目录下固定的matplotlib配置目录"""
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, APP_NAME, 'matplotlib')
+
+
+def configure_matplotlib_cache():
+    """
+    打包环境中使用持久的matplotlib配置目录，并在首次运行时复制预置的字体缓存
+    开发环境中不做任何修改；返回使用的目录（未修改时返回None）
+    """
+    if not getattr(sys, 'frozen', False):
+        return None
+
+    cache_dir = user_cache_dir()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        return None  # 无法写入用户目录时保留默认设置
+
+    bundled = os.path.join(getattr(sys, '_MEIPASS', os.path.dirname(sys.executable)), BUNDLED_CACHE_DIR)
+    if os.path.isdir(bundled):
+        for name in os.listdir(bundled):
+            target = os.path.join(cache_dir, name)
+            if not os.path.exists(target):
+                try:
+                    shutil.copy2(os.path.join(bundled, name), target)
+                except OSError:
+                    pass
+
+    # 工作进程继承环境变量，同样使用该目录
+    os.environ['MPLCONFIGDIR'] = cache_dir
+    return cache_dir
+
+
+def build_font_cache(target_dir):
+    """
+    在新的Python进程中生成matplotlib字体缓存，写入target_dir（打包时调用），返回生成的文件列表
+    缓存中记录的系统字体路径与打包机器相同；目标电脑上找不到某个字体文件时，
+    matplotlib会自动重建缓存
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    env = dict(os.environ, MPLCONFIGDIR=os.path.abspath(target_dir))
+    code = (
+        "import warnings\n"
+        "from matplotlib import font_manager\n"
+        "with warnings.catch_warnings():\n"
+        "    warnings.simplefilter('ignore')\n"
+        "    font_manager.findfont(font_manager.FontProperties(family=['SimHei', 'sans-serif']))\n"
+    )
+    subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return sorted(name for name in os.listdir(target_dir) if name.startswith('fontlist'))
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行布局
+在指定深度把家谱树拆分为互相独立的子树，每个子树的布局和绘图几何数据在单独的
+工作进程中计算，再按先序遍历顺序拼接，最后在主进程中一次性绘制。
+
+标准布局中子树的横向位置只取决于左侧兄弟子树的叶子数：主进程先统计各子树的
+叶子数并计算上层节点的布局，再把每个子树的左边界和y坐标交给工作进程，
+因此得到的几何数据与单进程计算逐位相同，生成的图片也完全一致。
+
+并行绘制PNG
+大家谱保存PNG的耗时远超布局。rasterize_parallel 把最终图片沿较长的方向切成若干竖条或横条，
+每个工作进程只用与本条相交的节点和连线重建同一个图形，按整张图的紧凑边界只保存本条的像素，
+主进程按顺序拼接。相邻条带多绘制一段重叠区域再丢弃，避免画布边缘裁剪线条造成的抗锯齿差别，
+拼接结果与单进程保存的图片逐像素相同。
+"""
+
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from main import (
+    FIGURE_SIZE, GeometryBuilder, build_tree, calculate_depth, calculate_layout_widths,
+    calculate_positions, collect_geometry, compute_geometry, draw_tree_figure, geometry_bounds,
+    set_y_coordinates
+)
+from profiler import RenderProfiler
+
+# 并行绘制时每个进程分到的条数，条带之间节点疏密不同时用于平衡负载
+STRIPS_PER_WORKER = 2
+
+# 相邻条带重叠的像素数
+STRIP_OVERLAP_PX = 64
+
+# 节点文字的字号和行距（与 main.draw_node_labels 相同），用于估计文字超出方框的范围
+LABEL_FONT_SIZE = 10
+LABEL_LINE_SPACING = 1.2
+
+# 线宽等额外的余量（磅）
+STRIP_PAD_PT = 4
+
+
+def count_leaves(data):
+    """统计子树的叶子数（即标准布局中的布局宽度）"""
+    leaves = 0
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        children = node.get('children')
+        if children:
+            stack.extend(children)
+        else:
+            leaves += 1
+    return leaves
+
+
+def choose_split_depth(family_data, workers):
+    """
+    选择拆分深度：子树数量至少为进程数的4倍的最浅一层，
+    没有这样的层时选择节点最多的一层；树只有根节点时返回None
+    """
+    level = family_data.get('children', [])
+    depth = 1
+    best_depth, best_size = None, 0
+    while level:
+        if len(level) >= workers * 4:
+            return depth
+        if len(level) > best_size:
+            best_depth, best_size = depth, len(level)
+        level = [child for node in level for child in node.get('children', [])]
+        depth += 1
+    return best_depth
+
+
+def _truncate(data, depth, split_depth, cuts):
+    """复制上层数据，拆分深度处的节点不带子节点，原始子树记录到cuts中"""
+    copy = {key: value for key, value in data.items() if key != 'children'}
+    if depth == split_depth:
+        cuts.append(data)
+        return copy
+    if 'children' in data:
+        copy['children'] = [_truncate(child, depth + 1, split_depth, cuts) for child in data['children']]
+    return copy
+
+
+def _subtree_geometry(task):
+    """工作进程：计算一个子树的布局和几何数据"""
+    data, depth, slot_x, y = task
+    root = build_tree(data)
+    root.depth = depth
+    calculate_depth(root)
+    calculate_positions(root, slot_x)
+    set_y_coordinates(root, y)
+    return collect_geometry(root)
+
+
+def compute_geometry_parallel(family_data, workers, split_depth=None, profiler=None):
+    """
+    多进程计算标准布局的几何数据，结果与 main.compute_geometry 完全相同
+    """
+    if profiler is None:
+        profiler = RenderProfiler()
+    if split_depth is None:
+        split_depth = choose_split_depth(family_data, workers)
+    if not split_depth or split_depth < 1:
+        return compute_geometry(family_data, 'classic', profiler)
+
+    with profiler.stage('split'):
+        # 构建上层树，拆分深度处的节点作为占位叶子
+        cuts = []
+        upper_root = build_tree(_truncate(family_data, 0, split_depth, cuts))
+        if not cuts:
+            # 树的深度不足，无需拆分
+            return compute_geometry(family_data, 'classic', profiler)
+        calculate_depth(upper_root)
+
+        # 按先序顺序找到占位节点，其布局宽度为对应子树的叶子数
+        placeholders = []
+        stack = [upper_root]
+        while stack:
+            node = stack.pop()
+            if node.depth == split_depth:
+                placeholders.append(node)
+            else:
+                stack.extend(reversed(node.children))
+        fixed = {id(node): count_leaves(data) for node, data in zip(placeholders, cuts)}
+
+        # 计算上层布局，得到每个子树的左边界和y坐标
+        calculate_positions(upper_root, 0, calculate_layout_widths(upper_root, fixed))
+        set_y_coordinates(upper_root)
+        tasks = [(data, split_depth, node.slot_x, node.y) for node, data in zip(placeholders, cuts)]
+
+    with profiler.stage('layout'):
+        chunksize = max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            subtrees = list(executor.map(_subtree_geometry, tasks, chunksize=chunksize))
+    profiler.count('subtrees', len(subtrees))
+
+    with profiler.stage('merge'):
+        # 按先序顺序拼接：上层节点直接添加，占位节点替换为子树的几何数据
+        results = {id(node): geometry for node, geometry in zip(placeholders, subtrees)}
+        builder = GeometryBuilder()
+        stack = [upper_root]
+        while stack:
+            node = stack.pop()
+            if id(node) in results:
+                builder.add_geometry(results[id(node)])
+            else:
+                builder.add_node(node)
+                stack.extend(reversed(node.children))
+        return builder.build()
+
+
+def _subset(geometry, node_mask, segment_mask, link_mask):
+    subset = {key: geometry[key][node_mask] for key in ('x', 'y', 'width', 'height', 'depth', 'collapsed')}
+    subset['names'] = [geometry['names'][i] for i in np.flatnonzero(node_mask)]
+    subset['segments'] = geometry['segments'][segment_mask]
+    if link_mask is not None:
+        subset['links'] = geometry['links'][link_mask]
+        subset['link_kinds'] = geometry['link_kinds'][link_mask]
+    return subset
+
+
+def _init_strip_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _render_strip(task):
+    """工作进程：用条带内的几何数据重建图形，返回本条的RGBA像素"""
+    import matplotlib.pyplot as plt
+    from matplotlib.transforms import Bbox
+
+    geometry, title, generations, generation_geometry, bounds, window, dpi, shape, crop = task
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE)
+    try:
+        draw_tree_figure(ax, geometry, title, generations, bounds, generation_geometry)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, dpi=dpi, bbox_inches=Bbox.from_bounds(*window), format='rgba')
+    finally:
+        plt.close(fig)
+    pixels = np.frombuffer(buffer.getvalue(), dtype=np.uint8).reshape(*shape, 4)
+    return pixels[crop]
+
+
+def _pixel_ranges(points, to_pixel, half_extent, pad):
+    """各图元沿拆分方向的像素范围；points为 (图元数, 点数, 2) 的数据坐标"""
+    pixels = to_pixel(points.reshape(-1, 2)).reshape(points.shape[:2])
+    return pixels.min(axis=1) - half_extent - pad, pixels.max(axis=1) + half_extent + pad
+
+
+def rasterize_parallel(fig, destination, dpi, geometry, title, generations, workers):
+    """
+    在多个进程中绘制 render_family_tree 创建的图形（fig由 main.draw_tree_figure 绘制geometry得到），
+    写入PNG，结果与 fig.savefig(destination, dpi=dpi, bbox_inches='tight') 逐像素相同。
+    返回RGBA图片（PIL.Image）；图片太小、只有一个进程或已在守护进程中时直接保存，返回None
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.image import imsave
+    from PIL import Image
+
+    # 与savefig相同地按目标分辨率计算紧凑边界（英寸，相对于原图形）
+    original_dpi = fig.dpi
+    fig.set_dpi(dpi)
+    try:
+        bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(plt.rcParams['savefig.pad_inches'])
+        to_display = fig.axes[0].transData.frozen()
+    finally:
+        fig.set_dpi(original_dpi)
+    width, height = int(bbox.width * dpi), int(bbox.height * dpi)
+
+    # 沿较长的方向切分，每条至少比两侧的重叠区域宽
+    vertical = width >= height
+    length = width if vertical else height
+    count = min(workers * STRIPS_PER_WORKER, length // (2 * STRIP_OVERLAP_PX))
+    if workers < 2 or count < 2 or multiprocessing.current_process().daemon:
+        fig.savefig(destination, dpi=dpi, bbox_inches='tight', format='png')
+        return None
+
+    # 数据坐标到最终图片中沿拆分方向的像素位置（横条按从上到下的行号）
+    axis = 0 if vertical else 1
+    if vertical:
+        def to_pixel(points):
+            return to_display.transform(points)[:, 0] - bbox.x0 * dpi
+    else:
+        def to_pixel(points):
+            return bbox.y0 * dpi + height - to_display.transform(points)[:, 1]
+    px_per_unit = abs(to_display.transform([(1, 1)]) - to_display.transform([(0, 0)]))[0, axis]
+    px_per_pt = dpi / 72
+    pad = STRIP_PAD_PT * px_per_pt
+
+    # 节点的范围取方框和文字中较大的一个；文字按每字占一个字号估计，偏大只会多画几个节点
+    lengths = np.fromiter((len(name) for name in geometry['names']), dtype=float, count=len(geometry['names']))
+    text_vertical = geometry['depth'] >= 2
+    if vertical:
+        box_half = geometry['width'] / 2 * px_per_unit
+        text_half = np.where(text_vertical, 1, lengths) * LABEL_FONT_SIZE / 2 * px_per_pt
+    else:
+        box_half = geometry['height'] / 2 * px_per_unit
+        text_half = np.where(text_vertical, lengths * LABEL_LINE_SPACING, 1) * LABEL_FONT_SIZE / 2 * px_per_pt
+    centers = np.column_stack([geometry['x'], geometry['y']])[:, None, :]
+    node_range = _pixel_ranges(centers, to_pixel, np.maximum(box_half, text_half), pad)
+    segment_range = _pixel_ranges(geometry['segments'], to_pixel, 0, pad)
+    links = geometry.get('links')
+    link_range = _pixel_ranges(links, to_pixel, 0, pad) if links is not None and len(links) else None
+    dashed = None if link_range is None else geometry['link_kinds'] > 0
+
+    depths, first_index = np.unique(geometry['depth'], return_index=True)
+    generation_geometry = {'depth': depths, 'y': geometry['y'][first_index]}
+    bounds = geometry_bounds(geometry)
+
+    tasks = []
+    step = -(-length // count)
+    for start in range(0, length, step):
+        stop = min(length, start + step)
+        low, high = max(0, start - STRIP_OVERLAP_PX), min(length, stop + STRIP_OVERLAP_PX)
+        node_mask = (node_range[0] <= high) & (node_range[1] >= low)
+        segment_mask = (segment_range[0] <= high) & (segment_range[1] >= low)
+        link_mask = None if link_range is None else (link_range[0] <= high) & (link_range[1] >= low)
+        # 虚线（过继连线）在画布边缘被裁剪后虚线的起点会改变：画布扩大到整条包含与本条相交的虚线
+        if link_mask is not None and (link_mask & dashed).any():
+            crossing = link_mask & dashed
+            low = max(0, min(low, int(np.floor(link_range[0][crossing].min()))))
+            high = min(length, max(high, int(np.ceil(link_range[1][crossing].max()))))
+        # 画布尺寸按 int(英寸×分辨率) 取整：多加半个像素避免浮点误差少一行，多出的部分在画布外
+        if vertical:
+            window = (bbox.x0 + low / dpi, bbox.y0, (high - low + 0.5) / dpi, bbox.height)
+            shape = (height, high - low)
+            crop = (slice(None), slice(start - low, stop - low))
+        else:
+            window = (bbox.x0, bbox.y0 + (height - high) / dpi, bbox.width, (high - low + 0.5) / dpi)
+            shape = (high - low, width)
+            crop = (slice(start - low, stop - low), slice(None))
+        tasks.append((_subset(geometry, node_mask, segment_mask, link_mask), title, generations,
+                      generation_geometry, bounds, window, dpi, shape, crop))
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_strip_worker) as executor:
+        strips = list(executor.map(_render_strip, tasks))
+    pixels = np.concatenate(strips, axis=1 if vertical else 0)
+    imsave(destination, pixels, format='png', dpi=dpi)
+    return Image.fromarray(pixels, 'RGBA')
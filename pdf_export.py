@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分页PDF导出
+把布局好的家谱图按固定比例切分为可打印的页面（如A3），相邻页面之间留有重叠边距，
+跨页的连接线在页面边缘标注续接的页码。页面逐页绘制并写入多页PDF，
+每次只在内存中保留一页的图形对象，与家谱大小无关。
+同时生成人名索引（CSV文件，并附在PDF末尾），列出每个人出现在哪些页面上。
+"""
+
+import csv
+import math
+import os
+
+import numpy as np
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+from main import draw_geometry, geometry_bounds
+
+# 纸张尺寸（毫米，纵向）
+PAGE_SIZES_MM = {
+    'A4': (210, 297),
+    'A3': (297, 420),
+    'A2': (420, 594),
+}
+
+MM_PER_INCH = 25.4
+POINTS_PER_INCH = 72
+
+# 页眉高度（毫米）
+HEADER_MM = 10
+
+# 跨页标记颜色
+MARKER_COLOR = '#c0392b'
+
+
+def _page_ranges(lo, hi, start, span, stride, count):
+    """区间[lo, hi]与哪些页面（列或行）相交，返回 (起始序号, 结束序号) 数组"""
+    first = np.ceil((lo - start - span) / stride).astype(int)
+    last = np.floor((hi - start) / stride).astype(int)
+    return np.clip(first, 0, count - 1), np.clip(last, 0, count - 1)
+
+
+def _subset(geometry, node_mask, segment_mask, link_mask=None):
+    """取出几何数据的一部分"""
+    subset = {key: geometry[key][node_mask] for key in ('x', 'y', 'width', 'height', 'depth', 'collapsed')}
+    subset['names'] = [name for name, keep in zip(geometry['names'], node_mask) if keep]
+    subset['segments'] = geometry['segments'][segment_mask]
+    if link_mask is not None:
+        subset['links'] = geometry['links'][link_mask]
+        subset['link_kinds'] = geometry['link_kinds'][link_mask]
+    return subset
+
+
+def _crossings(segments, window):
+    """
+    找出连接线穿出页面边界的位置
+    返回 [(x, y, 方向)]，方向为 'left'/'right'/'top'/'bottom'
+    """
+    x0, x1, y0, y1 = window
+    result = set()
+    for (ax_, ay), (bx, by) in segments:
+        if ay == by:  # 水平线段
+            lo, hi = min(ax_, bx), max(ax_, bx)
+            if lo < x0 <= hi:
+                result.add((x0, ay, 'left'))
+            if lo <= x1 < hi:
+                result.add((x1, ay, 'right'))
+        if ax_ == bx:  # 垂直线段
+            lo, hi = min(ay, by), max(ay, by)
+            if lo < y0 <= hi:
+                result.add((ax_, y0, 'bottom'))
+            if lo <= y1 < hi:
+                result.add((ax_, y1, 'top'))
+    return sorted(result)
+
+
+def export_paginated_pdf(geometry, output_path, title, generations=(), page_size='A3',
+                         landscape=True, scale=20, margin_mm=12, overlap_mm=15):
+    """
+    把几何数据（见 main.compute_geometry）导出为分页PDF
+
+    scale: 每个布局单位对应的磅数（1磅 = 1/72英寸）
+    margin_mm: 页边距；overlap_mm: 相邻页面之间重叠的宽度
+    返回 (PDF路径, 索引CSV路径, 页数)
+    """
+    if page_size not in PAGE_SIZES_MM:
+        raise ValueError(f"不支持的纸张尺寸：{page_size}")
+    page_w_mm, page_h_mm = PAGE_SIZES_MM[page_size]
+    if landscape:
+        page_w_mm, page_h_mm = page_h_mm, page_w_mm
+
+    # 页面可绘制区域（布局单位）
+    units_per_mm = POINTS_PER_INCH / MM_PER_INCH / scale
+    span_x = (page_w_mm - 2 * margin_mm) * units_per_mm
+    span_y = (page_h_mm - 2 * margin_mm - HEADER_MM) * units_per_mm
+    overlap = overlap_mm * units_per_mm
+    stride_x = span_x - overlap
+    stride_y = span_y - overlap
+    if stride_x <= 0 or stride_y <= 0:
+        raise ValueError("重叠宽度过大，超过了页面可绘制区域")
+
+    min_x, max_x, min_y, max_y = geometry_bounds(geometry)
+    n_cols = max(1, math.ceil((max_x - min_x - overlap) / stride_x))
+    n_rows = max(1, math.ceil((max_y - min_y - overlap) / stride_y))
+
+    def window(row, col):
+        x0 = min_x + col * stride_x
+        y1 = max_y - row * stride_y
+        return x0, x0 + span_x, y1 - span_y, y1
+
+    # 计算每个节点和线段与哪些页面相交（行从上往下编号）
+    x, y = geometry['x'], geometry['y']
+    half_w, half_h = geometry['width'] / 2, geometry['height'] / 2
+    node_cols = _page_ranges(x - half_w, x + half_w, min_x, span_x, stride_x, n_cols)
+    node_rows = _page_ranges(max_y - (y + half_h), max_y - (y - half_h), 0, span_y, stride_y, n_rows)
+    seg = geometry['segments']
+    seg_x, seg_y = seg[:, :, 0], seg[:, :, 1]
+    seg_cols = _page_ranges(seg_x.min(axis=1), seg_x.max(axis=1), min_x, span_x, stride_x, n_cols)
+    seg_rows = _page_ranges(max_y - seg_y.max(axis=1), max_y - seg_y.min(axis=1), 0, span_y, stride_y, n_rows)
+    # 配偶和过继连线同样按所在页面分配
+    links = geometry.get('links')
+    if links is not None and len(links):
+        link_x, link_y = links[:, :, 0], links[:, :, 1]
+        link_cols = _page_ranges(link_x.min(axis=1), link_x.max(axis=1), min_x, span_x, stride_x, n_cols)
+        link_rows = _page_ranges(max_y - link_y.max(axis=1), max_y - link_y.min(axis=1), 0, span_y, stride_y, n_rows)
+    else:
+        link_cols = link_rows = None
+
+    # 第一遍：确定非空页面并编号（先行后列）
+    page_numbers = {}
+    for row in range(n_rows):
+        node_in_row = (node_rows[0] <= row) & (row <= node_rows[1])
+        seg_in_row = (seg_rows[0] <= row) & (row <= seg_rows[1])
+        for col in range(n_cols):
+            if (np.any(node_in_row & (node_cols[0] <= col) & (col <= node_cols[1])) or
+                    np.any(seg_in_row & (seg_cols[0] <= col) & (col <= seg_cols[1]))):
+                page_numbers[(row, col)] = len(page_numbers) + 1
+    total_pages = len(page_numbers)
+
+    neighbours = {'left': (0, -1), 'right': (0, 1), 'top': (-1, 0), 'bottom': (1, 0)}
+    marker_style = {
+        'left': dict(ha='left', va='center', text='←第{}页'),
+        'right': dict(ha='right', va='center', text='第{}页→'),
+        'top': dict(ha='center', va='top', text='↑第{}页'),
+        'bottom': dict(ha='center', va='bottom', text='↓第{}页'),
+    }
+
+    fig_size = (page_w_mm / MM_PER_INCH, page_h_mm / MM_PER_INCH)
+    axes_rect = [
+        margin_mm / page_w_mm,
+        margin_mm / page_h_mm,
+        1 - 2 * margin_mm / page_w_mm,
+        1 - (2 * margin_mm + HEADER_MM) / page_h_mm,
+    ]
+
+    pages_of_node = [[] for _ in range(len(geometry['names']))]
+    base, _ = os.path.splitext(str(output_path))
+    pdf_path = f"{base}.pdf"
+
+    # 第二遍：逐页绘制并写入PDF
+    with PdfPages(pdf_path) as pdf:
+        for (row, col), number in page_numbers.items():
+            node_mask = ((node_rows[0] <= row) & (row <= node_rows[1]) &
+                         (node_cols[0] <= col) & (col <= node_cols[1]))
+            seg_mask = ((seg_rows[0] <= row) & (row <= seg_rows[1]) &
+                        (seg_cols[0] <= col) & (col <= seg_cols[1]))
+            link_mask = None if link_rows is None else ((link_rows[0] <= row) & (row <= link_rows[1]) &
+                                                        (link_cols[0] <= col) & (col <= link_cols[1]))
+            for index in np.flatnonzero(node_mask):
+                pages_of_node[index].append(number)
+
+            x0, x1, y0, y1 = window(row, col)
+            fig = Figure(figsize=fig_size)
+            ax = fig.add_axes(axes_rect)
+            ax.set_xlim(x0, x1)
+            ax.set_ylim(y0, y1)
+            ax.axis('off')
+
+            page_geometry = _subset(geometry, node_mask, seg_mask, link_mask)
+            draw_geometry(ax, page_geometry)
+            for collection in ax.collections:
+                collection.set_clip_on(True)
+
+            # 跨页连接线标记
+            for mx, my, side in _crossings(page_geometry['segments'], (x0, x1, y0, y1)):
+                d_row, d_col = neighbours[side]
+                target = page_numbers.get((row + d_row, col + d_col))
+                if target is None:
+                    continue
+                style = marker_style[side]
+                ax.text(mx, my, style['text'].format(target), ha=style['ha'], va=style['va'],
+                        fontsize=6, color=MARKER_COLOR, zorder=4)
+
+            # 每页左侧显示本页可见各代的字辈
+            if len(page_geometry['depth']):
+                depths, first_index = np.unique(page_geometry['depth'], return_index=True)
+                for depth, index in zip(depths, first_index):
+                    if depth < len(generations):
+                        ax.text(-0.005, page_geometry['y'][index], generations[depth],
+                                transform=ax.get_yaxis_transform(), ha='right', va='center',
+                                fontsize=9, fontweight='bold', color='#333333', clip_on=False)
+
+            fig.text(0.5, 1 - (margin_mm / 2) / page_h_mm,
+                     f"{title}    第 {number} 页 / 共 {total_pages} 页（第{row + 1}行 第{col + 1}列）",
+                     ha='center', va='center', fontsize=10)
+            pdf.savefig(fig)
+
+        # 人名索引（不含折叠子树的汇总框）
+        index_entries = sorted(
+            (name, int(depth), pages)
+            for name, depth, pages, collapsed in zip(geometry['names'], geometry['depth'],
+                                                     pages_of_node, geometry['collapsed'])
+            if not collapsed
+        )
+        _write_index_pages(pdf, index_entries, generations, title, fig_size)
+
+    index_path = f"{base}.index.csv"
+    with open(index_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['姓名', '代数', '字辈', '页码'])
+        for name, depth, pages in index_entries:
+            generation = generations[depth] if depth < len(generations) else ''
+            writer.writerow([name, depth + 1, generation, '、'.join(map(str, pages))])
+
+    return pdf_path, index_path, total_pages
+
+
+def _write_index_pages(pdf, entries, generations, title, fig_size, columns=4, lines_per_column=60):
+    """在PDF末尾附上人名索引页"""
+    per_page = columns * lines_per_column
+    for start in range(0, len(entries), per_page):
+        fig = Figure(figsize=fig_size)
+        fig.text(0.5, 0.97, f"{title}    人名索引", ha='center', va='center', fontsize=12)
+        for i, (name, depth, pages) in enumerate(entries[start:start + per_page]):
+            column, line = divmod(i, lines_per_column)
+            generation = f"（{generations[depth]}）" if depth < len(generations) else ''
+            fig.text(0.04 + column / columns * 0.94, 0.93 - line * 0.88 / lines_per_column,
+                     f"{name}{generation} 第{depth + 1}代 …… {'、'.join(map(str, pages))}",
+                     ha='left', va='center', fontsize=7)
+        pdf.savefig(fig)
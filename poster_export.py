@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+海报导出（超大PNG）
+用于打印挂墙海报的超大图片（如宽60000像素）。matplotlib的Agg后端一次为整张图片分配
+RGBA缓冲区，图片过大时内存不足，而且单张画布的宽高不能超过65535像素。
+
+本模块把布局好的家谱图按水平条带逐条绘制：每条只绘制与条带相交的节点和连接线，
+画完立即把像素行压缩写入同一个PNG文件，峰值内存只取决于一条条带的大小，与图片总高度无关。
+图片宽度超过单张画布的上限时，每条条带再按列分块绘制后拼接。
+
+文字和线条的比例与分页PDF相同（scale为每个布局单位对应的磅数），
+按目标宽度换算为分辨率，相当于把整张图按很高的分辨率一次绘制。
+"""
+
+import struct
+import zlib
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from main import draw_generation_labels, draw_geometry, geometry_bounds
+from fonts import get_font_properties
+
+POINTS_PER_INCH = 72
+
+# 每条条带的内存预算（字节，按RGBA计算）
+BAND_BYTES = 64 * 1024 * 1024
+
+# 单次绘制的最大宽度（像素），Agg画布的宽高不能超过65535
+MAX_TILE_WIDTH = 32768
+
+# 滤波和压缩时每块的大小（字节）
+FILTER_BLOCK_BYTES = 4 * 1024 * 1024
+
+# 每个IDAT数据块的大小
+IDAT_CHUNK_SIZE = 1 << 20
+
+# 标题区域高度（布局单位）和标题字号
+TITLE_MARGIN = 4
+TITLE_FONT_SIZE = 36
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class PngStreamWriter:
+    """
+    逐行写入PNG文件（8位RGB），不在内存中保留整张图片
+    每行使用Up滤波（与上一行相减），大片空白和重复的线条压缩效果好，且可以整块向量化计算
+    """
+
+    def __init__(self, path, width, height, dpi=None, compress_level=6):
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.file = open(path, 'wb')
+        self.compressor = zlib.compressobj(compress_level)
+        self.pending = []
+        self.pending_size = 0
+        self.previous_row = np.zeros((1, width, 3), dtype=np.uint8)
+
+        self.file.write(PNG_SIGNATURE)
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        if dpi:
+            pixels_per_meter = round(dpi / 0.0254)
+            self._chunk(b'pHYs', struct.pack('>IIB', pixels_per_meter, pixels_per_meter, 1))
+
+    def _chunk(self, kind, data):
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(kind)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)) & 0xffffffff))
+
+    def _emit(self, data, force=False):
+        if data:
+            self.pending.append(data)
+            self.pending_size += len(data)
+        if self.pending_size >= IDAT_CHUNK_SIZE or (force and self.pending_size):
+            self._chunk(b'IDAT', b''.join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def write_rows(self, rows):
+        """写入若干行像素（形状为 行数×宽度×3 的uint8数组）"""
+        rows = np.ascontiguousarray(rows, dtype=np.uint8)
+        if rows.shape[1:] != (self.width, 3):
+            raise ValueError(f"像素行的形状不正确：{rows.shape}")
+        if self.rows_written + len(rows) > self.height:
+            raise ValueError("写入的行数超过了图片高度")
+        # 分小块滤波和压缩，临时数组不超过几MB
+        step = max(1, FILTER_BLOCK_BYTES // (self.width * 3))
+        for start in range(0, len(rows), step):
+            block = rows[start:start + step]
+            filtered = np.empty((len(block), 1 + self.width * 3), dtype=np.uint8)
+            filtered[:, 0] = 2  # Up滤波
+            view = filtered[:, 1:].reshape(block.shape)
+            np.subtract(block[:1], self.previous_row, out=view[:1])  # uint8按256取模
+            np.subtract(block[1:], block[:-1], out=view[1:])
+            self._emit(self.compressor.compress(filtered))
+            self.previous_row = block[-1:].copy()
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self.rows_written != self.height:
+            self.file.close()
+            raise ValueError(f"只写入了 {self.rows_written} 行，图片高度为 {self.height} 行")
+        self._emit(self.compressor.flush(), force=True)
+        self._chunk(b'IEND', b'')
+        self.file.close()
+
+
+def _generation_geometry(geometry):
+    """每一代取一个节点的代数和y坐标，用于在每条条带中绘制字辈标签"""
+    depths, first_index = np.unique(geometry['depth'], return_index=True)
+    return {'depth': depths, 'y': geometry['y'][first_index]}
+
+
+def _subset(geometry, node_mask, segment_mask, link_mask=None):
+    subset = {key: geometry[key][node_mask] for key in ('x', 'y', 'width', 'height', 'depth', 'collapsed')}
+    subset['names'] = [geometry['names'][i] for i in np.flatnonzero(node_mask)]
+    subset['segments'] = geometry['segments'][segment_mask]
+    if link_mask is not None:
+        subset['links'] = geometry['links'][link_mask]
+        subset['link_kinds'] = geometry['link_kinds'][link_mask]
+    return subset
+
+
+def export_poster(geometry, output_path, title='', generations=(), width_px=60000, scale=20,
+                  band_bytes=BAND_BYTES, progress=None):
+    """
+    把几何数据（见 main.compute_geometry）导出为超大PNG海报
+
+    width_px: 图片宽度（像素）；scale: 每个布局单位对应的磅数，决定文字和线条相对节点的大小
+    band_bytes: 每条条带的内存预算；progress: 回调函数，参数为 (已完成行数, 总行数)
+    返回 (输出路径, 宽度, 高度)
+    """
+    min_x, max_x, min_y, max_y = geometry_bounds(geometry)
+    label_x = min_x - 5  # 左侧留出字辈标签的位置（与 render_family_tree 相同）
+    if title:
+        max_y += TITLE_MARGIN
+
+    px_per_unit = width_px / (max_x - label_x)
+    height_px = max(1, int(round((max_y - min_y) * px_per_unit)))
+    dpi = px_per_unit * POINTS_PER_INCH / scale
+    band_rows = max(1, min(height_px, band_bytes // (width_px * 4)))
+    tile_width = min(width_px, MAX_TILE_WIDTH)
+
+    # 节点和连接线的范围（向外扩展几个像素，包含线宽）
+    margin = 4 / px_per_unit
+    x, y = geometry['x'], geometry['y']
+    half_w, half_h = geometry['width'] / 2, geometry['height'] / 2
+    node_box = (x - half_w - margin, x + half_w + margin, y - half_h - margin, y + half_h + margin)
+    segments = geometry['segments']
+    seg_x, seg_y = segments[:, :, 0], segments[:, :, 1]
+    seg_box = (seg_x.min(axis=1) - margin, seg_x.max(axis=1) + margin,
+               seg_y.min(axis=1) - margin, seg_y.max(axis=1) + margin)
+    links = geometry.get('links')
+    if links is not None and len(links):
+        link_x, link_y = links[:, :, 0], links[:, :, 1]
+        link_box = (link_x.min(axis=1) - margin, link_x.max(axis=1) + margin,
+                    link_y.min(axis=1) - margin, link_y.max(axis=1) + margin)
+    else:
+        link_box = None
+    generation_geometry = _generation_geometry(geometry)
+
+    canvases = {}
+    writer = PngStreamWriter(output_path, width_px, height_px, dpi=dpi)
+    try:
+        for row in range(0, height_px, band_rows):
+            rows = min(band_rows, height_px - row)
+            band_top = max_y - row / px_per_unit
+            band_bottom = max_y - (row + rows) / px_per_unit
+            node_in_band = (node_box[2] <= band_top) & (node_box[3] >= band_bottom)
+            seg_in_band = (seg_box[2] <= band_top) & (seg_box[3] >= band_bottom)
+            link_in_band = None if link_box is None else (link_box[2] <= band_top) & (link_box[3] >= band_bottom)
+
+            band = np.empty((rows, width_px, 3), dtype=np.uint8)
+            for column in range(0, width_px, tile_width):
+                columns = min(tile_width, width_px - column)
+                tile_left = label_x + column / px_per_unit
+                tile_right = label_x + (column + columns) / px_per_unit
+                node_mask = node_in_band & (node_box[0] <= tile_right) & (node_box[1] >= tile_left)
+                seg_mask = seg_in_band & (seg_box[0] <= tile_right) & (seg_box[1] >= tile_left)
+                link_mask = None if link_box is None else (
+                    link_in_band & (link_box[0] <= tile_right) & (link_box[1] >= tile_left))
+
+                # 同样大小的块复用同一个画布，像素缓冲区只分配一次
+                if (columns, rows) not in canvases:
+                    canvases[(columns, rows)] = FigureCanvasAgg(Figure(figsize=(columns / dpi, rows / dpi), dpi=dpi))
+                canvas = canvases[(columns, rows)]
+                fig = canvas.figure
+                fig.clear()
+                ax = fig.add_axes([0, 0, 1, 1])
+                ax.set_xlim(tile_left, tile_right)
+                ax.set_ylim(band_bottom, band_top)
+                ax.axis('off')
+                if node_mask.any() or seg_mask.any() or (link_mask is not None and link_mask.any()):
+                    draw_geometry(ax, _subset(geometry, node_mask, seg_mask, link_mask))
+                # 字辈标签和标题数量很少，每块都绘制，画布外的部分会被裁掉
+                if generations and column == 0:
+                    draw_generation_labels(ax, generation_geometry, generations, min_x)
+                if title:
+                    ax.text((min_x + max_x) / 2, max_y - TITLE_MARGIN / 2, title, ha='center', va='center',
+                            fontproperties=get_font_properties(TITLE_FONT_SIZE))
+                canvas.draw()
+
+                pixels = np.asarray(canvas.buffer_rgba())[:, :, :3]
+                # 画布尺寸按浮点数换算，可能与目标相差一个像素：多余的裁掉，不足的补白
+                tile = band[:, column:column + columns]
+                tile[:] = 255
+                h, w = min(rows, pixels.shape[0]), min(columns, pixels.shape[1])
+                tile[:h, :w] = pixels[:h, :w]
+
+            writer.write_rows(band)
+            if progress is not None:
+                progress(row + rows, height_px)
+    finally:
+        if writer.rows_written == height_px:
+            writer.close()
+        else:
+            writer.file.close()
+    return output_path, width_px, height_px
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+渲染性能分析工具
+记录每个渲染阶段的耗时、CPU时间、节点数、图元数和峰值内存，
+并可选地输出cProfile数据。未启用时几乎没有额外开销。
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource  # Windows上没有该模块
+except ImportError:
+    resource = None
+
+# 未启用时所有阶段共用的空上下文
+_NULL_STAGE = contextlib.nullcontext()
+
+# 阶段名称对应的中文显示
+STAGE_LABELS = {
+    'parse': '解析',
+    'collapse': '折叠',
+    'build': '建树',
+    'split': '拆分',
+    'layout': '布局',
+    'geometry': '几何',
+    'merge': '拼接',
+    'draw': '绘制',
+    'preview': '预览',
+    'save': '保存',
+    'export': '导出',
+}
+
+
+def count_artists(ax):
+    """统计坐标轴上的图元数量"""
+    return len(ax.lines) + len(ax.patches) + len(ax.texts) + len(ax.collections)
+
+
+def _peak_rss_mb():
+    """进程峰值常驻内存（MB），不支持的平台返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS单位为字节，Linux为KB
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class RenderProfiler:
+    """记录一次渲染各阶段的性能数据"""
+
+    def __init__(self, enabled=False, cprofile=False):
+        self.enabled = enabled
+        self.cprofile = enabled and cprofile
+        self.stages = []
+        self.counts = {}
+        self._profile = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        """开始记录（启动内存跟踪和cProfile）"""
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.cprofile:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self):
+        """停止记录"""
+        if not self.enabled:
+            return
+        if self._profile is not None:
+            self._profile.disable()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def stage(self, name):
+        """返回记录一个阶段的上下文管理器"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._record_stage(name)
+
+    @contextlib.contextmanager
+    def _record_stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            stage = {
+                'name': name,
+                'wall_s': round(time.perf_counter() - wall_start, 6),
+                'cpu_s': round(time.process_time() - cpu_start, 6),
+            }
+            if tracing:
+                stage['peak_mem_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 3)
+            self.stages.append(stage)
+
+    def count(self, key, value):
+        """记录计数信息（如节点数、图元数）"""
+        if self.enabled:
+            self.counts[key] = value
+
+    def to_dict(self):
+        """转换为可序列化的字典"""
+        result = {
+            'stages': self.stages,
+            'total_wall_s': round(sum(s['wall_s'] for s in self.stages), 6),
+            'total_cpu_s': round(sum(s['cpu_s'] for s in self.stages), 6),
+            'counts': self.counts,
+        }
+        peak_rss = _peak_rss_mb()
+        if peak_rss is not None:
+            result['peak_rss_mb'] = round(peak_rss, 3)
+        return result
+
+    def write_sidecar(self, output_path):
+        """在输出图片旁写入JSON性能报告，启用cProfile时同时写入.prof文件"""
+        if not self.enabled:
+            return None
+        base, _ = os.path.splitext(str(output_path))
+        sidecar_path = f"{base}.profile.json"
+        with open(sidecar_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        if self._profile is not None:
+            self._profile.dump_stats(f"{base}.prof")
+        return sidecar_path
+
+    def summary(self):
+        """生成适合状态栏显示的简短摘要"""
+        if not self.enabled:
+            return ""
+        parts = [f"{STAGE_LABELS.get(s['name'], s['name'])} {s['wall_s']:.2f}s" for s in self.stages]
+        if 'nodes' in self.counts:
+            parts.append(f"节点 {self.counts['nodes']}")
+        if 'artists' in self.counts:
+            parts.append(f"图元 {self.counts['artists']}")
+        peak = max((s.get('peak_mem_mb', 0) for s in self.stages), default=0)
+        if peak:
+            parts.append(f"峰值内存 {peak:.1f}MB")
+        return " | ".join(parts)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+渲染队列窗口
+在文件列表中多选家谱文件加入队列，由渲染调度器（render_scheduler）在有限个工作进程中
+以批量优先级渲染，每个任务显示状态、排队等待和渲染的时间以及输出路径。
+已在排队或正在渲染的文件不会重复加入；期间仍可在主窗口中生成单个家谱图（交互优先级更高）。
+"""
+
+import os
+import time
+import tkinter as tk
+from tkinter import ttk
+
+# 任务状态
+STATUS_QUEUED = "排队中"
+STATUS_RUNNING = "渲染中"
+STATUS_DONE = "完成"
+STATUS_FAILED = "失败"
+
+# 刷新"渲染中"状态的间隔（毫秒）
+POLL_INTERVAL_MS = 500
+
+
+def _seconds(value):
+    return f"{value:.1f}s"
+
+
+class RenderQueuePanel:
+    """渲染队列窗口，app为 FamilyTreeGUI 实例（使用它的调度器和生成选项）"""
+
+    def __init__(self, app):
+        self.app = app
+        self.jobs = {}  # 文件名 -> {'item', 'status', 'path', 'submitted', 'started'}
+        self.polling = False
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("渲染队列")
+        self.window.geometry("820x420")
+        self.window.columnconfigure(1, weight=1)
+        self.window.rowconfigure(0, weight=1)
+
+        # 左侧：可多选的文件列表
+        file_frame = ttk.LabelFrame(self.window, text="家谱文件（可多选）", padding="5")
+        file_frame.grid(row=0, column=0, sticky=(tk.N, tk.S, tk.W, tk.E), padx=(10, 5), pady=10)
+        file_frame.rowconfigure(0, weight=1)
+        self.file_list = tk.Listbox(file_frame, selectmode=tk.EXTENDED, width=22,
+                                    font=("Microsoft YaHei", 10), exportselection=False)
+        self.file_list.grid(row=0, column=0, columnspan=2, sticky=(tk.N, tk.S, tk.W, tk.E))
+        ttk.Button(file_frame, text="全选", command=self.select_all).grid(row=1, column=0, pady=(5, 0))
+        ttk.Button(file_frame, text="加入队列", command=self.add_selected).grid(row=1, column=1, pady=(5, 0))
+
+        # 右侧：任务列表
+        job_frame = ttk.LabelFrame(self.window, text="任务", padding="5")
+        job_frame.grid(row=0, column=1, sticky=(tk.N, tk.S, tk.W, tk.E), padx=(5, 10), pady=10)
+        job_frame.columnconfigure(0, weight=1)
+        job_frame.rowconfigure(0, weight=1)
+        # 等待：从加入队列到开始渲染；渲染：从开始渲染到完成。渲染中和完成后两列的含义相同
+        columns = ('file', 'status', 'wait', 'elapsed', 'output')
+        self.table = ttk.Treeview(job_frame, columns=columns, show='headings')
+        for key, title, width in (('file', "文件", 140), ('status', "状态", 70), ('wait', "等待", 60),
+                                  ('elapsed', "渲染", 60), ('output', "输出", 260)):
+            self.table.heading(key, text=title)
+            self.table.column(key, width=width, anchor=tk.W if key in ('file', 'output') else tk.CENTER)
+        self.table.grid(row=0, column=0, sticky=(tk.N, tk.S, tk.W, tk.E))
+        scrollbar = ttk.Scrollbar(job_frame, orient=tk.VERTICAL, command=self.table.yview)
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.table.configure(yscrollcommand=scrollbar.set)
+        ttk.Button(job_frame, text="清除已结束的任务", command=self.clear_finished).grid(
+            row=1, column=0, sticky=tk.W, pady=(5, 0))
+
+        self.status_var = tk.StringVar(value="选择文件后点击\"加入队列\"")
+        tk.Label(self.window, textvariable=self.status_var, font=("Microsoft YaHei", 9),
+                 fg="#7f8c8d").grid(row=1, column=0, columnspan=2, sticky=tk.W, padx=10, pady=(0, 10))
+
+        self.refresh_files()
+
+    def exists(self):
+        try:
+            return bool(self.window.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def refresh_files(self):
+        """用主窗口的文件列表刷新可选文件"""
+        self.file_list.delete(0, tk.END)
+        for filename in self.app.file_combo['values']:
+            self.file_list.insert(tk.END, filename)
+
+    def select_all(self):
+        self.file_list.selection_set(0, tk.END)
+
+    def add_selected(self):
+        filenames = [self.file_list.get(index) for index in self.file_list.curselection()]
+        if not filenames:
+            self.status_var.set("请先在左侧选择文件")
+            return
+        self.add_files(filenames)
+
+    def add_files(self, filenames):
+        """把文件加入队列，已在排队或正在渲染的文件跳过；返回 (加入数, 跳过数)"""
+        added = skipped = 0
+        for filename in filenames:
+            job = self.jobs.get(filename)
+            if job is not None and job['status'] in (STATUS_QUEUED, STATUS_RUNNING):
+                skipped += 1
+                continue
+            try:
+                path = self.app.find_data_file(filename)
+            except FileNotFoundError as e:
+                self._set_job(filename, STATUS_FAILED, output=str(e))
+                continue
+            self._submit(filename, path)
+            added += 1
+
+        message = f"已加入 {added} 个文件"
+        if skipped:
+            message += f"，{skipped} 个已在队列中"
+        self.status_var.set(message)
+        self._start_polling()
+        return added, skipped
+
+    def _submit(self, filename, path):
+        job = self._set_job(filename, STATUS_QUEUED, wait='', elapsed='', output='')
+        job['path'] = os.path.abspath(path)
+        job['submitted'] = time.monotonic()
+        job['started'] = None
+        future = self.app.get_scheduler().submit(
+            path, self.app.output_dir, self.app.get_layout(), priority='batch',
+            max_nodes=self.app.get_max_nodes(), formats=self.app.get_formats())
+        # 回调在调度器线程中执行，界面更新交给主线程
+        future.add_done_callback(
+            lambda f, submitted=job['submitted']: self.app.root.after(0, self._finish, filename, submitted, f))
+
+    def _set_job(self, filename, status, wait=None, elapsed=None, output=None):
+        """新增或更新一行任务"""
+        job = self.jobs.get(filename)
+        if job is None or not self.table.exists(job['item']):
+            item = self.table.insert('', tk.END, values=(filename, status, '', '', ''))
+            job = {'item': item, 'status': status, 'path': None, 'submitted': None, 'started': None}
+            self.jobs[filename] = job
+        job['status'] = status
+        self.table.set(job['item'], 'status', status)
+        if wait is not None:
+            self.table.set(job['item'], 'wait', wait)
+        if elapsed is not None:
+            self.table.set(job['item'], 'elapsed', elapsed)
+        if output is not None:
+            self.table.set(job['item'], 'output', output)
+        return job
+
+    def _finish(self, filename, submitted, future):
+        job = self.jobs.get(filename)
+        if job is None or job['submitted'] != submitted or not self.exists():
+            return  # 任务已清除，或同一文件后来又加入了一次
+        if future.cancelled():
+            self._set_job(filename, STATUS_FAILED, output="已取消")
+        elif future.exception() is not None:
+            self._set_job(filename, STATUS_FAILED, output=str(future.exception()))
+        else:
+            result = future.result()
+            self._set_job(filename, STATUS_DONE, wait=_seconds(result['wait']),
+                          elapsed=_seconds(result['elapsed']), output=result['output_path'])
+        self._update_summary()
+
+    def _update_summary(self):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job['status']] = counts.get(job['status'], 0) + 1
+        self.status_var.set("，".join(f"{status} {counts[status]}"
+                                     for status in (STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED)
+                                     if counts.get(status)) or "队列为空")
+
+    def _start_polling(self):
+        if not self.polling:
+            self.polling = True
+            self.window.after(POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        """从调度器读取正在渲染的文件，更新状态、排队等待的时间和已渲染的时间"""
+        if not self.exists():
+            self.polling = False
+            return
+        running = set(self.app.get_scheduler().status()['running'])
+        active = False
+        for filename, job in self.jobs.items():
+            if job['status'] not in (STATUS_QUEUED, STATUS_RUNNING):
+                continue
+            active = True
+            now = time.monotonic()
+            if job['path'] in running:
+                if job['started'] is None:
+                    job['started'] = now
+                    self._set_job(filename, STATUS_RUNNING, wait=_seconds(now - job['submitted']))
+                self._set_job(filename, STATUS_RUNNING, elapsed=_seconds(now - job['started']))
+            elif job['started'] is None:
+                self._set_job(filename, STATUS_QUEUED, wait=_seconds(now - job['submitted']))
+        if active:
+            self.window.after(POLL_INTERVAL_MS, self._poll)
+        else:
+            self.polling = False
+        self._update_summary()
+
+    def clear_finished(self):
+        for filename, job in list(self.jobs.items()):
+            if job['status'] in (STATUS_DONE, STATUS_FAILED):
+                self.table.delete(job['item'])
+                del self.jobs[filename]
+        self._update_summary()
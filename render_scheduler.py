@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+渲染调度器
+GUI的交互渲染、监视模式的自动渲染和批量渲染共用一个基于asyncio的调度器：
+- 按优先级调度：interactive（交互） > watch（监视） > batch（批量）
+- 同一文件的请求合并：排队中的请求只保留最新参数；文件在渲染过程中被修改时，
+  取消正在进行的旧渲染，只渲染最新版本；文件未变化时直接复用正在进行的渲染
+- 限制同时渲染的进程数，另外为交互渲染预留名额，批量渲染不会让用户的点击长时间等待
+- 每个渲染任务在单独的工作进程中执行，可以随时取消
+
+GUI等同步代码通过 BackgroundScheduler 在后台线程中使用调度器。
+
+GUI、watch.py 和命令行批量渲染各自运行时是几个独立的调度器，排队顺序、合并和并发数限制只在
+各自的进程内有效；为了让交互渲染在几个进程之间也优先使用CPU，watch和batch任务的工作进程以较低的
+操作系统优先级运行（POSIX上用 os.nice，Windows上为 BELOW_NORMAL_PRIORITY_CLASS）。
+工作进程的优先级在启动时确定，已经开始的批量渲染被交互请求复用时仍以较低优先级完成。
+同一文件可能被几个进程同时渲染：临时文件名包含工作进程号（见 main.render_markdown_file），
+不会写坏图片，后完成的结果生效。
+
+用法：python render_scheduler.py 家谱数据 [--jobs 2] [--priority batch]
+"""
+
+import argparse
+import asyncio
+import glob
+import heapq
+import itertools
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+# 优先级：数字越小越优先
+PRIORITIES = {'interactive': 0, 'watch': 1, 'batch': 2}
+
+# 各优先级工作进程的nice增量（POSIX）；Windows上大于0的都使用 BELOW_NORMAL_PRIORITY_CLASS
+NICE_INCREMENTS = {'interactive': 0, 'watch': 5, 'batch': 10}
+BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+
+
+class RenderError(RuntimeError):
+    """渲染失败"""
+
+
+def _lower_priority(increment):
+    """降低当前进程的操作系统优先级（子进程继承），失败时按原优先级运行"""
+    if increment <= 0:
+        return
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            os.nice(increment)
+    except (AttributeError, OSError):
+        pass
+
+
+def _render_job(markdown_path, output_dir, layout, want_preview, profile, max_nodes, formats, nice, conn):
+    """工作进程：渲染一个文件，通过管道发送预览和结果"""
+    _lower_priority(nice)
+    import matplotlib
+    matplotlib.use('Agg')
+    from main import render_markdown_file
+    from profiler import RenderProfiler
+
+    start = time.perf_counter()
+    profiler = RenderProfiler(enabled=profile)
+    profiler.start()
+    try:
+        preview = None
+        if want_preview:
+            def preview(png_data):
+                conn.send(('preview', png_data))
+        try:
+            output_path = render_markdown_file(markdown_path, output_dir, layout, profiler, preview,
+                                               max_nodes, formats)
+        finally:
+            profiler.stop()
+        profiler.write_sidecar(output_path)
+        conn.send(('ok', {
+            'output_path': output_path,
+            'elapsed': time.perf_counter() - start,
+            'profile': profiler.summary(),
+        }))
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
+
+
+def _file_signature(path):
+    """文件的修改时间和大小，用于判断文件是否有新版本"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _remove_rendering_files(output_dir, pid):
+    """删除被终止的工作进程留下的临时文件（文件名格式见 main.render_markdown_file）"""
+    for path in glob.glob(os.path.join(glob.escape(output_dir), f'.*.{pid}.rendering*')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _RenderJob:
+    """一个文件的渲染任务"""
+
+    def __init__(self, key, seq, options, priority, future):
+        self.key = key
+        self.seq = seq
+        self.options = options  # (输出目录, 布局方式, 是否生成预览, 是否记录性能数据, 节点预算, 输出格式)
+        self.priority = priority
+        self.future = future
+        self.preview_callbacks = []
+        self.signature = None
+        self.submitted_at = time.monotonic()
+        self.process = None
+        self.superseded = False
+
+
+class RenderScheduler:
+    """
+    按优先级调度渲染任务（须在事件循环所在线程中调用）
+
+    concurrency: 同时渲染的最大进程数，默认为CPU核心数
+    interactive_reserve: 额外为交互渲染预留的进程数
+    """
+
+    def __init__(self, concurrency=None, interactive_reserve=1):
+        self.concurrency = concurrency or os.cpu_count() or 1
+        self.interactive_reserve = interactive_reserve
+        self.pending = {}   # 文件路径 -> 排队中的任务
+        self.running = {}   # 文件路径 -> 正在进行的任务
+        self.queue = []     # (优先级, 序号, 文件路径) 堆
+        self.counter = itertools.count()
+        self.tasks = set()  # 等待工作进程结果的协程
+        self.stats = {'submitted': 0, 'coalesced': 0, 'superseded': 0, 'completed': 0, 'failed': 0}
+
+    def submit(self, markdown_path, output_dir, layout='classic', priority='batch',
+               preview=False, profile=False, on_preview=None, max_nodes=None, formats=None):
+        """
+        提交渲染任务，返回asyncio.Future，结果为
+        {'output_path', 'elapsed', 'wait', 'profile'}
+        on_preview: 预览生成后调用的回调函数（参数为PNG数据，需preview=True）
+        max_nodes: 最多绘制的节点数，超出的子树折叠为汇总框
+        formats: 输出格式（如 "png,svg,pdf,thumb"，见 main.output_targets），默认只生成PNG；
+                 output_path为第一个输出的路径
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"未知的优先级：{priority}")
+        loop = asyncio.get_running_loop()
+        key = os.path.abspath(markdown_path)
+        level = PRIORITIES[priority]
+        options = (str(output_dir), layout, preview, profile, max_nodes, formats)
+        self.stats['submitted'] += 1
+
+        job = self.pending.get(key)
+        if job is not None:
+            # 合并到排队中的任务，使用最新参数和较高的优先级
+            self.stats['coalesced'] += 1
+            job.options = options
+            if level < job.priority:
+                job.priority = level
+                heapq.heappush(self.queue, (level, job.seq, key))
+        else:
+            running = self.running.get(key)
+            if running is not None and (running.superseded or running.future.done()):
+                running = None  # 旧渲染已结束或已被取代
+            if (running is not None and running.options == options
+                    and running.signature == _file_signature(key)):
+                # 文件没有变化，复用正在进行的渲染
+                self.stats['coalesced'] += 1
+                if on_preview is not None:
+                    running.preview_callbacks.append(on_preview)
+                return running.future
+
+            future = loop.create_future()
+            if running is not None:
+                # 文件已修改：取消旧渲染，等待旧结果的调用方改为等待新版本的结果
+                self.stats['superseded'] += 1
+                running.superseded = True
+                running.process.terminate()
+                future = running.future
+            job = _RenderJob(key, next(self.counter), options, level, future)
+            if running is not None:
+                job.preview_callbacks.extend(running.preview_callbacks)
+            self.pending[key] = job
+            heapq.heappush(self.queue, (level, job.seq, key))
+
+        if on_preview is not None:
+            job.preview_callbacks.append(on_preview)
+        self._dispatch()
+        return job.future
+
+    async def render(self, *args, **kwargs):
+        """提交并等待渲染完成（调用方被取消时不影响合并到同一任务的其他请求）"""
+        return await asyncio.shield(self.submit(*args, **kwargs))
+
+    def _can_start(self, priority):
+        active = len(self.running)
+        if active < self.concurrency:
+            return True
+        return priority == PRIORITIES['interactive'] and active < self.concurrency + self.interactive_reserve
+
+    def _dispatch(self):
+        """按优先级启动排队中的任务"""
+        deferred = []
+        while self.queue:
+            priority, seq, key = self.queue[0]
+            job = self.pending.get(key)
+            if job is None or job.seq != seq or job.priority != priority:
+                heapq.heappop(self.queue)  # 已合并或已启动的过期条目
+                continue
+            if not self._can_start(priority):
+                break
+            heapq.heappop(self.queue)
+            if key in self.running:
+                # 同一文件的旧渲染尚未退出
+                deferred.append((priority, seq, key))
+                continue
+            del self.pending[key]
+            self._start(job)
+        for entry in deferred:
+            heapq.heappush(self.queue, entry)
+
+    def _start(self, job):
+        output_dir, layout, preview, profile, max_nodes, formats = job.options
+        parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+        job.signature = _file_signature(job.key)
+        job.process = multiprocessing.Process(
+            target=_render_job,
+            args=(job.key, output_dir, layout, preview or bool(job.preview_callbacks), profile, max_nodes,
+                  formats, NICE_INCREMENTS[self._priority_name(job.priority)], child_conn),
+            daemon=True,
+        )
+        job.process.start()
+        child_conn.close()
+        self.running[job.key] = job
+        task = asyncio.get_running_loop().create_task(self._watch(job, parent_conn, time.monotonic()))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _watch(self, job, conn, started_at):
+        """在线程中等待工作进程的消息，完成后启动下一个任务"""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    kind, payload = await loop.run_in_executor(None, conn.recv)
+                except (EOFError, OSError):
+                    if not job.superseded and not job.future.done():
+                        self.stats['failed'] += 1
+                        job.future.set_exception(
+                            RenderError(f"渲染进程异常退出（退出码 {job.process.exitcode}）"))
+                    break
+                if job.superseded or job.future.done():
+                    continue
+                if kind == 'preview':
+                    for callback in job.preview_callbacks:
+                        callback(payload)
+                elif kind == 'ok':
+                    self.stats['completed'] += 1
+                    payload['wait'] = started_at - job.submitted_at
+                    job.future.set_result(payload)
+                else:
+                    self.stats['failed'] += 1
+                    job.future.set_exception(RenderError(payload))
+        finally:
+            conn.close()
+            await loop.run_in_executor(None, job.process.join)
+            if job.superseded:
+                _remove_rendering_files(job.options[0], job.process.pid)
+            if self.running.get(job.key) is job:
+                del self.running[job.key]
+            self._dispatch()
+
+    @staticmethod
+    def _priority_name(level):
+        return next(name for name, value in PRIORITIES.items() if value == level)
+
+    def status(self):
+        """当前队列状态"""
+        return {
+            'running': {key: self._priority_name(job.priority) for key, job in self.running.items()},
+            'pending': {key: self._priority_name(job.priority) for key, job in self.pending.items()},
+            **self.stats,
+        }
+
+    async def close(self):
+        """取消所有任务并结束工作进程"""
+        for job in list(self.pending.values()):
+            if not job.future.done():
+                job.future.cancel()
+        self.pending.clear()
+        self.queue.clear()
+        for job in list(self.running.values()):
+            job.superseded = True
+            job.process.terminate()
+            if not job.future.done():
+                job.future.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+class BackgroundScheduler:
+    """在后台线程中运行调度器，submit可在任意线程中调用，返回concurrent.futures.Future"""
+
+    def __init__(self, concurrency=None, interactive_reserve=1):
+        self.scheduler = RenderScheduler(concurrency, interactive_reserve)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def submit(self, *args, **kwargs):
+        """参数同 RenderScheduler.submit；预览回调在调度器线程中调用"""
+        return asyncio.run_coroutine_threadsafe(self.scheduler.render(*args, **kwargs), self.loop)
+
+    def status(self):
+        return asyncio.run_coroutine_threadsafe(self._status(), self.loop).result()
+
+    async def _status(self):
+        return self.scheduler.status()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.scheduler.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def _collect_markdown_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.md')))
+        else:
+            files.append(path)
+    return files
+
+
+async def _render_files(files, args):
+    scheduler = RenderScheduler(args.jobs)
+    futures = {scheduler.submit(path, args.output_dir, args.layout, args.priority, max_nodes=args.max_nodes,
+                                formats=args.formats): path
+               for path in files}
+    failed = 0
+    try:
+        for future in asyncio.as_completed(list(futures)):
+            try:
+                result = await future
+            except RenderError as e:
+                failed += 1
+                print(f"渲染失败：{e}", flush=True)
+                continue
+            print(f"已生成 {result['output_path']}（等待 {result['wait']:.2f}s，渲染 {result['elapsed']:.2f}s）",
+                  flush=True)
+    finally:
+        await scheduler.close()
+    return failed
+
+
+def main():
+    if getattr(sys, 'frozen', False):
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        base_dir = os.getcwd()
+
+    parser = argparse.ArgumentParser(description="按优先级批量渲染家谱图")
+    parser.add_argument('paths', nargs='*', default=[os.path.join(base_dir, '家谱数据')],
+                        help="Markdown文件或目录，默认为家谱数据目录")
+    parser.add_argument('--output-dir', default=os.path.join(base_dir, '生成图片'), help="图片输出目录")
+    parser.add_argument('--layout', choices=('classic', 'compact'), default='classic', help="布局方式")
+    parser.add_argument('--priority', choices=tuple(PRIORITIES), default='batch', help="任务优先级")
+    parser.add_argument('--jobs', type=int, default=None, help="同时渲染的最大文件数，默认为CPU核心数")
+    parser.add_argument('--max-nodes', type=int, default=None,
+                        help="每张图最多绘制的节点数，超出的子树折叠为汇总框")
+    parser.add_argument('--formats', default=None,
+                        help="输出格式，逗号分隔：png、png@150、svg、pdf、thumb（布局和绘制只进行一次）")
+    args = parser.parse_args()
+
+    files = _collect_markdown_files(args.paths)
+    if not files:
+        print("没有找到需要渲染的Markdown文件")
+        return
+    os.makedirs(args.output_dir, exist_ok=True)
+    failed = asyncio.run(_render_files(files, args))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地HTTP渲染服务
+只依赖标准库：接收Markdown或JSON格式的家谱数据，放入渲染队列，
+在有限大小的进程池中生成PNG或SVG图片并返回。
+
+接口：
+  POST /render?format=png|svg&layout=classic|compact&title=标题
+      请求体为Markdown（text/markdown 或 text/plain）或JSON（application/json）
+      JSON可以是家谱数据本身（{"name": ..., "children": [...]}），
+      也可以是 {"title": ..., "data": {...}}
+  GET /stats   队列深度、完成数、失败数和延迟统计（JSON）
+  GET /health  健康检查
+
+用法：python render_service.py [--host 127.0.0.1] [--port 8765] [--workers 4]
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from markdown_parser import LINK_ADOPTED_BY, LINK_SPOUSE, PersonIndex, parse_markdown_family_tree
+
+# 支持的输出格式及其Content-Type
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+LAYOUTS = ('classic', 'compact')
+
+
+class PayloadError(ValueError):
+    """请求数据格式不正确"""
+
+
+def parse_payload(body, content_type, title=None):
+    """解析请求体，返回 (家谱数据, 标题)"""
+    try:
+        text = body.decode('utf-8')
+    except UnicodeDecodeError:
+        raise PayloadError("请求数据必须使用UTF-8编码")
+
+    if content_type == 'application/json':
+        try:
+            payload = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise PayloadError(f"JSON格式错误：{e}")
+        except RecursionError:
+            raise PayloadError("JSON数据嵌套层数过多")
+        if not isinstance(payload, dict):
+            raise PayloadError("JSON数据必须是对象")
+        if 'data' in payload:
+            family_data = payload['data']
+            title = title or payload.get('title')
+        else:
+            family_data = payload
+    else:
+        try:
+            result = parse_markdown_family_tree(text)
+        except ValueError as e:
+            raise PayloadError(f"Markdown格式错误：{e}")
+        family_data = result['data']
+        title = title or result.get('title')
+
+    if not isinstance(family_data, dict) or 'name' not in family_data:
+        raise PayloadError("家谱数据为空或格式不正确")
+    check_family_data(family_data)
+    if title is not None and not isinstance(title, str):
+        raise PayloadError("title必须是字符串")
+    return family_data, title or family_data['name']
+
+
+def _is_string_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def check_family_data(family_data):
+    """
+    检查数据结构与 parse_markdown_family_tree 的结果一致：每个人的name是字符串，
+    children是由对象组成的列表，spouses是名字列表，links是 {'type', 'target'} 列表且引用的人唯一存在，
+    根节点的generations是字符串列表
+    """
+    if not _is_string_list(family_data.get('generations', [])):
+        raise PayloadError("generations必须是由字符串组成的列表")
+    linked = []
+    stack = [family_data]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            raise PayloadError("children中的每一项必须是对象")
+        if not isinstance(node.get('name'), str):
+            raise PayloadError("每个人的name必须是字符串")
+        children = node.get('children', [])
+        if not isinstance(children, list):
+            raise PayloadError(f"\"{node['name']}\"的children必须是列表")
+        if not _is_string_list(node.get('spouses', [])):
+            raise PayloadError(f"\"{node['name']}\"的spouses必须是由名字组成的列表")
+        links = node.get('links', [])
+        if not isinstance(links, list) or not all(
+                isinstance(link, dict) and link.get('type') in (LINK_SPOUSE, LINK_ADOPTED_BY)
+                and isinstance(link.get('target'), str) for link in links):
+            raise PayloadError(f"\"{node['name']}\"的links必须是由 {{\"type\": \"{LINK_SPOUSE}\"或"
+                               f"\"{LINK_ADOPTED_BY}\", \"target\": 名字}} 组成的列表")
+        linked.extend((node['name'], link) for link in links)
+        stack.extend(children)
+
+    # 与Markdown解析相同，检查关系引用的人
+    if linked:
+        index = PersonIndex.from_tree(family_data)
+        for name, link in linked:
+            try:
+                index.resolve(link['target'])
+            except ValueError as e:
+                raise PayloadError(f"\"{name}\"的关系引用有误：{e}") from None
+
+
+def _init_worker():
+    """工作进程初始化：使用非交互式后端"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _render_job(family_data, title, image_format, layout):
+    """工作进程：渲染家谱图，返回图片数据"""
+    from main import render_family_tree
+
+    buffer = io.BytesIO()
+    render_family_tree(family_data, buffer, title, layout=layout, image_format=image_format)
+    return buffer.getvalue()
+
+
+class RenderService:
+    """
+    渲染任务队列：有限大小的进程池，相同的请求在渲染完成前只渲染一次
+    工作进程意外退出（内存不足、被结束）时整个进程池不再可用：正在进行的任务失败，
+    换一个新的进程池继续接收请求
+    """
+
+    def __init__(self, workers=None, max_pending=64, latency_samples=1000):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.max_pending = max_pending
+        self.executor = self._new_executor()
+        self.lock = threading.Lock()
+        self.in_flight = {}  # 请求键 -> (Future, 所在的进程池)
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.latencies = deque(maxlen=latency_samples)
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def _replace_executor(self, broken):
+        """换掉已不可用的进程池（调用时持有lock）；其中的任务都已失败，从进行中的请求里去掉"""
+        if self.executor is not broken:
+            return  # 已经换过了
+        self.executor = self._new_executor()
+        self.restarts += 1
+        for key in [key for key, (future, executor) in self.in_flight.items() if executor is broken]:
+            del self.in_flight[key]
+        broken.shutdown(wait=False)
+
+    def submit(self, family_data, title, image_format, layout, key):
+        """
+        提交渲染任务，返回 (Future, 是否与正在进行的相同请求合并)
+        队列已满时返回 (None, False)
+        """
+        with self.lock:
+            entry = self.in_flight.get(key)
+            if entry is not None:
+                self.deduplicated += 1
+                return entry[0], True
+            if len(self.in_flight) >= self.max_pending:
+                self.rejected += 1
+                return None, False
+
+            submitted_at = time.perf_counter()
+            try:
+                future = self.executor.submit(_render_job, family_data, title, image_format, layout)
+            except BrokenProcessPool:
+                # 进程池在上一个任务结束后才坏掉，还没有回调发现，换新的再提交
+                self._replace_executor(self.executor)
+                future = self.executor.submit(_render_job, family_data, title, image_format, layout)
+            executor = self.executor
+            self.in_flight[key] = (future, executor)
+            self.submitted += 1
+
+        def done(f):
+            with self.lock:
+                if self.in_flight.get(key, (None,))[0] is f:
+                    del self.in_flight[key]
+                if isinstance(f.exception(), BrokenProcessPool):
+                    self.failed += 1
+                    self._replace_executor(executor)
+                elif f.exception() is None:
+                    self.completed += 1
+                    self.latencies.append(time.perf_counter() - submitted_at)
+                else:
+                    self.failed += 1
+
+        future.add_done_callback(done)
+        return future, False
+
+    def stats(self):
+        with self.lock:
+            pending = len(self.in_flight)
+            latencies = sorted(self.latencies)
+            result = {
+                'workers': self.workers,
+                'in_flight': pending,
+                'running': min(pending, self.workers),
+                'queue_depth': max(0, pending - self.workers),
+                'submitted': self.submitted,
+                'deduplicated': self.deduplicated,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'restarts': self.restarts,
+            }
+        if latencies:
+            def percentile(p):
+                return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 4)
+            result['latency_s'] = {
+                'count': len(latencies),
+                'mean': round(sum(latencies) / len(latencies), 4),
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': round(latencies[-1], 4),
+            }
+        return result
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    server_version = "FamilyTreeRender/1.0"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, data):
+        self._send(status, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/stats':
+            self._send_json(200, self.service.stats())
+        elif path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': '未知的地址'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/render':
+            self._send_json(404, {'error': '未知的地址'})
+            return
+
+        query = parse_qs(url.query)
+        image_format = query.get('format', ['png'])[0].lower()
+        layout = query.get('layout', ['classic'])[0]
+        title = query.get('title', [None])[0]
+        if image_format not in CONTENT_TYPES:
+            self._send_json(400, {'error': f"不支持的格式：{image_format}"})
+            return
+        if layout not in LAYOUTS:
+            self._send_json(400, {'error': f"不支持的布局方式：{layout}"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self._send_json(400, {'error': 'Content-Length不正确'})
+            return
+        body = self.rfile.read(length)
+        content_type = (self.headers.get('Content-Type') or 'text/markdown').split(';')[0].strip()
+        try:
+            family_data, title = parse_payload(body, content_type, title)
+        except PayloadError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+
+        # 请求内容和参数完全相同的任务合并为一个
+        key = hashlib.sha256(
+            b'\0'.join([body, content_type.encode(), image_format.encode(),
+                        layout.encode(), title.encode('utf-8')])
+        ).hexdigest()
+        future, deduplicated = self.service.submit(family_data, title, image_format, layout, key)
+        if future is None:
+            self._send_json(503, {'error': '渲染队列已满，请稍后重试'})
+            return
+
+        try:
+            image = future.result()
+        except BrokenProcessPool:
+            self._send_json(503, {'error': '渲染进程意外退出，请稍后重试'})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': f"渲染失败：{e}"})
+            return
+        self._send(200, image, CONTENT_TYPES[image_format],
+                   {'X-Render-Deduplicated': '1' if deduplicated else '0'})
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def create_server(host='127.0.0.1', port=8765, workers=None, max_pending=64, quiet=False):
+    """创建渲染服务（port为0时自动选择空闲端口，可通过 server.server_address 获取）"""
+    server = ThreadingHTTPServer((host, port), RenderRequestHandler)
+    server.daemon_threads = True
+    server.service = RenderService(workers, max_pending)
+    server.quiet = quiet
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地家谱图渲染服务")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址")
+    parser.add_argument('--port', type=int, default=8765, help="监听端口")
+    parser.add_argument('--workers', type=int, default=None, help="渲染进程数，默认为CPU核心数")
+    parser.add_argument('--max-pending', type=int, default=64, help="排队和进行中的任务数上限")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.workers, args.max_pending)
+    host, port = server.server_address[:2]
+    print(f"家谱渲染服务已启动：http://{host}:{port}（按 Ctrl+C 退出）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动时间测试
+在全新的Python进程中多次启动图形界面，测量导入耗时和窗口显示耗时，
+并检查启动时没有导入matplotlib、numpy等耗时的模块（它们应在首次生成时才导入）。
+没有图形显示环境时只测量导入耗时（Linux上可用 xvfb-run 运行）。
+
+用法：python startup_benchmark.py [--runs 5] [--budget 2.0]
+超过时间预算或启动时导入了耗时模块时返回非零退出码，可在CI中运行。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# 启动时不应导入的模块
+HEAVY_MODULES = ('matplotlib', 'numpy', 'PIL', 'main')
+
+_CHILD = r'''
+import json, sys, time
+start = time.perf_counter()
+import family_tree_gui
+result = {'import_s': time.perf_counter() - start}
+if sys.argv[1] == '1':
+    import tkinter as tk
+    root = tk.Tk()
+    app = family_tree_gui.FamilyTreeGUI(root)
+    root.update()
+    result['window_s'] = time.perf_counter() - start
+    root.destroy()
+result['heavy_modules'] = [name for name in %r if name in sys.modules]
+print(json.dumps(result))
+''' % (HEAVY_MODULES,)
+
+
+def has_display():
+    """是否可以创建窗口"""
+    if sys.platform.startswith('linux'):
+        return bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+    return True
+
+
+def measure_once(repo_dir, window):
+    """启动一次，返回测量结果（秒）"""
+    env = dict(os.environ, PYTHONPATH=repo_dir, PYTHONDONTWRITEBYTECODE='')
+    # 在临时目录中运行，界面初始化时创建的数据目录不会写入仓库
+    with tempfile.TemporaryDirectory() as work_dir:
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', _CHILD, '1' if window else '0'],
+                                cwd=work_dir, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        total = time.perf_counter() - start
+    result = json.loads(output.strip().splitlines()[-1])
+    result['total_s'] = total
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量图形界面的启动时间")
+    parser.add_argument('--runs', type=int, default=5, help="启动次数")
+    parser.add_argument('--budget', type=float, default=None,
+                        help="启动耗时中位数上限（秒），超过时返回非零退出码")
+    parser.add_argument('--no-window', action='store_true', help="只测量导入耗时，不创建窗口")
+    args = parser.parse_args()
+
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    window = not args.no_window and has_display()
+    if not window:
+        print("没有图形显示环境，只测量导入耗时")
+
+    measure_once(repo_dir, window)  # 预热：生成字节码缓存，排除首次编译的影响
+    results = [measure_once(repo_dir, window) for _ in range(args.runs)]
+
+    failed = False
+    keys = ['import_s', 'window_s', 'total_s'] if window else ['import_s', 'total_s']
+    labels = {'import_s': '导入界面模块', 'window_s': '窗口显示', 'total_s': '进程启动到退出'}
+    for key in keys:
+        values = [r[key] for r in results]
+        print(f"{labels[key]}：中位数 {statistics.median(values):.3f}s，"
+              f"最小 {min(values):.3f}s，最大 {max(values):.3f}s")
+
+    heavy = sorted({name for r in results for name in r['heavy_modules']})
+    if heavy:
+        print(f"✗ 启动时导入了耗时模块：{', '.join(heavy)}")
+        failed = True
+
+    if args.budget is not None:
+        key = 'window_s' if window else 'import_s'
+        median = statistics.median(r[key] for r in results)
+        if median > args.budget:
+            print(f"✗ 启动耗时 {median:.3f}s 超过预算 {args.budget:.3f}s")
+            failed = True
+        else:
+            print(f"✓ 启动耗时在预算 {args.budget:.3f}s 以内")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文字排版缓存
+每个不同的字符串（按字体、字号和排列方向）只排版一次，得到的文字轮廓路径
+在各个节点位置重复使用。纵向名字按单个字符缓存，同一字辈的字只排版一次。
+所有节点文字合并到一个PathCollection中绘制，代替成千上万个独立的Text对象；
+矢量格式（SVG/PDF）输出时相同的路径也只定义一次。
+"""
+
+from functools import lru_cache
+
+import matplotlib.pyplot as plt
+import matplotlib.transforms as mtransforms
+from matplotlib.collections import PathCollection
+from matplotlib.font_manager import FontProperties, findfont, get_font
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath
+
+# 文字路径以磅（point）为单位，绘制时按图形dpi换算为像素
+_POINTS_TO_INCHES = 1 / 72
+
+# 缓存的文字路径条数上限：足够容纳一张大家谱中所有不同的名字和单字，
+# 长时间运行的进程（图形界面、渲染服务）依次渲染许多家谱时内存不会无限增长
+LABEL_CACHE_SIZE = 32768
+# 字体和行高只按字体设置和字号缓存，条目很少
+FONT_CACHE_SIZE = 64
+
+
+def _font_key():
+    """当前字体设置，作为缓存键的一部分"""
+    return (tuple(plt.rcParams['font.family']), tuple(plt.rcParams['font.sans-serif']))
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _font_properties(font_key, fontsize):
+    families, sans_serif = font_key
+    if 'sans-serif' in families:
+        families = list(sans_serif) + [f for f in families if f != 'sans-serif']
+    return FontProperties(family=list(families), size=fontsize)
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _line_height(font_key, fontsize):
+    """字体的标准行高（上行高度+下行高度，单位：磅）"""
+    font = get_font(findfont(_font_properties(font_key, fontsize)))
+    return (font.ascender - font.descender) / font.units_per_EM * fontsize
+
+
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def _centered_line(text, fontsize, font_key):
+    """排版单行文字，返回字形外框中心位于原点的路径"""
+    path = TextPath((0, 0), text, size=fontsize, prop=_font_properties(font_key, fontsize))
+    if not len(path.vertices):
+        return path
+    extents = path.get_extents()
+    center_x = (extents.x0 + extents.x1) / 2
+    center_y = (extents.y0 + extents.y1) / 2
+    return path.transformed(mtransforms.Affine2D().translate(-center_x, -center_y))
+
+
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def get_label_path(text, fontsize, vertical, linespacing, font_key):
+    """
+    获取居中排列的文字路径（单位：磅）
+    vertical为True时每个字符占一行（纵向排列），与matplotlib多行文字一致，
+    每行高度为 行距系数 × 字体行高，字形在行内居中
+    """
+    if not vertical:
+        return _centered_line(text, fontsize, font_key)
+
+    pitch = linespacing * _line_height(font_key, fontsize)
+    first_y = (len(text) - 1) * pitch / 2
+    placed = [
+        _centered_line(char, fontsize, font_key).transformed(
+            mtransforms.Affine2D().translate(0, first_y - i * pitch))
+        for i, char in enumerate(text)
+    ]
+    return Path.make_compound_path(*placed)
+
+
+def draw_cached_texts(ax, labels, fontsize=10, linespacing=1.2, color='black', zorder=3):
+    """
+    用缓存的文字路径绘制一组居中文字
+
+    labels: [(x, y, 文字, 是否纵向), ...]，坐标为数据坐标
+    返回添加到坐标轴上的PathCollection
+    """
+    font_key = _font_key()
+    paths = []
+    offsets = []
+    for x, y, text, vertical in labels:
+        if not text:
+            continue
+        paths.append(get_label_path(text, fontsize, vertical, linespacing, font_key))
+        offsets.append((x, y))
+
+    collection = PathCollection(
+        paths,
+        offsets=offsets,
+        offset_transform=ax.transData,
+        transform=mtransforms.Affine2D().scale(_POINTS_TO_INCHES) + ax.figure.dpi_scale_trans,
+        facecolors=color,
+        edgecolors='none',
+        linewidths=0,
+        zorder=zorder,
+    )
+    collection.set_clip_on(False)
+    ax.add_collection(collection, autolim=False)
+    return collection
+
+
+def clear_cache():
+    """清空排版缓存（注册新字体文件后调用）"""
+    _font_properties.cache_clear()
+    _line_height.cache_clear()
+    _centered_line.cache_clear()
+    get_label_path.cache_clear()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑布局算法
+基于Walker算法及Buchheim的线性时间改进（Reingold-Tilford整洁树布局），
+按子树的实际轮廓紧密排列，而不是给每个叶子节点分配固定宽度的位置。
+
+只依赖节点的 children / width / x 属性，因此可以直接作用于 main.Node。
+"""
+
+
+class _TidyNode:
+    """布局过程中使用的辅助节点"""
+
+    __slots__ = ('node', 'parent', 'children', 'number', 'width',
+                 'x', 'mod', 'thread', 'ancestor', 'change', 'shift')
+
+    def __init__(self, node, parent=None, number=1):
+        self.node = node
+        self.parent = parent
+        self.number = number  # 在兄弟节点中的序号（从1开始）
+        self.width = node.width
+        self.x = 0.0
+        self.mod = 0.0
+        self.thread = None
+        self.ancestor = self
+        self.change = 0.0
+        self.shift = 0.0
+        self.children = []
+
+    def left(self):
+        """左轮廓上的下一个节点"""
+        if self.thread is not None:
+            return self.thread
+        return self.children[0] if self.children else None
+
+    def right(self):
+        """右轮廓上的下一个节点"""
+        if self.thread is not None:
+            return self.thread
+        return self.children[-1] if self.children else None
+
+    def left_brother(self):
+        if self.parent is None or self.number == 1:
+            return None
+        return self.parent.children[self.number - 2]
+
+    def leftmost_sibling(self):
+        if self.parent is None or self.number == 1:
+            return None
+        return self.parent.children[0]
+
+
+def _build(root):
+    """构建辅助树"""
+    tidy_root = _TidyNode(root)
+    stack = [tidy_root]
+    while stack:
+        current = stack.pop()
+        for i, child in enumerate(current.node.children):
+            tidy_child = _TidyNode(child, current, i + 1)
+            current.children.append(tidy_child)
+            stack.append(tidy_child)
+    return tidy_root
+
+
+class _TidyLayout:
+    def __init__(self, sibling_gap, subtree_gap):
+        self.sibling_gap = sibling_gap
+        self.subtree_gap = subtree_gap
+
+    def separation(self, left, right, siblings):
+        """同一层相邻两个节点中心之间的最小距离"""
+        gap = self.sibling_gap if siblings else self.subtree_gap
+        return (left.width + right.width) / 2 + gap
+
+    def first_walk(self, v):
+        if not v.children:
+            w = v.left_brother()
+            v.x = w.x + self.separation(w, v, True) if w is not None else 0.0
+            return
+
+        default_ancestor = v.children[0]
+        for w in v.children:
+            self.first_walk(w)
+            default_ancestor = self.apportion(w, default_ancestor)
+        self.execute_shifts(v)
+
+        midpoint = (v.children[0].x + v.children[-1].x) / 2
+        w = v.left_brother()
+        if w is not None:
+            v.x = w.x + self.separation(w, v, True)
+            v.mod = v.x - midpoint
+        else:
+            v.x = midpoint
+
+    def apportion(self, v, default_ancestor):
+        w = v.left_brother()
+        if w is None:
+            return default_ancestor
+
+        # i: inner, o: outer, r: right, l: left
+        vir = vor = v
+        vil = w
+        vol = v.leftmost_sibling()
+        sir = sor = v.mod
+        sil = vil.mod
+        sol = vol.mod
+        while vil.right() is not None and vir.left() is not None:
+            vil = vil.right()
+            vir = vir.left()
+            vol = vol.left()
+            vor = vor.right()
+            vor.ancestor = v
+            shift = (vil.x + sil) - (vir.x + sir) + self.separation(vil, vir, False)
+            if shift > 0:
+                self.move_subtree(self.ancestor(vil, v, default_ancestor), v, shift)
+                sir += shift
+                sor += shift
+            sil += vil.mod
+            sir += vir.mod
+            sol += vol.mod
+            sor += vor.mod
+
+        if vil.right() is not None and vor.right() is None:
+            vor.thread = vil.right()
+            vor.mod += sil - sor
+        else:
+            if vir.left() is not None and vol.left() is None:
+                vol.thread = vir.left()
+                vol.mod += sir - sol
+            default_ancestor = v
+        return default_ancestor
+
+    @staticmethod
+    def move_subtree(wl, wr, shift):
+        subtrees = wr.number - wl.number
+        wr.change -= shift / subtrees
+        wr.shift += shift
+        wl.change += shift / subtrees
+        wr.x += shift
+        wr.mod += shift
+
+    @staticmethod
+    def execute_shifts(v):
+        shift = 0.0
+        change = 0.0
+        for w in reversed(v.children):
+            w.x += shift
+            w.mod += shift
+            change += w.change
+            shift += w.shift + change
+
+    @staticmethod
+    def ancestor(vil, v, default_ancestor):
+        if vil.ancestor.parent is v.parent:
+            return vil.ancestor
+        return default_ancestor
+
+    @staticmethod
+    def second_walk(root):
+        """累加修正量得到最终x坐标，返回最左侧节点的左边缘"""
+        min_left = None
+        stack = [(root, 0.0)]
+        while stack:
+            v, m = stack.pop()
+            v.node.x = v.x + m
+            left = v.node.x - v.width / 2
+            if min_left is None or left < min_left:
+                min_left = left
+            for w in v.children:
+                stack.append((w, m + v.mod))
+        return min_left
+
+
+def calculate_tidy_positions(root, sibling_gap, subtree_gap):
+    """
+    按整洁树算法计算所有节点的x坐标（O(n)）
+
+    sibling_gap: 同一父节点下相邻兄弟节点之间的空隙
+    subtree_gap: 不同父节点的相邻节点之间的空隙
+    布局结果平移到最左侧节点的左边缘位于x=0处。
+    """
+    tidy_root = _build(root)
+    layout = _TidyLayout(sibling_gap, subtree_gap)
+    layout.first_walk(tidy_root)
+    min_left = layout.second_walk(tidy_root)
+
+    # 平移使最左侧边缘位于0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        node.x -= min_left
+        stack.extend(node.children)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+家谱浏览器（图形界面组件）
+用ttk.Treeview逐层浏览家谱：只有展开某人时才插入他的子女，界面中的条目数只取决于
+已展开的部分，与家谱总人数无关，十万人的家谱也能立即打开。
+子女很多时每次只插入一批，末尾的"还有N人"条目点击后再插入下一批，展开大分支时界面不会卡住。
+每个人显示代数、字辈和本支人数（含本人及全部后代，打开家谱时统计一次）；
+有人物属性时显示生卒年和备注，只在插入条目时从属性附表中读取（见 markdown_parser.PersonAttributes）。
+连接结构编辑器（tree_editor.TreeDocument）后，每次修改只更新受影响的条目和祖先的人数，
+不重新载入整个家谱。
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+from level_of_detail import subtree_stats
+from markdown_parser import ATTRIBUTE_BIRTH, ATTRIBUTE_DEATH, ATTRIBUTE_NOTE
+
+# 每次插入的子女数
+CHILD_BATCH = 200
+
+_PLACEHOLDER = 'placeholder'
+_MORE = 'more'
+
+
+class TreeBrowser:
+    """懒加载的家谱浏览器，parent为放置浏览器的容器"""
+
+    def __init__(self, parent, height=10):
+        self.frame = ttk.Frame(parent)
+        self.frame.columnconfigure(0, weight=1)
+        self.frame.rowconfigure(0, weight=1)
+
+        self.tree = ttk.Treeview(self.frame, columns=('generation', 'count', 'years', 'note'), height=height)
+        self.tree.heading('#0', text="姓名", anchor=tk.W)
+        self.tree.heading('generation', text="代数")
+        self.tree.heading('count', text="本支人数")
+        self.tree.heading('years', text="生卒")
+        self.tree.heading('note', text="备注", anchor=tk.W)
+        self.tree.column('#0', width=220, stretch=True)
+        self.tree.column('generation', width=100, anchor=tk.CENTER, stretch=False)
+        self.tree.column('count', width=80, anchor=tk.E, stretch=False)
+        self.tree.column('years', width=100, anchor=tk.CENTER, stretch=False)
+        self.tree.column('note', width=160, stretch=True)
+        self.tree.tag_configure(_MORE, foreground='#2980b9')
+        self.tree.grid(row=0, column=0, sticky=(tk.N, tk.S, tk.W, tk.E))
+
+        scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.tree.yview)
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+        self.tree.bind('<<TreeviewOpen>>', self._on_open)
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+
+        self.nodes = {}  # 条目 -> (节点数据, 代数, 节点编号)
+        self.items = {}  # id(节点数据) -> 条目
+        self.more = {}   # "还有N人"条目 -> (父条目, 下一批的起始位置)
+        self.sizes = {}
+        self.generations = []
+        self.attributes = None
+        self.document = None
+        self._reopen = set()  # 刷新子女时需要重新展开的节点
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def clear(self):
+        self.tree.delete(*self.tree.get_children())
+        self.nodes.clear()
+        self.items.clear()
+        self.more.clear()
+        self.sizes = {}
+        self.document = None
+
+    def load(self, family_data, attributes=None):
+        """
+        显示一个家谱（parse_markdown_family_tree 结果中的 data 和 attributes），
+        只插入始祖和第二代
+        """
+        self.clear()
+        if not family_data:
+            return
+        self.sizes, _ = subtree_stats(family_data)
+        self.generations = list(family_data.get('generations', []))
+        self.attributes = attributes
+        root_item = self._insert('', family_data, 0, 0)
+        self._expand(root_item)
+        self.tree.item(root_item, open=True)
+
+    def attach(self, document):
+        """显示一个可编辑的家谱（tree_editor.TreeDocument），随修改逐项更新"""
+        self.load(document.data, document.attributes)
+        self.document = document
+        document.listeners.append(self._on_document_change)
+
+    def selected_node(self):
+        """当前选中的人的节点数据，没有选中时返回None"""
+        item = self.tree.focus()
+        return self.nodes[item][0] if item in self.nodes else None
+
+    def select_node(self, node):
+        item = self.items.get(id(node))
+        if item is not None:
+            self.tree.see(item)
+            self.tree.selection_set(item)
+            self.tree.focus(item)
+
+    def _generation_text(self, depth):
+        text = f"第{depth + 1}代"
+        if depth < len(self.generations) and self.generations[depth]:
+            text += f" {self.generations[depth]}"
+        return text
+
+    def _attribute_values(self, data, node_id):
+        """(生卒, 备注)"""
+        if self.document is not None:
+            # 编辑后先序编号会变化，直接从所在行读取
+            attributes = self.document.node_attributes(data)
+        elif self.attributes is None or node_id not in self.attributes:
+            return '', ''
+        else:
+            attributes = self.attributes.get(node_id)
+        birth, death = attributes.get(ATTRIBUTE_BIRTH, ''), attributes.get(ATTRIBUTE_DEATH, '')
+        years = f"{birth}—{death}" if birth or death else ''
+        return years, attributes.get(ATTRIBUTE_NOTE, '')
+
+    def _insert(self, parent_item, data, depth, node_id):
+        item = self.tree.insert(parent_item, tk.END, text=data.get('name', ''),
+                                values=(self._generation_text(depth), self.sizes.get(id(data), 1),
+                                        *self._attribute_values(data, node_id)))
+        self.nodes[item] = (data, depth, node_id)
+        self.items[id(data)] = item
+        if data.get('children'):
+            # 占位条目使这一项显示展开按钮，展开时换成真正的子女
+            self.tree.insert(item, tk.END, text="加载中……", tags=(_PLACEHOLDER,))
+            if id(data) in self._reopen:
+                self._expand(item)
+                self.tree.item(item, open=True)
+        return item
+
+    def _expand(self, item):
+        """首次展开时插入第一批子女"""
+        children = self.tree.get_children(item)
+        if len(children) != 1 or _PLACEHOLDER not in self.tree.item(children[0], 'tags'):
+            return
+        self.tree.delete(children[0])
+        self._insert_children(item, 0)
+
+    def _insert_children(self, item, offset):
+        data, depth, node_id = self.nodes[item]
+        children = data.get('children', [])
+        # 先序遍历编号：子女的编号为父节点编号加1，再加上前面各兄弟的子树人数
+        child_id = node_id + 1 + sum(self.sizes[id(child)] for child in children[:offset])
+        for child in children[offset:offset + CHILD_BATCH]:
+            self._insert(item, child, depth + 1, child_id)
+            child_id += self.sizes[id(child)]
+        remaining = len(children) - offset - CHILD_BATCH
+        if remaining > 0:
+            more_item = self.tree.insert(item, tk.END, text=f"……还有 {remaining} 人，点击显示更多",
+                                         tags=(_MORE,))
+            self.more[more_item] = (item, offset + CHILD_BATCH)
+
+    def _on_open(self, event):
+        item = self.tree.focus()
+        if item in self.nodes:
+            self._expand(item)
+
+    def _on_select(self, event):
+        for item in self.tree.selection():
+            if item in self.more:
+                parent_item, offset = self.more.pop(item)
+                self.tree.delete(item)
+                self._insert_children(parent_item, offset)
+
+    # ---------- 随编辑更新 ----------
+
+    def _on_document_change(self, event, node, **details):
+        if event == 'rename':
+            item = self.items.get(id(node))
+            if item is not None:
+                self.tree.item(item, text=node['name'])
+        elif event == 'add':
+            self.sizes[id(node)] = 1
+            self._add_to_ancestors(details['parent'], 1)
+            self._refresh(details['parent'])
+        elif event == 'delete':
+            self._add_to_ancestors(details['parent'], -details['count'])
+            self._refresh(details['parent'])
+        elif event == 'move':
+            size = self.sizes[id(node)]
+            self._add_to_ancestors(details['old_parent'], -size)
+            self._add_to_ancestors(details['parent'], size)
+            self._refresh(details['old_parent'])
+            self._refresh(details['parent'])
+
+    def _add_to_ancestors(self, node, delta):
+        """本人及祖先的本支人数加delta"""
+        while node is not None:
+            self.sizes[id(node)] += delta
+            item = self.items.get(id(node))
+            if item is not None:
+                self.tree.set(item, 'count', self.sizes[id(node)])
+            node = self.document.parent(node)
+
+    def _forget(self, items):
+        """从映射中去掉这些条目及其下的全部条目"""
+        stack = list(items)
+        while stack:
+            item = stack.pop()
+            self.more.pop(item, None)
+            entry = self.nodes.pop(item, None)
+            if entry is not None and self.items.get(id(entry[0])) == item:
+                del self.items[id(entry[0])]
+            stack.extend(self.tree.get_children(item))
+
+    def _refresh(self, node):
+        """重新插入一个人已显示的子女，原来展开的后代保持展开"""
+        item = self.items.get(id(node))
+        if item is None:
+            return
+        children = self.tree.get_children(item)
+        opened = self.tree.item(item, 'open')
+        reopen = set()
+        stack = list(children)
+        while stack:
+            child = stack.pop()
+            if child in self.nodes and self.tree.item(child, 'open'):
+                reopen.add(id(self.nodes[child][0]))
+                stack.extend(self.tree.get_children(child))
+        self._forget(children)
+        self.tree.delete(*children)
+        if not node.get('children'):
+            self.tree.item(item, open=False)
+            return
+        self._reopen = reopen
+        try:
+            if opened:
+                self._insert_children(item, 0)
+            else:
+                self.tree.insert(item, tk.END, text="加载中……", tags=(_PLACEHOLDER,))
+        finally:
+            self._reopen = set()
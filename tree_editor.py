@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+家谱结构编辑
+在内存中的家谱上直接添加、改名、移动和删除人物，不必每次修改后重新解析整个文件，
+也不会因为缩进写错而意外改变家谱结构。
+
+文件的每一行保存在双向链表中，每个人记住自己所在的行，并记录每行在文件中的字节位置：
+- 改名只修改一行；添加在父节点的子树末尾（或指定的兄弟之前）插入一行；
+  删除和移动把整棵子树所在的连续行从链表中摘下（移动时按新的代数调整缩进）
+- 保存时只写回修改过的部分：所有修改都是字节数不变的改名时，只在原位置覆盖这些行；
+  否则从第一处修改的位置开始写到文件末尾，之前的内容不动
+
+编辑时的耗时与家谱大小无关（移动时调整缩进与子树人数成正比）。
+每次修改通知 listeners 中的回调，结构浏览器等据此只更新受影响的部分。
+家谱中有关系引用（[配:@名字]、[出继:@名字]）时，每次修改前先检查修改后引用是否仍能找到唯一的人，
+会使引用失效的修改被拒绝（这项检查与家谱人数成正比，没有引用的家谱不做）。
+"""
+
+import os
+
+from markdown_parser import PersonIndex, decode_attributes, find_attributes, parse_markdown_family_tree
+
+# 每次写入文件的块大小（字节）
+WRITE_CHUNK_BYTES = 1 << 20
+
+# 引用失效时最多列出的行数
+MAX_REPORTED_LINKS = 10
+
+# 名字中不能出现的字符（换行，以及关系标注和属性的括号）
+_FORBIDDEN_CHARACTERS = set('\r\n[]【】{}')
+
+
+class _Line:
+    """文件中的一行；offset/size为上次保存时在文件中的字节位置和长度，新增或移动过的行为None"""
+
+    __slots__ = ('text', 'ending', 'prev', 'next', 'offset', 'size', 'node')
+
+    def __init__(self, text, ending, offset=None, size=None, node=None):
+        self.text = text
+        self.ending = ending
+        self.prev = None
+        self.next = None
+        self.offset = offset
+        self.size = size
+        self.node = node
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def check_name(name):
+    """检查并返回去掉首尾空白的名字，不合法时抛出ValueError"""
+    name = (name or '').strip()
+    if not name:
+        raise ValueError("名字不能为空")
+    if name.startswith('#') or _FORBIDDEN_CHARACTERS & set(name):
+        raise ValueError("名字不能以#开头，也不能包含换行和方括号、花括号")
+    return name
+
+
+class TreeDocument:
+    """
+    可编辑的Markdown家谱文件
+    title/data/attributes与 parse_markdown_family_tree 的结果相同，
+    编辑方法的参数都是 data 中的节点数据（字典）
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            text = f.read().decode('utf-8')
+        self.signature = _file_signature(path)
+
+        # 建立行链表，记录每行的字节位置
+        lines = []
+        offset = 0
+        pieces = text.split('\n')
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            if last and not piece:
+                break  # 文件以换行结尾
+            ending = '' if last else ('\r\n' if piece.endswith('\r') else '\n')
+            if ending == '\r\n':
+                piece = piece[:-1]
+            size = len((piece + ending).encode('utf-8'))
+            lines.append(_Line(piece, ending, offset, size))
+            offset += size
+        for previous, line in zip(lines, lines[1:]):
+            previous.next = line
+            line.prev = previous
+        self.head = lines[0] if lines else None
+        self.tail = lines[-1] if lines else None
+        self.newline = '\r\n' if lines and lines[0].ending == '\r\n' else '\n'
+
+        node_lines = []
+        result = parse_markdown_family_tree(text, node_lines)
+        self.title = result['title']
+        self.data = result['data']
+        self.attributes = result['attributes']
+
+        self.dirty = {}  # 修改过的行 -> 从文件中哪个字节位置开始需要重写（行为None表示文件末尾）
+        self.in_place = True  # 目前的修改是否都是字节数不变的改名
+        self.listeners = []
+
+        # 节点 -> 所在的行、父节点
+        self._lines = {}
+        self._parents = {}
+        nodes = []
+        stack = [(self.data, None, 0)] if self.data else []
+        while stack:
+            node, parent, depth = stack.pop()
+            nodes.append((node, depth))
+            self._parents[id(node)] = parent
+            stack.extend((child, node, depth + 1) for child in reversed(node.get('children', [])))
+
+        # 缩进与代数不符的行（如多缩进了一级）改为标准缩进，否则在它前面插入的行会改变它的父节点
+        # 编辑不会新增关系标注（名字中不能有方括号），只需在打开时检查一次
+        self.has_links = any(node.get('links') for node, _ in nodes)
+
+        self.fixed_indents = 0
+        for (node, depth), line_index in zip(nodes, node_lines):
+            line = lines[line_index]
+            line.node = node
+            self._lines[id(node)] = line
+            indent = len(line.text) - len(line.text.lstrip(' '))
+            if indent // 2 != depth:
+                line.text = '  ' * depth + line.text[indent:]
+                self.in_place = False
+                self._mark(line)
+                self.fixed_indents += 1
+
+    # ---------- 查询 ----------
+
+    def parent(self, node):
+        return self._parents[id(node)]
+
+    def depth(self, node):
+        depth = 0
+        node = self._parents[id(node)]
+        while node is not None:
+            depth += 1
+            node = self._parents[id(node)]
+        return depth
+
+    def is_ancestor(self, ancestor, node):
+        """ancestor是否为node本人或其祖先"""
+        while node is not None:
+            if node is ancestor:
+                return True
+            node = self._parents[id(node)]
+        return False
+
+    def line_text(self, node):
+        return self._lines[id(node)].text
+
+    def node_attributes(self, node):
+        """从所在行读取人物属性（编辑后编号会变化，因此不使用 attributes 附表）"""
+        text = self._lines[id(node)].text
+        span = find_attributes(text)
+        return decode_attributes(text[span[0]:span[1]]) if span is not None else {}
+
+    @property
+    def modified(self):
+        return bool(self.dirty)
+
+    # ---------- 行链表 ----------
+
+    def _start(self, line):
+        """行在上次保存的文件中的起始字节位置；新增的行取前面最近一个已保存的行的末尾"""
+        while line is not None and line.offset is None:
+            line = line.prev
+            if line is not None and line.offset is not None:
+                return line.offset + line.size
+        return line.offset if line is not None else 0
+
+    def _mark(self, line, start=None):
+        if start is None:
+            start = self._start(line)
+        self.dirty[line] = min(start, self.dirty.get(line, start))
+
+    def _last_line(self, node):
+        """子树的最后一行（最后一个后代所在的行）"""
+        while node.get('children'):
+            node = node['children'][-1]
+        return self._lines[id(node)]
+
+    def _unlink(self, first, last):
+        """把从first到last的连续行从链表中摘下，返回这些行"""
+        start = self._start(first)
+        run = []
+        line = first
+        while True:
+            run.append(line)
+            if line in self.dirty:
+                start = min(start, self.dirty.pop(line))
+            if line is last:
+                break
+            line = line.next
+        after = last.next
+        if first.prev is not None:
+            first.prev.next = after
+        else:
+            self.head = after
+        if after is not None:
+            after.prev = first.prev
+        else:
+            self.tail = first.prev
+        first.prev = last.next = None
+        # 后面的内容前移，从被删除的位置开始重写
+        self._mark(after, start)
+        self.in_place = False
+        return run
+
+    def _link_after(self, anchor, first, last):
+        """把从first到last的连续行插入到anchor之后（anchor为None时插入到文件开头）"""
+        start = self._end(anchor)
+        if anchor is not None and not anchor.ending:
+            anchor.ending = self.newline  # 原来的最后一行没有换行符
+            self._mark(anchor)
+        after = anchor.next if anchor is not None else self.head
+        first.prev = anchor
+        last.next = after
+        if anchor is not None:
+            anchor.next = first
+        else:
+            self.head = first
+        if after is not None:
+            after.prev = last
+        else:
+            self.tail = last
+        if not last.ending:
+            last.ending = self.newline  # 移动的子树原来在文件末尾
+        self._mark(first, start)
+        self.in_place = False
+
+    def _end(self, line):
+        """行在上次保存的文件中的结束位置"""
+        if line is None:
+            return 0
+        if line.offset is not None:
+            return line.offset + line.size
+        return self._start(line)
+
+    def _check_links(self, rename=None, remove=None, add=None, move=None):
+        """
+        模拟一次修改，检查修改后全部关系引用是否仍能找到唯一的人，
+        否则抛出ValueError并列出引用所在的行
+        rename=(节点, 新名字)，remove=删除的节点，add=(父节点, 名字)，move=(节点, 新的父节点)
+        """
+        if not self.has_links:
+            return
+        moved, new_parent = move or (None, None)
+        nodes, parents, sources = [], [], []
+        stack = [(self.data, -1)]
+        while stack:
+            node, parent = stack.pop()
+            index = len(nodes)
+            nodes.append({'name': rename[1]} if rename is not None and node is rename[0] else node)
+            parents.append(parent)
+            if node.get('links'):
+                sources.append(node)
+            children = [child for child in node.get('children', []) if child is not remove and child is not moved]
+            if node is new_parent:
+                children.append(moved)
+            if add is not None and node is add[0]:
+                children.append({'name': add[1]})
+            stack.extend((child, index) for child in children)
+
+        index = PersonIndex(nodes, parents)
+        problems = []
+        for node in sources:
+            for link in node['links']:
+                try:
+                    index.resolve(link['target'])
+                except ValueError as e:
+                    problems.append(f"第{self.line_number(node)}行（{node['name']}）：{e}")
+        if problems:
+            if len(problems) > MAX_REPORTED_LINKS:
+                problems[MAX_REPORTED_LINKS:] = [f"……共{len(problems)}处"]
+            raise ValueError("这样修改后以下关系引用将失效，请先修改这些行的关系标注：\n" + '\n'.join(problems))
+
+    def _notify(self, event, node, **details):
+        for listener in list(self.listeners):
+            listener(event, node, **details)
+
+    # ---------- 编辑 ----------
+
+    def rename(self, node, name):
+        """改名，只修改所在的一行；保留关系标注和属性"""
+        name = check_name(name)
+        old_name = node['name']
+        if name != old_name:
+            self._check_links(rename=(node, name))
+        line = self._lines[id(node)]
+        dash = line.text.find('-')
+        position = line.text.find(old_name, dash + 1)
+        if position < 0:
+            raise ValueError(f"在第{self.line_number(node)}行找不到\"{old_name}\"")
+        line.text = line.text[:position] + name + line.text[position + len(old_name):]
+        node['name'] = name
+        if line.offset is None or len((line.text + line.ending).encode('utf-8')) != line.size:
+            self.in_place = False
+        self._mark(line)
+        self._notify('rename', node, old_name=old_name)
+
+    def add_child(self, parent, name, index=None):
+        """添加子女（index为在兄弟中的位置，默认排在最后），返回新的节点数据"""
+        name = check_name(name)
+        self._check_links(add=(parent, name))
+        children = parent.setdefault('children', [])
+        if index is None or index >= len(children):
+            index = len(children)
+            anchor = self._last_line(parent)
+        else:
+            anchor = self._lines[id(children[index])].prev
+        node = {'name': name}
+        line = _Line('  ' * (self.depth(parent) + 1) + '- ' + name, self.newline, node=node)
+        self._link_after(anchor, line, line)
+        children.insert(index, node)
+        self._lines[id(node)] = line
+        self._parents[id(node)] = parent
+        self._notify('add', node, parent=parent, index=index)
+        return node
+
+    def delete(self, node):
+        """删除本人及全部后代，返回删除的人数"""
+        parent = self._parents[id(node)]
+        if parent is None:
+            raise ValueError("不能删除始祖")
+        self._check_links(remove=node)
+        index = next(i for i, child in enumerate(parent['children']) if child is node)
+        run = self._unlink(self._lines[id(node)], self._last_line(node))
+        del parent['children'][index]
+        if not parent['children']:
+            del parent['children']
+        count = 0
+        for line in run:
+            if line.node is not None:
+                del self._lines[id(line.node)]
+                del self._parents[id(line.node)]
+                count += 1
+        self._notify('delete', node, parent=parent, index=index, count=count)
+        return count
+
+    def move(self, node, new_parent, index=None):
+        """把本人连同全部后代移到new_parent名下（index为在兄弟中的位置，默认排在最后），返回node"""
+        old_parent = self._parents[id(node)]
+        if old_parent is None:
+            raise ValueError("不能移动始祖")
+        if self.is_ancestor(node, new_parent):
+            raise ValueError("不能移到自己或自己的后代名下")
+        if new_parent is not old_parent:
+            self._check_links(move=(node, new_parent))
+        old_index = next(i for i, child in enumerate(old_parent['children']) if child is node)
+        shift = 2 * (self.depth(new_parent) + 1 - self.depth(node))
+
+        run = self._unlink(self._lines[id(node)], self._last_line(node))
+        del old_parent['children'][old_index]
+        if not old_parent['children']:
+            del old_parent['children']
+        children = new_parent.setdefault('children', [])
+        if index is None or index >= len(children):
+            index = len(children)
+            anchor = self._last_line(new_parent)
+        else:
+            anchor = self._lines[id(children[index])].prev
+
+        # 移动的行按新的代数调整缩进，作为新增的行写回
+        for line in run:
+            line.offset = line.size = None
+            if line.node is not None and shift:
+                if shift > 0:
+                    line.text = ' ' * shift + line.text
+                else:
+                    indent = len(line.text) - len(line.text.lstrip(' '))
+                    line.text = line.text[min(indent, -shift):]
+        self._link_after(anchor, run[0], run[-1])
+        children.insert(index, node)
+        self._parents[id(node)] = new_parent
+        self._notify('move', node, old_parent=old_parent, old_index=old_index, parent=new_parent, index=index)
+        return node
+
+    def line_number(self, node):
+        """所在的行号（从1开始，需要遍历前面的行，只用于提示信息）"""
+        number = 1
+        line = self._lines[id(node)]
+        while line.prev is not None:
+            line = line.prev
+            number += 1
+        return number
+
+    # ---------- 保存 ----------
+
+    def save(self):
+        """把修改写回文件，返回写入的字节数；文件在外部被修改过时抛出ValueError"""
+        if not self.dirty:
+            return 0
+        if _file_signature(self.path) != self.signature:
+            raise ValueError(f"文件已在其他程序中修改：{self.path}，请重新打开")
+
+        written = 0
+        with open(self.path, 'r+b') as f:
+            if self.in_place:
+                # 只有字节数不变的改名：在原位置覆盖这些行
+                for line in self.dirty:
+                    data = (line.text + line.ending).encode('utf-8')
+                    f.seek(line.offset)
+                    f.write(data)
+                    written += len(data)
+            else:
+                # 从第一处修改开始重写到文件末尾
+                candidate, start = min(self.dirty.items(), key=lambda item: item[1])
+                line = candidate
+                previous = line.prev if line is not None else self.tail
+                while previous is not None and (previous.offset is None or previous.offset + previous.size > start):
+                    line, previous = previous, previous.prev
+                f.seek(start)
+                offset = start
+                chunk = []
+                chunk_size = 0
+                while line is not None:
+                    data = (line.text + line.ending).encode('utf-8')
+                    line.offset, line.size = offset, len(data)
+                    offset += len(data)
+                    chunk.append(data)
+                    chunk_size += len(data)
+                    if chunk_size >= WRITE_CHUNK_BYTES:
+                        f.write(b''.join(chunk))
+                        chunk, chunk_size = [], 0
+                    line = line.next
+                f.write(b''.join(chunk))
+                f.truncate()
+                written = offset - start
+        self.dirty.clear()
+        self.in_place = True
+        self.signature = _file_signature(self.path)
+        return written
+
+    def text(self):
+        """当前的完整文件内容"""
+        parts = []
+        line = self.head
+        while line is not None:
+            parts.append(line.text + line.ending)
+            line = line.next
+        return ''.join(parts)
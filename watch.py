@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监视模式
+监视家谱数据目录，.md文件保存后自动重新生成家谱图：
+- 连续多次保存只在停顿一段时间（防抖）后渲染一次
+- 同一文件有新版本时立即取消正在进行的旧渲染
+- 只重新渲染发生变化的文件，并报告每次渲染的延迟
+渲染任务交给渲染调度器（render_scheduler.py），以watch优先级执行。
+
+用法：python watch.py [--data-dir 家谱数据] [--output-dir 生成图片]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+
+from render_scheduler import RenderError, RenderScheduler
+
+
+class RenderWatcher:
+    """轮询家谱数据目录，把变化的文件以watch优先级提交给渲染调度器"""
+
+    def __init__(self, data_dir, output_dir, layout='classic', interval=0.5, debounce=1.0, jobs=None,
+                 scheduler=None):
+        self.data_dir = str(data_dir)
+        self.output_dir = str(output_dir)
+        self.layout = layout
+        self.interval = interval
+        self.debounce = debounce
+        self.scheduler = scheduler or RenderScheduler(jobs)
+
+        self.known = {}      # 文件路径 -> (修改时间, 大小)
+        self.pending = {}    # 文件路径 -> (首次变化时间, 最后变化时间)
+        self.submitted = {}  # 文件路径 -> (渲染结果Future, 首次变化时间)
+
+    def log(self, message):
+        print(f"[{datetime.now():%H:%M:%S}] {message}", flush=True)
+
+    def scan(self):
+        """扫描目录，返回新增或修改过的文件路径列表"""
+        current = {}
+        with os.scandir(self.data_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.md'):
+                    stat = entry.stat()
+                    current[entry.path] = (stat.st_mtime_ns, stat.st_size)
+
+        changed = [path for path, signature in current.items() if self.known.get(path) != signature]
+        for path in set(self.known) - set(current):
+            # 文件被删除，放弃尚未开始的渲染
+            self.pending.pop(path, None)
+        self.known = current
+        return changed
+
+    def submit(self, path, first_change):
+        """提交渲染；文件正在渲染时调度器会取消旧渲染，只渲染最新版本"""
+        previous = self.submitted.get(path)
+        if previous is not None and not previous[0].done():
+            first_change = previous[1]
+            self.log(f"{os.path.basename(path)}：检测到新版本，放弃旧版本的渲染")
+        future = self.scheduler.submit(path, self.output_dir, self.layout, priority='watch')
+        if previous is None or previous[0] is not future:
+            future.add_done_callback(lambda f: self.report(path, f))
+        self.submitted[path] = (future, first_change)
+
+    def report(self, path, future):
+        """报告渲染结果和从保存到出图的延迟"""
+        entry = self.submitted.get(path)
+        if entry is None or entry[0] is not future:
+            return
+        del self.submitted[path]
+        name = os.path.basename(path)
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except RenderError as e:
+            self.log(f"{name}：渲染失败：{e}")
+            return
+        latency = time.monotonic() - entry[1]
+        self.log(f"{name}：渲染完成 → {result['output_path']}（渲染 {result['elapsed']:.2f}s，保存后 {latency:.2f}s）")
+
+    def poll(self):
+        """执行一次检查：发现变化，把防抖时间已到的文件提交渲染"""
+        now = time.monotonic()
+        for path in self.scan():
+            first_change = self.pending.get(path, (now, now))[0]
+            self.pending[path] = (first_change, now)
+
+        # 防抖：最后一次变化后停顿足够久才开始渲染
+        for path, (first_change, last_change) in list(self.pending.items()):
+            if now - last_change >= self.debounce:
+                del self.pending[path]
+                self.submit(path, first_change)
+
+    async def watch(self, render_all=False):
+        self.scan()
+        if render_all:
+            now = time.monotonic()
+            self.pending = {path: (now, now - self.debounce) for path in self.known}
+
+        self.log(f"正在监视 {self.data_dir}（{len(self.known)} 个文件），按 Ctrl+C 退出")
+        try:
+            while True:
+                self.poll()
+                await asyncio.sleep(self.interval)
+        finally:
+            await self.scheduler.close()
+
+    def run(self, render_all=False):
+        try:
+            asyncio.run(self.watch(render_all))
+        except KeyboardInterrupt:
+            self.log("停止监视")
+
+
+def main():
+    if getattr(sys, 'frozen', False):
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        base_dir = os.getcwd()
+
+    parser = argparse.ArgumentParser(description="监视家谱数据目录，文件保存后自动重新生成家谱图")
+    parser.add_argument('--data-dir', default=os.path.join(base_dir, '家谱数据'), help="家谱数据目录")
+    parser.add_argument('--output-dir', default=os.path.join(base_dir, '生成图片'), help="图片输出目录")
+    parser.add_argument('--layout', choices=('classic', 'compact'), default='classic', help="布局方式")
+    parser.add_argument('--interval', type=float, default=0.5, help="检查文件变化的间隔（秒）")
+    parser.add_argument('--debounce', type=float, default=1.0, help="最后一次保存后等待多久再渲染（秒）")
+    parser.add_argument('--jobs', type=int, default=None, help="同时渲染的最大文件数，默认为CPU核心数")
+    parser.add_argument('--render-all', action='store_true', help="启动时先渲染目录中的全部文件")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    watcher = RenderWatcher(args.data_dir, args.output_dir, args.layout,
+                            args.interval, args.debounce, args.jobs)
+    watcher.run(render_all=args.render_all)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()